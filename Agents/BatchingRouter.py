@@ -0,0 +1,158 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from langchain_core.language_models import BaseChatModel
+from langchain_core.rate_limiters import BaseRateLimiter, InMemoryRateLimiter
+from langchain_core.runnables import RunnableLambda
+from Agents.FastRouter import CentroidRouter
+from Agents.Router import QuestionRouter
+from Config.settings import settings
+from Utils.Metrics import metrics
+
+_shared_limiter: Optional[BaseRateLimiter] = None
+_shared_limiter_lock = threading.Lock()
+
+def shared_rate_limiter() -> Optional[BaseRateLimiter]:
+    """Process-wide limiter of ROUTER_RATE_LIMIT_RPS routing requests per second; None when unlimited"""
+    global _shared_limiter
+    if settings.ROUTER_RATE_LIMIT_RPS <= 0:
+        return None
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = InMemoryRateLimiter(
+                requests_per_second=settings.ROUTER_RATE_LIMIT_RPS,
+                check_every_n_seconds=0.01,
+                max_bucket_size=max(1.0, settings.ROUTER_RATE_LIMIT_RPS)
+            )
+        return _shared_limiter
+
+class BatchingQuestionRouter(QuestionRouter):
+    """
+    QuestionRouter that micro-batches its LLM calls across concurrent requests.
+
+    Questions the local classifier cannot settle are queued. A worker thread
+    takes everything arriving within `max_wait` seconds of the first one (up to
+    `max_batch_size`) and classifies it with one chain.batch() call, at most
+    `max_concurrency` requests in flight, each acquiring the shared rate
+    limiter first. Up to `max_batches_in_flight` batches run at once, so
+    collection goes on while earlier batches are being classified; when all
+    of them are busy, new questions wait in the queue and join the next
+    batch. Every caller gets the dataSource of its own question; a failed
+    classification raises in that caller only. Time spent queued and time
+    spent in the batch are recorded separately.
+    """
+    def __init__(self, fast_router: Optional[CentroidRouter] = None, llm: Optional[BaseChatModel] = None,
+                 use_fast_path: Optional[bool] = None, max_batch_size: Optional[int] = None,
+                 max_wait: Optional[float] = None, max_concurrency: Optional[int] = None,
+                 max_batches_in_flight: Optional[int] = None, rate_limiter: Optional[BaseRateLimiter] = None):
+        super().__init__(fast_router=fast_router, llm=llm, use_fast_path=use_fast_path)
+        self.max_batch_size = max_batch_size or settings.ROUTER_BATCH_MAX_SIZE
+        self.max_wait = settings.ROUTER_BATCH_MAX_WAIT if max_wait is None else max_wait
+        self.max_concurrency = max_concurrency or settings.ROUTER_BATCH_CONCURRENCY
+        self.max_batches_in_flight = max_batches_in_flight or settings.ROUTER_BATCHES_IN_FLIGHT
+        self.rate_limiter = rate_limiter or shared_rate_limiter()
+        self.batch_chain = self.chain
+        if self.rate_limiter is not None:
+            self.batch_chain = self.route_prompt | RunnableLambda(self._acquire) | self.structured_llm
+        self.batches = 0
+        self.batched_questions = 0
+        self.queue_wait = 0.0
+        self.service_time = 0.0
+        self._queue: "queue.Queue[Tuple[str, float, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_batches_in_flight,
+                                            thread_name_prefix="router-batch")
+        # A batch is only collected once one of the executor's workers is free for it
+        self._slots = threading.Semaphore(self.max_batches_in_flight)
+    
+    def _acquire(self, prompt_value):
+        self.rate_limiter.acquire(blocking=True)
+        return prompt_value
+    
+    def submit(self, question: str) -> Future:
+        """Queue a question for the next batch; the future resolves to its dataSource"""
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="router-batcher", daemon=True)
+                self._worker.start()
+        future = Future()
+        self._queue.put((question, time.perf_counter(), future))
+        return future
+    
+    def _llm_route(self, question: str) -> str:
+        return self.submit(question).result()
+    
+    async def _allm_route(self, question: str) -> str:
+        return await asyncio.wrap_future(self.submit(question))
+    
+    def _collect(self) -> List[Tuple[str, float, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        while True:
+            self._slots.acquire()
+            batch = self._collect()
+            pending = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if pending:
+                self._executor.submit(self._classify, pending)
+            else:
+                self._slots.release()
+    
+    def _classify(self, pending: List[Tuple[str, float, Future]]):
+        try:
+            self._classify_batch(pending)
+        finally:
+            self._slots.release()
+    
+    def _classify_batch(self, pending: List[Tuple[str, float, Future]]):
+        start = time.perf_counter()
+        waits = [start - enqueued for _, enqueued, _ in pending]
+        for wait in waits:
+            metrics.observe("router_queue_wait_seconds", wait)
+        metrics.observe("router_batch_size", len(pending))
+        try:
+            results = self.batch_chain.batch(
+                [{"question": question} for question, _, _ in pending],
+                config={"max_concurrency": self.max_concurrency},
+                return_exceptions=True
+            )
+        except Exception as e:
+            results = [e] * len(pending)
+        service = time.perf_counter() - start
+        metrics.observe("router_service_seconds", service)
+        with self._counter_lock:
+            self.batches += 1
+            self.batched_questions += len(pending)
+            self.queue_wait += sum(waits)
+            self.service_time += service * len(pending)
+        for (_, _, future), result in zip(pending, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result.dataSource)
+    
+    def stats(self) -> Dict[str, float]:
+        """QuestionRouter.stats plus batch sizes and where LLM-routed questions spent their time"""
+        count = self.batched_questions
+        return {
+            **super().stats(),
+            "batches": self.batches,
+            "mean_batch_size": count / self.batches if self.batches else 0.0,
+            "mean_queue_wait": self.queue_wait / count if count else 0.0,
+            "mean_service_time": self.service_time / count if count else 0.0,
+            "queued": self._queue.qsize(),
+        }
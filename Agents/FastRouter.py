@@ -0,0 +1,37 @@
+from typing import Dict, List, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from Data.RouteExamples import ROUTE_EXAMPLES
+
+def centroid(vectors) -> np.ndarray:
+    """Normalized mean of the normalized vectors"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    mean = vectors.mean(axis=0)
+    return mean / np.linalg.norm(mean)
+
+def nearest(centroids: np.ndarray, vector) -> Tuple[int, float]:
+    """Index of the closest centroid and its cosine margin over the second closest"""
+    vector = np.asarray(vector, dtype=np.float32)
+    vector = vector / (np.linalg.norm(vector) or 1.0)
+    scores = centroids @ vector
+    best, second = np.argsort(scores)[::-1][:2]
+    return int(best), float(scores[best] - scores[second])
+
+class CentroidRouter:
+    """
+    Local nearest-centroid classifier over question embeddings.
+
+    Each route is represented by the normalized mean embedding of its labelled
+    examples. A question goes to the closest centroid by cosine similarity; the
+    confidence is the margin between the best and second-best similarity.
+    """
+    def __init__(self, embeddings: Embeddings, examples: Dict[str, List[str]] = ROUTE_EXAMPLES):
+        self.embeddings = embeddings
+        self.labels = list(examples)
+        self.centroids = np.stack([centroid(embeddings.embed_documents(examples[label])) for label in self.labels])
+    
+    def classify(self, question: str) -> Tuple[str, float]:
+        """Return (route, confidence) for a question"""
+        best, margin = nearest(self.centroids, self.embeddings.embed_query(question))
+        return self.labels[best], margin
@@ -1,76 +1,221 @@
-from typing import List
+import asyncio
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Union
 from typing_extensions import TypedDict
 from langgraph.graph import START, END, StateGraph
 from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
 from Agents.Router import QuestionRouter
 from Services.VectorStoreServices import VectorStoreService
+from Services.RelevanceGateServices import RelevanceGate
 from Services.RetrievalServices import RetrievalService
+from Config.settings import settings
+from Utils.Metrics import metrics
+from Utils.Tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Graph node and log line of each route
+NODE_NAMES = {"vectorStore": "retrieve", "wikiSearch": "wikiSearch", "tavilySearch": "tavilySearch"}
+NODE_LOGS = {"vectorStore": "Retrieving from vector store", "wikiSearch": "Searching Wikipedia",
+             "tavilySearch": "Searching Tavily"}
 
 class State(TypedDict):
     question: str
+    # Set only when the relevance gate answered without the LLM
     generation: str
     documents: List[Document]
+    # Route that produced the documents; speculative invocations set it up front
+    route: str
+    # Set only by speculative invocations: retrievals started while routing
+    prefetched: Dict[str, Union[Future, asyncio.Task]]
 
 class RAGGraph:
-    def __init__(self, vector_store_service: VectorStoreService):
+    """
+    Router + retrieval workflow.
+
+    In speculative mode, invoke() starts the local vector-store retrieval (and,
+    if configured, the web searches) on a thread pool while the router runs, then
+    keeps the branch the router picked and cancels or discards the others.
+    Tavily is only speculated when SPECULATE_TAVILY is set since every call is paid.
+    
+    With a relevance gate, vector-store results scoring below its threshold end
+    the graph with a canned "generation" or continue to a web search node.
+    
+    One compiled graph serves invoke() and ainvoke(): each node is a
+    RunnableLambda whose sync and async halves differ only in how they fetch.
+    """
+    def __init__(self, vector_store_service: VectorStoreService, speculative: Optional[bool] = None,
+                 router: Optional[QuestionRouter] = None, retrieval_service: Optional[RetrievalService] = None,
+                 retriever=None, gate: Optional[RelevanceGate] = None, use_gate: Optional[bool] = None):
         self.vector_store_service = vector_store_service
-        self.retrieval_service = RetrievalService()
-        self.router = QuestionRouter()
-        self.retriever = vector_store_service.get_retriever()
+        self.retrieval_service = retrieval_service or RetrievalService()
+        if router is None:
+            if settings.ROUTER_BATCHING_ENABLED:
+                from Agents.BatchingRouter import BatchingQuestionRouter
+                router = BatchingQuestionRouter()
+            else:
+                router = QuestionRouter()
+        self.router = router
+        self.retriever = retriever or vector_store_service.get_retriever()
+        use_gate = settings.RELEVANCE_GATE_ENABLED if use_gate is None else use_gate
+        if gate is None and use_gate:
+            gate = RelevanceGate(settings.RELEVANCE_THRESHOLD, settings.RELEVANCE_GATE_ACTION,
+                                 settings.RELEVANCE_CANNED_ANSWER)
+        self.gate = gate
+        self.speculative = settings.SPECULATIVE_RETRIEVAL if speculative is None else speculative
+        self.speculated_routes = ["vectorStore"]
+        if settings.SPECULATE_WIKIPEDIA:
+            self.speculated_routes.append("wikiSearch")
+        if settings.SPECULATE_TAVILY:
+            self.speculated_routes.append("tavilySearch")
+        self._executor = ThreadPoolExecutor(max_workers=settings.SPECULATIVE_WORKERS) if self.speculative else None
         self.app = self._build_graph()
     
-    def _retrieve(self, state: State):
-        """Retrieve from vector store"""
-        print("-----Retrieving from Vector Store-----")
-        question = state["question"]
-        documents = self.retriever.invoke(question)
-        return {"documents": documents, "question": question}
-    
-    def _wiki_search(self, state: State):
-        """Search Wikipedia"""
-        print("-----Searching Wikipedia-----")
-        question = state["question"]
-        docs = self.retrieval_service.search_wikipedia(question)
-        wiki_results = Document(page_content=docs)
-        return {"documents": [wiki_results], "question": question}
-    
-    def _tavily_search(self, state: State):
-        """Search Tavily"""
-        print("-----Searching Tavily-----")
-        question = state["question"]
-        docs = self.retrieval_service.search_tavily(question)
-        tavily_results = Document(page_content=docs)
-        return {"documents": [tavily_results], "question": question}
+    def _fetch_vector_store(self, question: str) -> List[Document]:
+        with metrics.timer("vector_store_query_seconds", op="retriever"):
+            return self.retriever.invoke(question)
+    
+    def _fetch_wikipedia(self, question: str) -> List[Document]:
+        return [Document(page_content=self.retrieval_service.search_wikipedia(question))]
+    
+    def _fetch_tavily(self, question: str) -> List[Document]:
+        return [Document(page_content=self.retrieval_service.search_tavily(question))]
+    
+    async def _afetch_vector_store(self, question: str) -> List[Document]:
+        with metrics.timer("vector_store_query_seconds", op="retriever"):
+            return await self.retriever.ainvoke(question)
+    
+    async def _afetch_wikipedia(self, question: str) -> List[Document]:
+        return [Document(page_content=await self.retrieval_service.asearch_wikipedia(question))]
+    
+    async def _afetch_tavily(self, question: str) -> List[Document]:
+        return [Document(page_content=await self.retrieval_service.asearch_tavily(question))]
+    
+    def _fetchers(self):
+        return {
+            "vectorStore": self._fetch_vector_store,
+            "wikiSearch": self._fetch_wikipedia,
+            "tavilySearch": self._fetch_tavily,
+        }
+    
+    def _afetchers(self):
+        return {
+            "vectorStore": self._afetch_vector_store,
+            "wikiSearch": self._afetch_wikipedia,
+            "tavilySearch": self._afetch_tavily,
+        }
+    
+    @staticmethod
+    def _speculated(state: State, route: str) -> Optional[List[Document]]:
+        """Result of a retrieval started before routing finished, if there is one"""
+        future = state.get("prefetched", {}).get(route)
+        return future.result() if future is not None else None
+    
+    @staticmethod
+    async def _aspeculated(state: State, route: str) -> Optional[List[Document]]:
+        """Async counterpart of _speculated for tasks started by ainvoke"""
+        task = state.get("prefetched", {}).get(route)
+        return await task if task is not None else None
+    
+    def _search_node(self, route: str) -> RunnableLambda:
+        """
+        Graph node for one route. Sync and async invocations share everything
+        but the fetch: a speculated result or the route's fetcher.
+        """
+        node = NODE_NAMES[route]
+
+        def finish(question: str, documents: List[Document]):
+            self._record_payload(node, documents)
+            if route == "vectorStore":
+                return self._gated(question, documents)
+            return {"documents": documents, "question": question, "route": route}
+
+        def run(state: State):
+            logger.info(NODE_LOGS[route])
+            with metrics.timer("rag_node_seconds", node=node):
+                documents = self._speculated(state, route)
+                if documents is None:
+                    documents = self._fetchers()[route](state["question"])
+            return finish(state["question"], documents)
+
+        async def arun(state: State):
+            logger.info(NODE_LOGS[route])
+            with metrics.timer("rag_node_seconds", node=node):
+                documents = await self._aspeculated(state, route)
+                if documents is None:
+                    documents = await self._afetchers()[route](state["question"])
+            return finish(state["question"], documents)
+
+        return RunnableLambda(run, afunc=arun, name=node)
+    
+    def _gated(self, question: str, documents: List[Document]):
+        """Retrieve node's state update once the relevance gate has seen the documents"""
+        action = self.gate.check(documents) if self.gate is not None else None
+        if action is None:
+            return {"documents": documents, "question": question, "route": "vectorStore"}
+        logger.info("Vector store results below relevance threshold, %s",
+                    "answering without the LLM" if action == "canned" else f"rerouting to {action}")
+        if action == "canned":
+            return {"documents": [], "question": question, "route": "vectorStore",
+                    "generation": self.gate.canned_answer}
+        return {"documents": [], "question": question, "route": action}
+    
+    @staticmethod
+    def _after_retrieve(state: State):
+        """END, or the web route the relevance gate rerouted to"""
+        route = state["route"]
+        return END if route == "vectorStore" else route
+    
+    @staticmethod
+    def _record_payload(node: str, documents: List[Document]):
+        """Documents and characters a node hands to generation; tokens too with METRICS_COUNT_TOKENS"""
+        if not metrics.enabled:
+            return
+        metrics.observe("rag_node_documents", len(documents), node=node)
+        metrics.observe("rag_node_context_chars",
+                        sum(len(doc.page_content) for doc in documents) + 2 * max(0, len(documents) - 1), node=node)
+        if settings.METRICS_COUNT_TOKENS:
+            context = "\n\n".join(doc.page_content for doc in documents)
+            metrics.observe("rag_node_context_tokens", count_tokens(context), node=node)
     
     def _route_question(self, state: State):
         """Route question to appropriate source"""
-        print("-----Routing Question-----")
-        question = state["question"]
-        source = self.router.route(question)
-        
-        if source == "wikiSearch":
-            print("---Routing to Wikipedia---")
-            return "wikiSearch"
-        elif source == "vectorStore":
-            print("---Routing to RAG---")
-            return "vectorStore"
-        elif source == "tavilySearch":
-            print("---Routing to Tavily---")
-            return "tavilySearch"
+        source = state.get("route")
+        if not source:
+            with metrics.timer("rag_node_seconds", node="route"):
+                source = self.router.route(state["question"])
+        return self._route_label(source)
+    
+    async def _aroute_question(self, state: State):
+        """_route_question for ainvoke: the router is awaited"""
+        source = state.get("route")
+        if not source:
+            with metrics.timer("rag_node_seconds", node="route"):
+                source = await self.router.aroute(state["question"])
+        return self._route_label(source)
+    
+    @staticmethod
+    def _route_label(source: str):
+        if source not in ("vectorStore", "wikiSearch", "tavilySearch"):
+            return None
+        logger.info("Routing question to %s", source)
+        metrics.inc("rag_route_total", route=source)
+        return source
     
     def _build_graph(self):
-        """Build the LangGraph workflow"""
+        """Build the LangGraph workflow; every node runs natively under invoke() and ainvoke()"""
         workflow = StateGraph(State)
         
         # Add nodes
-        workflow.add_node("wikiSearch", self._wiki_search)
-        workflow.add_node("retrieve", self._retrieve)
-        workflow.add_node("tavilySearch", self._tavily_search)
+        for route in ("wikiSearch", "vectorStore", "tavilySearch"):
+            workflow.add_node(NODE_NAMES[route], self._search_node(route))
         
         # Add conditional edges
         workflow.add_conditional_edges(
             START,
-            self._route_question,
+            RunnableLambda(self._route_question, afunc=self._aroute_question, name="route"),
             {
                 "wikiSearch": "wikiSearch",
                 "vectorStore": "retrieve" , 
@@ -78,8 +223,12 @@ class RAGGraph:
             },
         )
         
-        # Add edges to END
-        workflow.add_edge("retrieve", END)
+        # Add edges to END; the relevance gate may send retrieve on to a web search
+        workflow.add_conditional_edges(
+            "retrieve",
+            self._after_retrieve,
+            {END: END, "wikiSearch": "wikiSearch", "tavilySearch": "tavilySearch"},
+        )
         workflow.add_edge("wikiSearch", END)
         workflow.add_edge("tavilySearch", END)
         
@@ -87,5 +236,61 @@ class RAGGraph:
     
     def invoke(self, question: str):
         """Invoke the graph with a question"""
-        result = self.app.invoke({"question": question})
-        return result
\ No newline at end of file
+        if not self.speculative:
+            return self.app.invoke({"question": question})
+        
+        fetchers = self._fetchers()
+        prefetched = {
+            route: self._executor.submit(fetchers[route], question) for route in self.speculated_routes
+        }
+        try:
+            with metrics.timer("rag_node_seconds", node="route"):
+                route = self.router.route(question)
+        except BaseException:
+            for future in prefetched.values():
+                future.cancel()
+            raise
+        for other, future in prefetched.items():
+            if other != route:
+                future.cancel()
+        
+        result = self.app.invoke({
+            "question": question,
+            "route": route,
+            "prefetched": {route: prefetched[route]} if route in prefetched else {},
+        })
+        result.pop("prefetched", None)
+        return result
+    
+    async def ainvoke(self, question: str):
+        """Invoke the graph on the running event loop"""
+        if not self.speculative:
+            return await self.app.ainvoke({"question": question})
+        
+        fetchers = self._afetchers()
+        prefetched = {
+            route: asyncio.create_task(fetchers[route](question)) for route in self.speculated_routes
+        }
+        try:
+            with metrics.timer("rag_node_seconds", node="route"):
+                route = await self.router.aroute(question)
+        except BaseException:
+            for task in prefetched.values():
+                task.cancel()
+            raise
+        for other, task in prefetched.items():
+            if other != route:
+                task.cancel()
+        
+        result = await self.app.ainvoke({
+            "question": question,
+            "route": route,
+            "prefetched": {route: prefetched[route]} if route in prefetched else {},
+        })
+        result.pop("prefetched", None)
+        return result
+    
+    def close(self):
+        """Stop the speculative worker threads; the router and retrieval service may be shared and stay open"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,8 +1,13 @@
-from typing import Literal
+import asyncio
+import threading
+from typing import Dict, Literal, Optional
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
+from langchain_core.language_models import BaseChatModel
 from langchain_core.prompts import ChatPromptTemplate
+from Agents.FastRouter import CentroidRouter
 from Config.settings import settings
+from Services.EmbeddingServices import EmbeddingService
+from Utils.Metrics import metrics
 
 class RouteQuery(BaseModel):
     """Route the user query to the most relevant datasource"""
@@ -12,8 +17,22 @@ class RouteQuery(BaseModel):
     )
 
 class QuestionRouter:
-    def __init__(self):
-        self.llm = ChatOpenAI(model=settings.LLM_MODEL)
+    def __init__(self, fast_router: Optional[CentroidRouter] = None, llm: Optional[BaseChatModel] = None,
+                 use_fast_path: Optional[bool] = None):
+        if use_fast_path is None:
+            use_fast_path = settings.ROUTER_FAST_PATH_ENABLED
+        if fast_router is None and use_fast_path:
+            fast_router = CentroidRouter(EmbeddingService().get_embeddings())
+        self.fast_router = fast_router
+        self.fast_path_threshold = settings.ROUTER_FAST_PATH_THRESHOLD
+        self.fast_path_hits = 0
+        self.llm_calls = 0
+        self._counter_lock = threading.Lock()
+        
+        if llm is None:
+            from langchain_openai import ChatOpenAI
+            llm = ChatOpenAI(model=settings.LLM_MODEL)
+        self.llm = llm
         self.structured_llm = self.llm.with_structured_output(RouteQuery)
         
         system = """You are an expert at routing a user question to a vectorstore or wikipedia or tavilySearch.
@@ -29,7 +48,58 @@ Use the vectorstore for questions on these topics. Otherwise, use wiki-search or
         
         self.chain = self.route_prompt | self.structured_llm
     
+    def _fast_route(self, question: str) -> Optional[str]:
+        """Local classifier's route when it is confident enough, else None"""
+        if self.fast_router is None:
+            return None
+        source, confidence = self.fast_router.classify(question)
+        if confidence < self.fast_path_threshold:
+            return None
+        with self._counter_lock:
+            self.fast_path_hits += 1
+        return source
+    
+    def _llm_route(self, question: str) -> str:
+        return self.chain.invoke({"question": question}).dataSource
+    
+    async def _allm_route(self, question: str) -> str:
+        return (await self.chain.ainvoke({"question": question})).dataSource
+    
     def route(self, question: str) -> str:
-        """Route question to appropriate datasource"""
-        result = self.chain.invoke({"question": question})
-        return result.dataSource
\ No newline at end of file
+        """Route question to appropriate datasource, asking the LLM only when the local classifier is unsure"""
+        with metrics.timer("router_seconds", path="fast"):
+            source = self._fast_route(question)
+        if source is not None:
+            metrics.inc("router_decisions_total", path="fast", route=source)
+            return source
+        
+        with self._counter_lock:
+            self.llm_calls += 1
+        with metrics.timer("router_seconds", path="llm"):
+            source = self._llm_route(question)
+        metrics.inc("router_decisions_total", path="llm", route=source)
+        return source
+    
+    async def aroute(self, question: str) -> str:
+        """Async route: the CPU-bound classifier runs off the event loop, the LLM call is awaited"""
+        with metrics.timer("router_seconds", path="fast"):
+            source = await asyncio.to_thread(self._fast_route, question) if self.fast_router is not None else None
+        if source is not None:
+            metrics.inc("router_decisions_total", path="fast", route=source)
+            return source
+        
+        with self._counter_lock:
+            self.llm_calls += 1
+        with metrics.timer("router_seconds", path="llm"):
+            source = await self._allm_route(question)
+        metrics.inc("router_decisions_total", path="llm", route=source)
+        return source
+    
+    def stats(self) -> Dict[str, float]:
+        """How often the local classifier short-circuited the LLM"""
+        total = self.fast_path_hits + self.llm_calls
+        return {
+            "fast_path": self.fast_path_hits,
+            "llm": self.llm_calls,
+            "short_circuit_rate": self.fast_path_hits / total if total else 0.0,
+        }
\ No newline at end of file
@@ -0,0 +1,199 @@
+"""
+Deterministic stand-ins for the networked/model-backed services, so the
+graph can be exercised and timed without API keys.
+"""
+import asyncio
+import random
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+class LatencyModel:
+    """
+    Seeded latency distribution, in seconds.
+    kind is "fixed" (always median), "uniform" (median +/- spread*median)
+    or "lognormal" (median with log-space standard deviation spread).
+    """
+    def __init__(self, median: float = 0.0, kind: str = "lognormal", spread: float = 0.3, seed: int = 0):
+        self.median = median
+        self.kind = kind
+        self.spread = spread
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+    
+    def sample(self) -> float:
+        if self.median <= 0 or self.kind == "fixed":
+            return max(self.median, 0.0)
+        with self._lock:
+            if self.kind == "uniform":
+                return self._rng.uniform(self.median * (1 - self.spread), self.median * (1 + self.spread))
+            return self._rng.lognormvariate(0.0, self.spread) * self.median
+    
+    def sleep(self):
+        time.sleep(self.sample())
+
+class FakeRouter:
+    """QuestionRouter stand-in: keyword routing after a fixed delay"""
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+    
+    def route(self, question: str) -> str:
+        time.sleep(self.delay)
+        return self._classify(question)
+    
+    async def aroute(self, question: str) -> str:
+        await asyncio.sleep(self.delay)
+        return self._classify(question)
+    
+    @staticmethod
+    def _classify(question: str) -> str:
+        lowered = question.lower()
+        if any(word in lowered for word in ("today", "latest", "news", "current")):
+            return "tavilySearch"
+        if any(word in lowered for word in ("agent", "prompt", "attack", "llm")):
+            return "vectorStore"
+        return "wikiSearch"
+
+class FakeRetriever:
+    """Vector-store retriever stand-in returning canned chunks after a fixed or sampled delay"""
+    def __init__(self, delay=0.0, k: int = 4):
+        self.delay = delay if isinstance(delay, LatencyModel) else LatencyModel(delay, kind="fixed")
+        self.k = k
+    
+    def invoke(self, question: str) -> List[Document]:
+        self.delay.sleep()
+        return self._chunks(question)
+    
+    async def ainvoke(self, question: str) -> List[Document]:
+        await asyncio.sleep(self.delay.sample())
+        return self._chunks(question)
+    
+    def _chunks(self, question: str) -> List[Document]:
+        # Relevance spread over 0..1 but fixed per question, so relevance gating is repeatable
+        top = (zlib.crc32(question.encode("utf-8")) % 1000) / 1000
+        return [
+            Document(page_content=f"Chunk {i} about {question}", metadata={
+                "source": f"fake://chunk/{i}", "distance": 1 - top * 0.9 ** i, "relevance_score": top * 0.9 ** i
+            })
+            for i in range(self.k)
+        ]
+
+class FakeVectorStoreService:
+    def __init__(self, delay=0.0):
+        self.retriever = FakeRetriever(delay)
+    
+    def get_retriever(self):
+        return self.retriever
+
+class FakeRetrievalService:
+    """RetrievalService stand-in for Wikipedia and Tavily"""
+    def __init__(self, wiki_delay: float = 0.0, tavily_delay: float = 0.0):
+        self.wiki_delay = wiki_delay
+        self.tavily_delay = tavily_delay
+        self.tavily_calls = 0
+    
+    def search_wikipedia(self, query: str) -> str:
+        time.sleep(self.wiki_delay)
+        return f"Page: {query}\nSummary: Wikipedia summary for {query}"
+    
+    async def asearch_wikipedia(self, query: str) -> str:
+        await asyncio.sleep(self.wiki_delay)
+        return f"Page: {query}\nSummary: Wikipedia summary for {query}"
+    
+    def search_tavily(self, query: str) -> str:
+        self.tavily_calls += 1
+        time.sleep(self.tavily_delay)
+        return f"Result 1:\nTitle: {query}\nContent: Web result for {query}\nURL: https://example.com\n"
+    
+    async def asearch_tavily(self, query: str) -> str:
+        self.tavily_calls += 1
+        await asyncio.sleep(self.tavily_delay)
+        return f"Result 1:\nTitle: {query}\nContent: Web result for {query}\nURL: https://example.com\n"
+
+class FakeChatModel(BaseChatModel):
+    """
+    ChatOpenAI stand-in. Answers and streams a deterministic reply after a
+    sampled time-to-first-token, and supports with_structured_output(RouteQuery)
+    using FakeRouter's keyword rules.
+    """
+    latency: Any = None
+    token_latency: float = 0.0
+    
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+    
+    def _wait(self):
+        if self.latency is not None:
+            self.latency.sleep()
+    
+    @staticmethod
+    def _reply(messages: List[BaseMessage]) -> str:
+        question = messages[-1].content if messages else ""
+        context_chars = sum(len(m.content) for m in messages[:-1])
+        return f"This is a deterministic answer to '{question}' drawn from {context_chars} characters of context."
+    
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs) -> ChatResult:
+        self._wait()
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+    
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        self._wait()
+        for i, token in enumerate(self._reply(messages).split(" ")):
+            if i and self.token_latency:
+                time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token if i == 0 else " " + token))
+    
+    def with_structured_output(self, schema, **kwargs):
+        def classify(prompt_value):
+            self._wait()
+            return schema(dataSource=FakeRouter._classify(prompt_value.to_messages()[-1].content))
+        return RunnableLambda(classify)
+
+class FakeWikipediaTool:
+    """WikipediaQueryRun stand-in"""
+    def __init__(self, latency: Optional[LatencyModel] = None):
+        self.latency = latency or LatencyModel()
+    
+    def invoke(self, tool_input: Dict[str, str]) -> str:
+        self.latency.sleep()
+        return self._page(tool_input["query"])
+    
+    async def ainvoke(self, tool_input: Dict[str, str]) -> str:
+        await asyncio.sleep(self.latency.sample())
+        return self._page(tool_input["query"])
+    
+    @staticmethod
+    def _page(query: str) -> str:
+        return f"Page: {query}\nSummary: Wikipedia summary for {query}"[:200]
+
+class FakeTavilyTool:
+    """TavilySearchResults stand-in returning max_results canned hits"""
+    def __init__(self, latency: Optional[LatencyModel] = None, max_results: int = 5):
+        self.latency = latency or LatencyModel()
+        self.max_results = max_results
+        self.calls = 0
+    
+    def invoke(self, tool_input: Dict[str, str]) -> List[Dict[str, str]]:
+        self.calls += 1
+        self.latency.sleep()
+        return self._results(tool_input["query"])
+    
+    async def ainvoke(self, tool_input: Dict[str, str]) -> List[Dict[str, str]]:
+        self.calls += 1
+        await asyncio.sleep(self.latency.sample())
+        return self._results(tool_input["query"])
+    
+    def _results(self, query: str) -> List[Dict[str, str]]:
+        return [
+            {"title": f"{query} ({i})", "content": f"Web result {i} for {query}", "url": f"https://example.com/{i}"}
+            for i in range(1, self.max_results + 1)
+        ]
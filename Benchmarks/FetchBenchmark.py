@@ -0,0 +1,66 @@
+"""
+Fetch DocumentLoader.load_urls against a local stand-in HTTP server that
+sleeps a fixed delay per request, sequentially and with the worker pool.
+Command: python -m Benchmarks.FetchBenchmark --urls 200 --delay 0.2 --workers 64
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from Utils.DoumentLoader import DocumentLoader
+
+def start_server(delay: float) -> ThreadingHTTPServer:
+    """Serve a tiny HTML page for every path after `delay` seconds"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(delay)
+            body = f"<html lang='en'><title>{self.path}</title><body>page {self.path}</body></html>".encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def run(loader: DocumentLoader, urls):
+    start = time.perf_counter()
+    docs = loader.load_urls(urls)
+    elapsed = time.perf_counter() - start
+    in_order = [doc.metadata["source"] for doc in docs] == urls
+    return elapsed, len(docs), in_order
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--urls", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+
+    server = start_server(args.delay)
+    host, port = server.server_address
+    urls = [f"http://{host}:{port}/page/{i}" for i in range(args.urls)]
+
+    print(f"{args.urls} URLs, {args.delay:.3f}s per response")
+    if not args.skip_sequential:
+        elapsed, count, _ = run(DocumentLoader(max_workers=1), urls)
+        print(f"sequential:            {elapsed:7.2f}s  ({count} docs)")
+
+    # All URLs share one host here, so lift the per-host cap to the pool size
+    loader = DocumentLoader(max_workers=args.workers, per_host_limit=args.workers)
+    elapsed, count, in_order = run(loader, urls)
+    ideal = args.delay * -(-args.urls // args.workers)
+    print(f"concurrent x{args.workers:<4}       {elapsed:7.2f}s  ({count} docs, in order: {in_order}, ideal {ideal:.2f}s)")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
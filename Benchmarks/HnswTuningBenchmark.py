@@ -0,0 +1,149 @@
+"""
+Build the Chroma collection with a grid of HNSW settings (M x construction ef)
+and measure recall@k and p50/p99 query latency against exact brute-force
+search, for every search ef and k. The result is one recall-vs-latency curve
+per index build, plus the cheapest setting reaching --target-recall at each k.
+
+Queries are stored chunk embeddings with Gaussian noise added, so no
+embedding model runs. Without --synthetic the vectors of the existing
+collection (settings.CHROMA_PERSIST_DIR) are copied into temporary collections;
+the live collection is never modified.
+Command: python -m Benchmarks.HnswTuningBenchmark --m 8 16 32 --search-ef 10 25 50 100
+         python -m Benchmarks.HnswTuningBenchmark --synthetic 50000 --space cosine --json hnsw.json
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+import numpy as np
+from chromadb.api.client import SharedSystemClient
+from Benchmarks.VectorBackendBenchmark import percentile, synthetic_corpus, time_queries
+from Config.settings import settings
+from Utils.Hnsw import SPACES, hnsw_metadata, open_chroma
+
+def exact_distances(queries: np.ndarray, vectors: np.ndarray, space: str) -> np.ndarray:
+    """Distances as Chroma defines them for each space: squared L2, 1 - cosine, 1 - dot"""
+    if space == "l2":
+        return (queries ** 2).sum(axis=1, keepdims=True) - 2 * queries @ vectors.T + (vectors ** 2).sum(axis=1)
+    if space == "cosine":
+        unit = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return 1 - (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ unit.T
+    return 1 - queries @ vectors.T
+
+def recall_at(found: List[List[str]], truth: List[List[str]], k: int) -> float:
+    return sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth)) / max(1, k * len(truth))
+
+def build(directory: str, space: str, m: int, construction_ef: int, ids, texts, metadatas, vectors):
+    store = open_chroma(settings.COLLECTION_NAME, None, directory,
+                        metadata=hnsw_metadata(space, m, construction_ef, settings.HNSW_SEARCH_EF))
+    start = time.perf_counter()
+    for i in range(0, len(ids), 5000):
+        store._collection.add(ids=ids[i:i + 5000], embeddings=vectors[i:i + 5000].tolist(),
+                              documents=texts[i:i + 5000], metadatas=metadatas[i:i + 5000])
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=0, help="use N random vectors instead of the Chroma collection")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--space", choices=SPACES, default=settings.HNSW_SPACE)
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[settings.HNSW_CONSTRUCTION_EF])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 25, 50, 100, 200])
+    parser.add_argument("--k", type=int, nargs="+", default=sorted({1, settings.RETRIEVAL_K, 10}))
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--json", default=None, help="also write every measurement to this file")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        ids, texts, metadatas, vectors = synthetic_corpus(args.synthetic, args.dim, args.seed)
+    else:
+        data = open_chroma(settings.COLLECTION_NAME, None, settings.CHROMA_PERSIST_DIR)._collection.get(
+            include=["embeddings", "documents", "metadatas"]
+        )
+        ids, texts = data["ids"], data["documents"]
+        metadatas = [metadata or {} for metadata in data["metadatas"]]
+        vectors = np.asarray(data["embeddings"], dtype=np.float32)
+    if not ids:
+        print(f"No chunks in {settings.CHROMA_PERSIST_DIR}; run setup.py first or pass --synthetic N")
+        return
+    vectors = np.asarray(vectors, dtype=np.float32)
+
+    rng = np.random.default_rng(args.seed + 1)
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = unit[rng.integers(0, len(unit), args.queries)]
+    queries = queries + args.noise * rng.normal(size=queries.shape) / np.sqrt(queries.shape[1])
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+    ks = sorted({min(k, len(ids)) for k in args.k})
+
+    # Exact baseline: ground truth and the latency of a brute-force scan
+    top = max(ks)
+    truth = [[ids[row] for row in np.argsort(row_distances)[:top]]
+             for row_distances in exact_distances(queries, vectors, args.space)]
+    exact_latencies, _ = time_queries(
+        lambda q: np.argpartition(exact_distances(q[None, :], vectors, args.space)[0], top - 1)[:top], queries
+    )
+
+    print(f"{len(ids)} chunks x {vectors.shape[1]} dims, {len(queries)} queries, space={args.space}")
+    print(f"exact brute force: p50 {percentile(exact_latencies, 50) * 1000:.2f} ms, "
+          f"p99 {percentile(exact_latencies, 99) * 1000:.2f} ms")
+    print(f"{'M':>4s} {'c.ef':>5s} {'build s':>8s} {'s.ef':>5s} {'k':>4s} {'recall':>7s} {'p50 ms':>8s} {'p99 ms':>8s}")
+
+    rows: List[Dict[str, float]] = []
+    workdir = tempfile.mkdtemp(prefix="hnsw-tuning-")
+    try:
+        for m in args.m:
+            for construction_ef in args.construction_ef:
+                directory = os.path.join(workdir, f"m{m}-ef{construction_ef}")
+                build_time = build(directory, args.space, m, construction_ef, ids, texts, metadatas, vectors)
+                for search_ef in args.search_ef:
+                    # A loaded index keeps the search ef it was opened with, so reopen the
+                    # collection the way the app does; the first query loads the index
+                    SharedSystemClient.clear_system_cache()
+                    collection = open_chroma(settings.COLLECTION_NAME, None, directory,
+                                             metadata=hnsw_metadata(args.space, m, construction_ef, search_ef),
+                                             writable=True)._collection
+                    collection.query(query_embeddings=[queries[0].tolist()], n_results=1, include=[])
+                    for k in ks:
+                        latencies, found = time_queries(
+                            lambda q: collection.query(query_embeddings=[q.tolist()], n_results=k,
+                                                       include=[])["ids"][0],
+                            queries
+                        )
+                        row = {
+                            "m": m, "construction_ef": construction_ef, "build_seconds": build_time,
+                            "search_ef": search_ef, "k": k, "recall": recall_at(found, truth, k),
+                            "p50": percentile(latencies, 50), "p99": percentile(latencies, 99),
+                        }
+                        rows.append(row)
+                        print(f"{m:4d} {construction_ef:5d} {build_time:8.2f} {search_ef:5d} {k:4d} "
+                              f"{row['recall']:7.3f} {row['p50'] * 1000:8.2f} {row['p99'] * 1000:8.2f}")
+                shutil.rmtree(directory, ignore_errors=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\nCheapest setting (lowest p99) with recall@k >= {args.target_recall}:")
+    for k in ks:
+        passing = [row for row in rows if row["k"] == k and row["recall"] >= args.target_recall]
+        if not passing:
+            print(f"  k={k}: none; raise --search-ef or --m")
+            continue
+        best = min(passing, key=lambda row: (row["p99"], row["m"]))
+        print(f"  k={k}: HNSW_M = {best['m']}, HNSW_CONSTRUCTION_EF = {best['construction_ef']}, "
+              f"HNSW_SEARCH_EF = {best['search_ef']} (recall {best['recall']:.3f}, p99 {best['p99'] * 1000:.2f} ms)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"chunks": len(ids), "dim": int(vectors.shape[1]), "space": args.space,
+                       "exact_p50": percentile(exact_latencies, 50), "exact_p99": percentile(exact_latencies, 99),
+                       "rows": rows}, f, indent=2)
+        print(f"\nWrote {len(rows)} measurements to {args.json}")
+
+if __name__ == "__main__":
+    main()
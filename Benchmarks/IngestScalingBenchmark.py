@@ -0,0 +1,101 @@
+"""
+Split and embed a synthetic corpus in-process and on ParallelEncoder pools of
+1..N workers, reporting docs/s, chunks/s and speedup, and checking that every
+pool returns exactly the chunks and vectors of the in-process path.
+
+Pool start-up and model loading are timed separately from the work.
+Command: python -m Benchmarks.IngestScalingBenchmark --docs 200 --max-workers 8
+"""
+import argparse
+import os
+import time
+from typing import List
+import numpy as np
+from langchain_core.documents import Document
+from Config.settings import settings
+from Services.ParallelIngestionServices import ParallelEncoder
+from Utils.DoumentLoader import DocumentLoader
+
+def synthetic_pages(count: int, words: int, seed: int) -> List[Document]:
+    """Pages of random words from a small vocabulary, a few thousand tokens each"""
+    rng = np.random.default_rng(seed)
+    vocabulary = [f"term{i}" for i in range(5000)]
+    pages = []
+    for i in range(count):
+        sentences = [
+            " ".join(vocabulary[j] for j in rng.integers(0, len(vocabulary), rng.integers(8, 24))) + "."
+            for _ in range(words // 16)
+        ]
+        pages.append(Document(page_content="\n\n".join(sentences), metadata={"source": f"https://example.com/{i}"}))
+    return pages
+
+def encode_serial(pages: List[Document], batch_size: int):
+    """The single-process path: DocumentLoader's splitter, then the model in batch_size batches"""
+    from langchain_huggingface import HuggingFaceEmbeddings
+    loader = DocumentLoader(chunk_size=settings.CHUNK_SIZE, chunk_overlap=settings.CHUNK_OVERLAP)
+    model = HuggingFaceEmbeddings(model_name=settings.EMBEDDING_MODEL)
+    model.embed_query("warm up")
+
+    start = time.perf_counter()
+    chunks = loader.split_documents(pages)
+    split_time = time.perf_counter() - start
+    texts = [chunk.page_content for chunk in chunks]
+    start = time.perf_counter()
+    vectors = np.concatenate([
+        np.asarray(model.embed_documents(texts[i:i + batch_size]), dtype=np.float32)
+        for i in range(0, len(texts), batch_size)
+    ])
+    return chunks, vectors, split_time, time.perf_counter() - start
+
+def encode_parallel(pages: List[Document], workers: int, batch_size: int):
+    start = time.perf_counter()
+    encoder = ParallelEncoder(workers, settings.CHUNK_SIZE, settings.CHUNK_OVERLAP,
+                              settings.EMBEDDING_MODEL, batch_size=batch_size)
+    try:
+        encoder.warm_up()
+        startup = time.perf_counter() - start
+        start = time.perf_counter()
+        chunks = encoder.split_documents(pages)
+        split_time = time.perf_counter() - start
+        texts = [chunk.page_content for chunk in chunks]
+        start = time.perf_counter()
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        vectors = np.concatenate(encoder.map_batches(batches))
+        return chunks, vectors, split_time, time.perf_counter() - start, startup
+    finally:
+        encoder.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--words", type=int, default=3000, help="approximate words per page")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=settings.EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pages = synthetic_pages(args.docs, args.words, args.seed)
+    chunks, vectors, split_time, embed_time = encode_serial(pages, args.batch_size)
+    serial_total = split_time + embed_time
+    print(f"{len(pages)} pages -> {len(chunks)} chunks, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8s} {'start s':>8s} {'split s':>8s} {'embed s':>8s} {'docs/s':>8s} {'chunks/s':>9s} "
+          f"{'speedup':>8s} {'identical':>10s}")
+    print(f"{'serial':>8s} {0:8.2f} {split_time:8.2f} {embed_time:8.2f} {len(pages) / serial_total:8.1f} "
+          f"{len(chunks) / serial_total:9.1f} {1:8.2f} {'-':>10s}")
+
+    counts = sorted({2 ** i for i in range(args.max_workers.bit_length()) if 2 ** i <= args.max_workers}
+                    | {args.max_workers})
+    for workers in counts:
+        p_chunks, p_vectors, p_split, p_embed, startup = encode_parallel(pages, workers, args.batch_size)
+        total = p_split + p_embed
+        same_chunks = [(c.page_content, c.metadata) for c in p_chunks] == [(c.page_content, c.metadata) for c in chunks]
+        identical = same_chunks and p_vectors.shape == vectors.shape and np.array_equal(p_vectors, vectors)
+        note = "yes" if identical else (
+            f"max|d|={np.abs(p_vectors - vectors).max():.1e}" if same_chunks and p_vectors.shape == vectors.shape
+            else "NO"
+        )
+        print(f"{workers:8d} {startup:8.2f} {p_split:8.2f} {p_embed:8.2f} {len(pages) / total:8.1f} "
+              f"{len(p_chunks) / total:9.1f} {serial_total / total:8.2f} {note:>10s}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Calibrate RELEVANCE_THRESHOLD against the persisted index.
+
+Every example question in Data/RouteExamples.py is embedded and searched
+once (k=1). The "vectorStore" examples are in-domain and should pass the
+gate; the "wikiSearch" and "tavilySearch" examples are off-domain and should
+be gated. The report shows the top relevance score of both groups and, for
+each candidate threshold, the share of in-domain questions it would wrongly
+gate and the share of off-domain questions it catches. The recommended
+threshold is the highest one gating at most --max-false-gate of the
+in-domain questions. Re-run it after changing the embedding model, HNSW_SPACE
+or the URL list.
+Command: python -m Benchmarks.RelevanceCalibration --max-false-gate 0.0
+"""
+import argparse
+import json
+from typing import Dict, List
+import numpy as np
+from Config.settings import settings
+from Data.RouteExamples import ROUTE_EXAMPLES
+from Services.SnapshotServices import SnapshotService
+from Services.VectorStoreServices import VectorStoreService
+
+def top_scores(vector_store, questions: List[str]) -> List[float]:
+    """Relevance score of the best dense hit of each question"""
+    hits = vector_store.batch_similarity_search(questions, k=1)
+    return [docs[0].metadata["relevance_score"] if docs else float("-inf") for docs in hits]
+
+def sweep(in_domain: List[float], off_domain: List[float]) -> List[Dict[str, float]]:
+    """Gate outcome at each observed score; a threshold gates the scores strictly below it"""
+    rows = []
+    for threshold in sorted(set(in_domain + off_domain)):
+        rows.append({
+            "threshold": threshold,
+            "false_gate": sum(score < threshold for score in in_domain) / len(in_domain),
+            "caught": sum(score < threshold for score in off_domain) / len(off_domain),
+        })
+    return rows
+
+def recommend(rows: List[Dict[str, float]], max_false_gate: float) -> Dict[str, float]:
+    allowed = [row for row in rows if row["false_gate"] <= max_false_gate]
+    return allowed[-1] if allowed else {"threshold": float("-inf"), "false_gate": 0.0, "caught": 0.0}
+
+def describe(name: str, scores: List[float]):
+    print(f"{name:>11}: n={len(scores)}, min {min(scores):.3f}, p10 {np.percentile(scores, 10):.3f}, "
+          f"median {np.median(scores):.3f}, max {max(scores):.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-false-gate", type=float, default=0.0,
+                        help="share of in-domain questions the threshold may gate")
+    parser.add_argument("--json", default=None, help="also write the scores and the sweep to this file")
+    args = parser.parse_args()
+
+    directory = None
+    if settings.SNAPSHOTS_ENABLED:
+        snapshots = SnapshotService(settings.SNAPSHOT_ROOT)
+        if snapshots.current() is None:
+            print(f"No snapshot in {settings.SNAPSHOT_ROOT}; run setup.py first")
+            return
+        directory = snapshots.path(snapshots.current())
+    vector_store = VectorStoreService(directory=directory)
+    if not vector_store.count():
+        print("The index is empty; run setup.py first")
+        return
+    in_domain = top_scores(vector_store, ROUTE_EXAMPLES["vectorStore"])
+    off_domain = top_scores(vector_store, ROUTE_EXAMPLES["wikiSearch"] + ROUTE_EXAMPLES["tavilySearch"])
+
+    print(f"Top relevance score, space={settings.HNSW_SPACE}, model={settings.EMBEDDING_MODEL}")
+    describe("in-domain", in_domain)
+    describe("off-domain", off_domain)
+    rows = sweep(in_domain, off_domain)
+    print(f"\n{'threshold':>9} {'in-domain gated':>16} {'off-domain caught':>18}")
+    for row in rows:
+        print(f"{row['threshold']:9.3f} {row['false_gate']:16.1%} {row['caught']:18.1%}")
+    best = recommend(rows, args.max_false_gate)
+    print(f"\nRELEVANCE_THRESHOLD = {best['threshold']:.3f} gates {best['false_gate']:.1%} of in-domain "
+          f"and catches {best['caught']:.1%} of off-domain questions")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"in_domain": in_domain, "off_domain": off_domain, "sweep": rows, "recommended": best}, f,
+                      indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Offline load replay: run a JSONL workload of questions through RAGGraph and
+answer generation with local stand-ins for ChatOpenAI, Wikipedia, Tavily and
+the vector store, then report throughput and per-stage latency percentiles.
+
+Command: python -m Benchmarks.Replay --workload Benchmarks/workload.jsonl --concurrency 8 --output run.json
+Compare: python -m Benchmarks.Replay --output new.json --compare run.json
+"""
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+from Agents.Graph import RAGGraph
+from Agents.BatchingRouter import BatchingQuestionRouter
+from Agents.Router import QuestionRouter
+from Benchmarks.Fakes import FakeChatModel, FakeTavilyTool, FakeVectorStoreService, FakeWikipediaTool, LatencyModel
+from Config.settings import settings
+from Services.GenerationServices import GenerationService
+from Services.RetrievalServices import RetrievalService
+from Services.SearchCacheServices import SearchCache
+
+STAGES = ["route", "vectorStore", "wikiSearch", "tavilySearch", "generate", "end_to_end"]
+
+class Recorder:
+    """Thread-safe collection of latency samples per stage"""
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        self._lock = threading.Lock()
+    
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+    
+    def timed(self, stage: str, fn: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return wrapper
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered) if ordered else 0.0,
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+    }
+
+def load_workload(path: str) -> List[str]:
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            question = json.loads(line).get("question")
+            if question:
+                questions.append(question)
+    return questions
+
+def build_pipeline(args, recorder: Recorder):
+    """RAGGraph and GenerationService wired to seeded fakes, with each stage timed"""
+    def latency(median_ms: float, seed: int) -> LatencyModel:
+        return LatencyModel(median_ms / 1000, kind=args.distribution, spread=args.spread, seed=args.seed + seed)
+
+    router_llm = FakeChatModel(latency=latency(args.router_ms, 1))
+    if args.router_batching:
+        router = BatchingQuestionRouter(llm=router_llm, use_fast_path=False)
+    else:
+        router = QuestionRouter(llm=router_llm, use_fast_path=False)
+    retrieval_service = RetrievalService(
+        wiki=FakeWikipediaTool(latency(args.wiki_ms, 2)),
+        tavily_search=FakeTavilyTool(latency(args.tavily_ms, 3)),
+        # In memory only, so runs never read or leave a cache file
+        cache=SearchCache(ttls=settings.SEARCH_CACHE_TTLS, max_entries=settings.SEARCH_CACHE_MAX_ENTRIES)
+        if args.search_cache else None,
+        use_cache=args.search_cache
+    )
+    graph = RAGGraph(
+        FakeVectorStoreService(latency(args.retrieve_ms, 4)),
+        router=router,
+        retrieval_service=retrieval_service,
+        speculative=args.speculative,
+        use_gate=args.relevance_gate
+    )
+    generation = GenerationService(llm=FakeChatModel(
+        latency=latency(args.llm_ms, 5), token_latency=args.token_ms / 1000
+    ))
+
+    router.route = recorder.timed("route", router.route)
+    graph.retriever.invoke = recorder.timed("vectorStore", graph.retriever.invoke)
+    retrieval_service.search_wikipedia = recorder.timed("wikiSearch", retrieval_service.search_wikipedia)
+    retrieval_service.search_tavily = recorder.timed("tavilySearch", retrieval_service.search_tavily)
+    generation.generate = recorder.timed("generate", generation.generate)
+    return graph, generation
+
+def run(args) -> Dict:
+    questions = load_workload(args.workload) * args.repeat
+    recorder = Recorder()
+    graph, generation = build_pipeline(args, recorder)
+
+    def answer(question: str):
+        result = graph.invoke(question)
+        if result.get("generation"):
+            return result["generation"]
+        return generation.generate(question, result.get("documents", []), result.get("route"))
+
+    timed_answer = recorder.timed("end_to_end", answer)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(timed_answer, questions))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "questions": len(questions),
+        "elapsed": elapsed,
+        "throughput": len(questions) / elapsed if elapsed else 0.0,
+        "stages": {stage: summarize(values) for stage, values in recorder.samples.items() if values},
+        "context_packing": generation.packer.summary() if generation.packer is not None else None,
+        "relevance_gate": graph.gate.summary() if graph.gate is not None else None,
+        "router": graph.router.stats(),
+    }
+
+def print_report(report: Dict):
+    print(f"{report['questions']} questions in {report['elapsed']:.2f}s "
+          f"-> {report['throughput']:.2f} q/s (concurrency {report['config']['concurrency']})")
+    print(f"{'stage':14s} {'count':>6s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+    for stage, s in report["stages"].items():
+        print(f"{stage:14s} {s['count']:6d} {s['p50'] * 1000:9.1f} {s['p95'] * 1000:9.1f} {s['p99'] * 1000:9.1f}")
+    packing = report.get("context_packing")
+    if packing:
+        print(f"context tokens {packing['tokens_in']} -> {packing['tokens_out']} "
+              f"({packing['saved_ratio']:.0%} saved, {packing['duplicates']} duplicates dropped)")
+    gate = report.get("relevance_gate")
+    if gate:
+        print(f"relevance gate {gate['checked']} checked: {gate['canned']} canned "
+              f"({gate['llm_calls_avoided']} LLM calls avoided), {gate['rerouted']} rerouted")
+    router = report.get("router")
+    if router and "batches" in router:
+        print(f"router batching {router['llm']} questions in {router['batches']} batches "
+              f"(mean {router['mean_batch_size']:.1f}): queue wait {router['mean_queue_wait'] * 1000:.1f} ms, "
+              f"service {router['mean_service_time'] * 1000:.1f} ms per question")
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> bool:
+    """Print deltas against a baseline run; True when nothing regressed beyond tolerance"""
+    ok = True
+    print(f"\nvs baseline (tolerance {tolerance:.0%})")
+    base_tp, new_tp = baseline["throughput"], report["throughput"]
+    tp_regressed = base_tp and new_tp < base_tp * (1 - tolerance)
+    print(f"{'throughput':14s} {base_tp:9.2f} -> {new_tp:9.2f} q/s {'REGRESSION' if tp_regressed else ''}")
+    ok = ok and not tp_regressed
+    for stage, s in report["stages"].items():
+        base = baseline["stages"].get(stage)
+        if not base:
+            continue
+        for pct in ("p50", "p95", "p99"):
+            regressed = base[pct] and s[pct] > base[pct] * (1 + tolerance)
+            ok = ok and not regressed
+            change = (s[pct] / base[pct] - 1) if base[pct] else 0.0
+            print(f"{stage:14s} {pct} {base[pct] * 1000:9.1f} -> {s[pct] * 1000:9.1f} ms ({change:+.1%})"
+                  f"{'  REGRESSION' if regressed else ''}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workload", default="Benchmarks/workload.jsonl")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--speculative", action="store_true")
+    parser.add_argument("--search-cache", action="store_true", help="cache Wikipedia/Tavily results in memory")
+    parser.add_argument("--relevance-gate", action="store_true",
+                        help="skip or reroute generation on low-relevance vector-store results")
+    parser.add_argument("--router-batching", action="store_true",
+                        help="micro-batch router LLM calls across concurrent questions")
+    parser.add_argument("--distribution", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--spread", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--router-ms", type=float, default=400)
+    parser.add_argument("--retrieve-ms", type=float, default=30)
+    parser.add_argument("--wiki-ms", type=float, default=300)
+    parser.add_argument("--tavily-ms", type=float, default=800)
+    parser.add_argument("--llm-ms", type=float, default=600)
+    parser.add_argument("--token-ms", type=float, default=0)
+    parser.add_argument("--output", help="write the report as JSON")
+    parser.add_argument("--compare", help="baseline report JSON to diff against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Calibrate ROUTER_FAST_PATH_THRESHOLD against labelled questions.
+
+Every example question in Data/RouteExamples.py is classified by the local
+centroid router built from all the other examples (leave-one-out), so no
+question is scored against a centroid it helped build. The reference route is
+the example's label or, with --llm, the LLM router's answer for it. For each
+candidate threshold the report shows the share of questions the fast path
+would answer and how often those answers agree with the reference. The
+recommended threshold is the lowest one whose short-circuited answers agree
+at least --min-agreement of the time. Re-run it after changing the embedding
+model or the examples.
+Command: python -m Benchmarks.RouterCalibration --min-agreement 1.0 --llm
+"""
+import argparse
+import json
+from typing import Dict, List
+import numpy as np
+from Agents.FastRouter import centroid, nearest
+from Config.settings import settings
+from Data.RouteExamples import ROUTE_EXAMPLES
+from Services.EmbeddingServices import EmbeddingService
+
+def leave_one_out(vectors: Dict[str, np.ndarray]) -> List[Dict]:
+    """Fast-path route and margin of each example against centroids built without it"""
+    labels = list(vectors)
+    centroids = np.stack([centroid(vectors[label]) for label in labels])
+    rows = []
+    for index, label in enumerate(labels):
+        for row, vector in enumerate(vectors[label]):
+            held_out = centroids.copy()
+            held_out[index] = centroid(np.delete(vectors[label], row, axis=0))
+            best, margin = nearest(held_out, vector)
+            rows.append({"label": label, "route": labels[best], "margin": margin})
+    return rows
+
+def sweep(rows: List[Dict]) -> List[Dict[str, float]]:
+    """Fast-path coverage and agreement at each observed margin; a threshold short-circuits margins >= it"""
+    results = []
+    for threshold in sorted({row["margin"] for row in rows}):
+        answered = [row for row in rows if row["margin"] >= threshold]
+        results.append({
+            "threshold": threshold,
+            "coverage": len(answered) / len(rows),
+            "agreement": sum(row["route"] == row["reference"] for row in answered) / len(answered),
+        })
+    return results
+
+def recommend(results: List[Dict[str, float]], min_agreement: float) -> Dict[str, float]:
+    allowed = [row for row in results if row["agreement"] >= min_agreement]
+    return allowed[0] if allowed else {"threshold": float("inf"), "coverage": 0.0, "agreement": 1.0}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-agreement", type=float, default=1.0,
+                        help="share of short-circuited questions that must match the reference route")
+    parser.add_argument("--llm", action="store_true", help="use the LLM router's routes as the reference")
+    parser.add_argument("--json", default=None, help="also write the per-question rows and the sweep to this file")
+    args = parser.parse_args()
+
+    embeddings = EmbeddingService().get_embeddings()
+    vectors = {label: np.asarray(embeddings.embed_documents(questions), dtype=np.float32)
+               for label, questions in ROUTE_EXAMPLES.items()}
+    rows = leave_one_out(vectors)
+    questions = [question for examples in ROUTE_EXAMPLES.values() for question in examples]
+    if args.llm:
+        from Agents.Router import QuestionRouter
+        router = QuestionRouter(use_fast_path=False)
+        references = [router.route(question) for question in questions]
+        label_agreement = sum(ref == row["label"] for ref, row in zip(references, rows)) / len(rows)
+        print(f"LLM router ({settings.LLM_MODEL}) agrees with the labels on {label_agreement:.1%} of questions")
+    else:
+        references = [row["label"] for row in rows]
+    for question, reference, row in zip(questions, references, rows):
+        row["question"], row["reference"] = question, reference
+
+    print(f"Fast path vs {'LLM router' if args.llm else 'labels'}, model={settings.EMBEDDING_MODEL}, "
+          f"{len(rows)} questions (leave-one-out)")
+    results = sweep(rows)
+    print(f"\n{'threshold':>9} {'fast path':>10} {'agreement':>10}")
+    for row in results:
+        print(f"{row['threshold']:9.3f} {row['coverage']:10.1%} {row['agreement']:10.1%}")
+    best = recommend(results, args.min_agreement)
+    print(f"\nROUTER_FAST_PATH_THRESHOLD = {best['threshold']:.3f} answers {best['coverage']:.1%} of questions "
+          f"locally with {best['agreement']:.1%} agreement")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"rows": rows, "sweep": results, "recommended": best}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Compare serial and speculative RAGGraph invocations with stubbed services.
+Command: python -m Benchmarks.SpeculativeBenchmark --route-delay 0.4 --retrieve-delay 0.3
+"""
+import argparse
+import statistics
+import time
+from Agents.Graph import RAGGraph
+from Benchmarks.Fakes import FakeRetrievalService, FakeRouter, FakeVectorStoreService
+
+QUESTIONS = [
+    "What is an LLM agent?",
+    "Explain prompt engineering",
+    "Who is Albert Einstein?",
+    "Latest AI news today",
+]
+
+def time_graph(graph: RAGGraph, rounds: int):
+    timings = []
+    for _ in range(rounds):
+        for question in QUESTIONS:
+            start = time.perf_counter()
+            graph.invoke(question)
+            timings.append(time.perf_counter() - start)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--route-delay", type=float, default=0.4)
+    parser.add_argument("--retrieve-delay", type=float, default=0.3)
+    parser.add_argument("--web-delay", type=float, default=0.8)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    for speculative in (False, True):
+        retrieval_service = FakeRetrievalService(args.web_delay, args.web_delay)
+        graph = RAGGraph(
+            FakeVectorStoreService(args.retrieve_delay),
+            speculative=speculative,
+            router=FakeRouter(args.route_delay),
+            retrieval_service=retrieval_service,
+            use_gate=False
+        )
+        timings = time_graph(graph, args.rounds)
+        label = "speculative" if speculative else "serial"
+        print(f"{label:12s} mean {statistics.mean(timings):.3f}s  max {max(timings):.3f}s  "
+              f"tavily calls {retrieval_service.tavily_calls}")
+
+if __name__ == "__main__":
+    main()
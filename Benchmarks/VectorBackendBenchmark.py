@@ -0,0 +1,139 @@
+"""
+Compare the Chroma collection with the memory-mapped NumPy backend (float16
+and int8) on open time, single-query and batched latency, and recall@k
+against exact float32 cosine search.
+
+Queries are stored chunk embeddings with Gaussian noise added, so no
+embedding model runs. Without --synthetic the existing Chroma collection
+(settings.CHROMA_PERSIST_DIR) is copied into temporary NumPy stores.
+Command: python -m Benchmarks.VectorBackendBenchmark --queries 200 --k 4
+         python -m Benchmarks.VectorBackendBenchmark --synthetic 20000 --dim 384
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from typing import Callable, Dict, List
+import numpy as np
+from langchain_community.vectorstores import Chroma
+from Config.settings import settings
+from Services.NumpyVectorStoreServices import NumpyVectorStore
+
+def percentile(values: List[float], pct: float) -> float:
+    return float(np.percentile(values, pct)) if values else 0.0
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def synthetic_corpus(count: int, dim: int, seed: int):
+    """Clustered unit vectors, roughly the shape of sentence embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, count // 50), dim))
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.5 * rng.normal(size=(count, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"chunk-{i}" for i in range(count)]
+    return ids, [f"synthetic chunk {i}" for i in range(count)], [{"source": "synthetic"} for _ in ids], vectors
+
+def open_chroma(directory: str) -> Chroma:
+    return Chroma(collection_name=settings.COLLECTION_NAME, persist_directory=directory)
+
+def recall(found: List[List[str]], truth: List[List[str]]) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / max(1, sum(len(t) for t in truth))
+
+def time_queries(search: Callable[[np.ndarray], List[str]], queries: np.ndarray):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        latencies.append(time.perf_counter() - start)
+    return latencies, results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=0, help="use N random vectors instead of the Chroma collection")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--noise", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="vector-backends-")
+    try:
+        if args.synthetic:
+            ids, texts, metadatas, vectors = synthetic_corpus(args.synthetic, args.dim, args.seed)
+            chroma_dir = os.path.join(workdir, "chroma")
+            chroma = open_chroma(chroma_dir)
+            for start in range(0, len(ids), 5000):
+                end = start + 5000
+                chroma._collection.add(ids=ids[start:end], embeddings=vectors[start:end].tolist(),
+                                       documents=texts[start:end], metadatas=metadatas[start:end])
+        else:
+            chroma_dir = settings.CHROMA_PERSIST_DIR
+            chroma = open_chroma(chroma_dir)
+            data = chroma._collection.get(include=["embeddings", "documents", "metadatas"])
+            ids, texts = data["ids"], data["documents"]
+            metadatas = [metadata or {} for metadata in data["metadatas"]]
+            vectors = np.asarray(data["embeddings"], dtype=np.float32)
+        if not ids:
+            print(f"No chunks in {chroma_dir}; run setup.py first or pass --synthetic N")
+            return
+
+        rng = np.random.default_rng(args.seed + 1)
+        unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        queries = unit[rng.integers(0, len(unit), args.queries)]
+        queries = queries + args.noise * rng.normal(size=queries.shape) / np.sqrt(queries.shape[1])
+        queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+        k = min(args.k, len(ids))
+
+        exact_scores = queries @ unit.T
+        truth = [[ids[row] for row in np.argsort(-scores)[:k]] for scores in exact_scores]
+
+        rows: Dict[str, Dict[str, float]] = {}
+
+        start = time.perf_counter()
+        chroma = open_chroma(chroma_dir)
+        chroma._collection.count()
+        chroma_open = time.perf_counter() - start
+        latencies, found = time_queries(
+            lambda q: chroma._collection.query(query_embeddings=[q.tolist()], n_results=k, include=[])["ids"][0],
+            queries
+        )
+        start = time.perf_counter()
+        chroma._collection.query(query_embeddings=queries.tolist(), n_results=k, include=[])
+        batch_time = time.perf_counter() - start
+        rows["chroma (hnsw)"] = {
+            "open": chroma_open, "p50": percentile(latencies, 50), "p95": percentile(latencies, 95),
+            "batch": batch_time, "recall": recall(found, truth), "disk": directory_size(chroma_dir),
+        }
+
+        for dtype in ("float16", "int8"):
+            directory = os.path.join(workdir, dtype)
+            # Queries go in as vectors, so the store never needs the embedding model
+            NumpyVectorStore(directory, None, dtype=dtype).add_embeddings(texts, vectors, metadatas, ids)
+            start = time.perf_counter()
+            store = NumpyVectorStore(directory, None, dtype=dtype)
+            store_open = time.perf_counter() - start
+            latencies, found = time_queries(
+                lambda q: [doc.id for doc in store.similarity_search_by_vector(q, k=k)], queries
+            )
+            start = time.perf_counter()
+            store.batch_similarity_search_by_vector(queries, k=k)
+            batch_time = time.perf_counter() - start
+            rows[f"numpy {dtype}"] = {
+                "open": store_open, "p50": percentile(latencies, 50), "p95": percentile(latencies, 95),
+                "batch": batch_time, "recall": recall(found, truth), "disk": directory_size(directory),
+            }
+
+        print(f"{len(ids)} chunks x {vectors.shape[1]} dims, {len(queries)} queries, recall@{k} vs exact float32")
+        print(f"{'backend':16s} {'open ms':>9s} {'p50 ms':>8s} {'p95 ms':>8s} {'batch ms':>9s} {'recall':>7s} {'disk MB':>8s}")
+        for name, r in rows.items():
+            print(f"{name:16s} {r['open'] * 1000:9.1f} {r['p50'] * 1000:8.2f} {r['p95'] * 1000:8.2f} "
+                  f"{r['batch'] * 1000:9.1f} {r['recall']:7.3f} {r['disk'] / 1e6:8.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
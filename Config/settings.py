@@ -27,16 +27,177 @@ class Settings:
     EMBEDDING_MODEL = "all-MiniLM-L6-v2"
     LLM_MODEL = "gpt-5-mini-2025-08-07"
     
+    # Embedding cache: in-process LRU in front of a memory-mapped on-disk store
+    EMBEDDING_CACHE_ENABLED = True
+    EMBEDDING_CACHE_DIR = "./embedding_cache"
+    EMBEDDING_CACHE_LRU_SIZE = 10000
+    EMBEDDING_BATCH_SIZE = 64
+    
+    # Router: local embedding classifier first, LLM only below this confidence margin.
+    # Off until the threshold is calibrated with python -m Benchmarks.RouterCalibration
+    ROUTER_FAST_PATH_ENABLED = False
+    ROUTER_FAST_PATH_THRESHOLD = 0.1
+    # Router micro-batching (Agents/BatchingRouter.py): LLM routing calls arriving
+    # within ROUTER_BATCH_MAX_WAIT seconds of each other, up to ROUTER_BATCH_MAX_SIZE,
+    # go out as one batch() of at most ROUTER_BATCH_CONCURRENCY concurrent requests,
+    # with up to ROUTER_BATCHES_IN_FLIGHT batches at once.
+    # ROUTER_RATE_LIMIT_RPS > 0 caps routing requests per second for the process
+    ROUTER_BATCHING_ENABLED = False
+    ROUTER_BATCH_MAX_SIZE = 16
+    ROUTER_BATCH_MAX_WAIT = 0.02
+    ROUTER_BATCH_CONCURRENCY = 16
+    ROUTER_BATCHES_IN_FLIGHT = 4
+    ROUTER_RATE_LIMIT_RPS = 0
+    
+    # Semantic answer cache shared by all app sessions; TTLs in seconds per answer source
+    ANSWER_CACHE_ENABLED = True
+    ANSWER_CACHE_THRESHOLD = 0.95
+    ANSWER_CACHE_MAX_ENTRIES = 1000
+    ANSWER_CACHE_DEFAULT_TTL = 3600
+    ANSWER_CACHE_TTLS = {
+        "Vector Store": 7 * 24 * 3600,
+        "Wikipedia": 24 * 3600,
+        "Tavily": 10 * 60,
+    }
+    
+    # Speculative retrieval: start retrieval while the router is still deciding.
+    # Wikipedia/Tavily are only speculated when enabled (Tavily calls are paid).
+    SPECULATIVE_RETRIEVAL = False
+    SPECULATE_WIKIPEDIA = False
+    SPECULATE_TAVILY = False
+    SPECULATIVE_WORKERS = 8
+    
     # Chroma settings
     CHROMA_PERSIST_DIR = "./chroma_db"
     COLLECTION_NAME = "rag_chatbot"
+    # HNSW index of the Chroma collection (defaults are Chroma's own). Space, M and
+    # construction ef are fixed when a collection is created, so they take effect
+    # after a rebuild; search ef is applied every time the collection is opened.
+    # python -m Benchmarks.HnswTuningBenchmark measures recall and latency per setting.
+    HNSW_SPACE = "l2"
+    HNSW_M = 16
+    HNSW_CONSTRUCTION_EF = 100
+    HNSW_SEARCH_EF = 100
+    
+    # Versioned snapshots: setup.py builds each refresh into SNAPSHOT_ROOT/<version>
+    # (Chroma files, numpy_store/, lexical index and a snapshot.json manifest) and
+    # then points SNAPSHOT_ROOT/CURRENT at it. The app swaps to a new version within
+    # SNAPSHOT_POLL_INTERVAL seconds. The newest SNAPSHOT_KEEP versions are kept.
+    SNAPSHOTS_ENABLED = False
+    SNAPSHOT_ROOT = "./snapshots"
+    SNAPSHOT_KEEP = 3
+    SNAPSHOT_POLL_INTERVAL = 5.0
+    
+    # Vector backend: "chroma", or "numpy" for exact search over a memory-mapped
+    # float16 / int8 matrix (Services/NumpyVectorStoreServices.py)
+    VECTOR_BACKEND = "chroma"
+    NUMPY_STORE_DIR = "./numpy_store"
+    NUMPY_STORE_DTYPE = "float16"
+    
+    # Sharded storage: one collection (or NumPy directory) per source tag from
+    # Data/Urls.py URL_TAGS ("tag", untagged URLs by domain) or per domain ("domain").
+    # Queries fan out to the shards in parallel; SHARD_PRUNE_TOP > 0 searches only
+    # that many shards, those whose centroid is nearest the question
+    VECTOR_SHARDING_ENABLED = False
+    SHARD_BY = "tag"
+    SHARD_PRUNE_TOP = 0
+    SHARD_QUERY_WORKERS = 8
+    
+    # Hybrid retrieval: BM25 index over the same chunks, fused with the dense
+    # results by reciprocal rank fusion. Saving rewrites the whole index, so writers
+    # save it once LEXICAL_SAVE_EVERY chunks have changed and when they finish
+    HYBRID_RETRIEVAL_ENABLED = True
+    LEXICAL_INDEX_PATH = "./lexical_index.npz"
+    LEXICAL_SAVE_EVERY = 50000
+    BM25_K1 = 1.5
+    BM25_B = 0.75
+    RRF_K = 60
+    
+    # Incremental ingestion: per-URL validators and content digests
+    INGEST_MANIFEST_PATH = os.path.join(CHROMA_PERSIST_DIR, "ingest_manifest.json")
+    
+    # Streaming ingestion: chunks per upsert batch, items buffered between
+    # pipeline stages, and the checkpoint an interrupted run resumes from
+    INGEST_BATCH_SIZE = 64
+    INGEST_QUEUE_SIZE = 4
+    INGEST_CHECKPOINT_PATH = os.path.join(CHROMA_PERSIST_DIR, "ingest_checkpoint.json")
+    INGEST_PROGRESS_INTERVAL = 5.0
+    # Worker processes for splitting and embedding (setup.py --workers); 1 keeps both in-process
+    INGEST_WORKERS = 1
     
     # Document processing
     CHUNK_SIZE = 500
     CHUNK_OVERLAP = 0
+    
+    # URL fetching (setup.py)
+    FETCH_MAX_WORKERS = 16
+    FETCH_PER_HOST_LIMIT = 4
+    FETCH_TIMEOUT = 30
+    FETCH_RETRIES = 2
+    FETCH_BACKOFF = 0.5
+    # Longest a 429/5xx response's Retry-After header may make a fetch wait, in seconds
+    FETCH_MAX_RETRY_AFTER = 30
 
     # Tavily settings
     TAVILY_MAX_RESULTS = 5
+    
+    # Wikipedia/Tavily result cache (RetrievalService): entries are fresh for
+    # the TTL of their source, then served stale for the stale TTL while one
+    # background call refreshes them. SEARCH_CACHE_PATH = None keeps it in memory.
+    SEARCH_CACHE_ENABLED = True
+    SEARCH_CACHE_MAX_ENTRIES = 2000
+    SEARCH_CACHE_TTLS = {
+        "wikipedia": 24 * 3600,
+        "tavily": 10 * 60,
+    }
+    SEARCH_CACHE_STALE_TTLS = {
+        "wikipedia": 7 * 24 * 3600,
+        "tavily": 30 * 60,
+    }
+    SEARCH_CACHE_PATH = "./search_cache.json"
+    
+    # Context packing before generation: near-duplicate passages (MinHash Jaccard
+    # >= threshold) are dropped and the rest fill a token budget per route, in
+    # retrieval order ("relevance") or by maximal marginal relevance ("mmr")
+    CONTEXT_PACKING_ENABLED = True
+    CONTEXT_TOKEN_BUDGETS = {
+        "vectorStore": 1500,
+        "wikiSearch": 400,
+        "tavilySearch": 1000,
+    }
+    CONTEXT_DEFAULT_TOKEN_BUDGET = 1500
+    CONTEXT_DEDUP_THRESHOLD = 0.8
+    CONTEXT_ORDERING = "mmr"
+    CONTEXT_MMR_LAMBDA = 0.7
+    
+    # Relevance gate on vector-store retrieval, off by default. When the best dense hit's
+    # relevance score is below the threshold, the graph answers RELEVANCE_CANNED_ANSWER
+    # ("canned", no LLM call) or reroutes to "wikiSearch" / "tavilySearch" (a paid search
+    # plus generation). The score is LangChain's: 1 - distance for cosine and, for Chroma's
+    # default l2 (squared distance between unit embeddings), 1 - distance/sqrt(2), which is
+    # 1 - sqrt(2) * (1 - cosine); 0.2 is a cosine of about 0.43. It depends on the model and
+    # space, so set it from python -m Benchmarks.RelevanceCalibration on the built index
+    RELEVANCE_GATE_ENABLED = False
+    RELEVANCE_THRESHOLD = 0.2
+    RELEVANCE_GATE_ACTION = "canned"
+    RELEVANCE_CANNED_ANSWER = "I couldn't find anything about that in the knowledge base."
+    
+    # Headless HTTP service (server.py): retrieval micro-batching and load shedding
+    RETRIEVAL_K = 4
+    SERVER_BATCH_MAX_SIZE = 32
+    SERVER_BATCH_MAX_WAIT = 0.01
+    SERVER_QUEUE_SIZE = 256
+    SERVER_MAX_INFLIGHT = 128
+    
+    # Pooled async HTTP client for Wikipedia/Tavily
+    HTTP_TIMEOUT = 10
+    HTTP_MAX_CONNECTIONS = 100
+    
+    # In-process metrics registry (Utils/Metrics.py); off makes every call a no-op.
+    # Context sizes are recorded in characters; METRICS_COUNT_TOKENS also tokenizes every
+    # node's payload and unpacked generation contexts, which is not free on the request path
+    METRICS_ENABLED = True
+    METRICS_COUNT_TOKENS = False
 
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,47 @@
+ROUTE_EXAMPLES = {
+    "vectorStore": [
+        "What is an LLM-powered autonomous agent?",
+        "Explain the planning component of AI agents",
+        "How does task decomposition work in agents?",
+        "What types of memory do LLM agents use?",
+        "How do agents use tools and external APIs?",
+        "What is ReAct prompting?",
+        "What is chain-of-thought prompting?",
+        "Explain few-shot versus zero-shot prompting",
+        "What is prompt engineering?",
+        "How does self-consistency sampling improve reasoning?",
+        "What are adversarial attacks on large language models?",
+        "How do jailbreak prompts work?",
+        "What is a token manipulation attack?",
+        "Explain gradient based attacks on LLMs",
+        "How can red teaming find model vulnerabilities?",
+    ],
+    "wikiSearch": [
+        "Who is Albert Einstein?",
+        "What is the capital of France?",
+        "When was the Eiffel Tower built?",
+        "Who wrote Pride and Prejudice?",
+        "What is photosynthesis?",
+        "Tell me about the Roman Empire",
+        "What is the population of Japan?",
+        "Who painted the Mona Lisa?",
+        "What is the theory of relativity?",
+        "Where is Mount Kilimanjaro?",
+        "What is the history of the Internet?",
+        "Who was the first president of the United States?",
+    ],
+    "tavilySearch": [
+        "Latest AI news today",
+        "Current weather in Paris",
+        "What happened in the stock market today?",
+        "Who won the game last night?",
+        "Breaking news this week",
+        "What is the current price of bitcoin?",
+        "Latest release of the iPhone",
+        "Upcoming elections news",
+        "What are today's top headlines?",
+        "Recent announcements from OpenAI this month",
+        "Traffic update for my commute right now",
+        "What movies are in theaters this weekend?",
+    ],
+}
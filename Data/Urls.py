@@ -2,4 +2,11 @@ URLS = [
     "https://lilianweng.github.io/posts/2023-06-23-agent/",
     "https://lilianweng.github.io/posts/2023-03-15-prompt-engineering/",
     "https://lilianweng.github.io/posts/2023-10-25-adv-attack-1lm/",
-]
\ No newline at end of file
+]
+
+# Shard of each URL when VECTOR_SHARDING_ENABLED with SHARD_BY = "tag"; untagged URLs shard by domain
+URL_TAGS = {
+    "https://lilianweng.github.io/posts/2023-06-23-agent/": "agents",
+    "https://lilianweng.github.io/posts/2023-03-15-prompt-engineering/": "prompt-engineering",
+    "https://lilianweng.github.io/posts/2023-10-25-adv-attack-1lm/": "adversarial-attacks",
+}
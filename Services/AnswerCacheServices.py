@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+@dataclass
+class CachedAnswer:
+    vector: np.ndarray
+    answer: str
+    source: str
+    expires_at: float
+
+class SemanticAnswerCache:
+    """
+    Process-wide cache of generated answers keyed by question embedding.
+
+    A lookup returns the answer of the most similar cached question when the
+    cosine similarity clears `threshold`. Entries expire after a per-source TTL,
+    the least recently used entry is evicted beyond `max_entries`, and the whole
+    cache is dropped when the knowledge-base version it was filled against changes.
+    """
+    def __init__(self, embeddings: Embeddings, threshold: float = 0.95, max_entries: int = 1000,
+                 ttls: Optional[Dict[str, float]] = None, default_ttl: float = 3600):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+    
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+    
+    def _check_version(self, version: Optional[str]):
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+    
+    def _purge_expired(self, now: float):
+        for entry_id in [i for i, e in self._entries.items() if e.expires_at <= now]:
+            del self._entries[entry_id]
+    
+    def lookup(self, question: str, version: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        """(answer, source) of the closest cached question, or None"""
+        vector = self._embed(question)
+        with self._lock:
+            self._check_version(version)
+            self._purge_expired(time.time())
+            if self._entries:
+                ids = list(self._entries)
+                scores = np.stack([self._entries[i].vector for i in ids]) @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self._entries.move_to_end(ids[best])
+                    self.hits += 1
+                    entry = self._entries[ids[best]]
+                    return entry.answer, entry.source
+            self.misses += 1
+            return None
+    
+    def store(self, question: str, answer: str, source: str, version: Optional[str] = None):
+        """Cache an answer with the TTL configured for its source"""
+        vector = self._embed(question)
+        ttl = self.ttls.get(source, self.default_ttl)
+        with self._lock:
+            self._check_version(version)
+            self._entries[self._next_id] = CachedAnswer(vector, answer, source, time.time() + ttl)
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
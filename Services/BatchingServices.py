@@ -0,0 +1,103 @@
+import asyncio
+from typing import List, Optional, Tuple
+from langchain_core.documents import Document
+from Services.VectorStoreServices import VectorStoreService
+
+class QueueFullError(Exception):
+    """Raised when the batcher cannot take more work; callers should shed load (HTTP 429)"""
+
+class QueryBatcher:
+    """
+    Micro-batches concurrent vector-store lookups.
+
+    Queries submitted within `max_wait` seconds of each other (up to
+    `max_batch_size`) are embedded and searched together through
+    VectorStoreService.batch_similarity_search, off the event loop.
+    At most `max_queue` queries may wait; beyond that submit() raises QueueFullError.
+    """
+    def __init__(self, vector_store_service: VectorStoreService, k: int = 4,
+                 max_batch_size: int = 32, max_wait: float = 0.01, max_queue: int = 256):
+        self.vector_store_service = vector_store_service
+        self.k = k
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue: "asyncio.Queue[Tuple[str, asyncio.Future]]" = asyncio.Queue(maxsize=max_queue)
+        self.batches = 0
+        self.queries = 0
+        self._worker: Optional[asyncio.Task] = None
+    
+    def start(self):
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+    
+    async def submit(self, question: str) -> List[Document]:
+        # Started on first use, so a batcher can be built off the event loop (e.g. by a snapshot swap)
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((question, future))
+        except asyncio.QueueFull:
+            raise QueueFullError(f"retrieval queue is full ({self.queue.maxsize} waiting)")
+        return await future
+    
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+    
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            pending = [(q, f) for q, f in batch if not f.cancelled()]
+            if not pending:
+                continue
+            try:
+                results = await asyncio.to_thread(
+                    self.vector_store_service.batch_similarity_search, [q for q, _ in pending], self.k
+                )
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.queries += len(pending)
+            for (_, future), documents in zip(pending, results):
+                if not future.done():
+                    future.set_result(documents)
+    
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "mean_batch_size": self.queries / self.batches if self.batches else 0.0,
+            "queued": self.queue.qsize(),
+        }
+
+class BatchingRetriever:
+    """Retriever for RAGGraph whose async lookups go through a QueryBatcher"""
+    def __init__(self, batcher: QueryBatcher):
+        self.batcher = batcher
+    
+    def invoke(self, question: str) -> List[Document]:
+        return self.batcher.vector_store_service.similarity_search(question, k=self.batcher.k)
+    
+    async def ainvoke(self, question: str) -> List[Document]:
+        return await self.batcher.submit(question)
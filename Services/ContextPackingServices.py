@@ -0,0 +1,218 @@
+import re
+import threading
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import numpy as np
+import tiktoken
+from langchain_core.documents import Document
+from Services.LexicalIndexServices import tokenize
+from Utils.Metrics import metrics
+from Utils.Tokens import get_encoder
+
+# Mersenne prime for the universal hash family (a * x + b) mod p
+_MINHASH_PRIME = (1 << 61) - 1
+# Start of each block in RetrievalService's formatted Tavily results
+_WEB_RESULT_START = re.compile(r"(?m)^(?=Result \d+:\n)")
+
+def split_web_results(documents: List[Document]) -> List[Document]:
+    """One document per "Result i:" block, so each search result is deduplicated and budgeted on its own"""
+    passages = []
+    for doc in documents:
+        blocks = [block.strip() for block in _WEB_RESULT_START.split(doc.page_content) if block.strip()]
+        if len(blocks) <= 1:
+            passages.append(doc)
+            continue
+        passages.extend(Document(page_content=block, metadata=dict(doc.metadata)) for block in blocks)
+    return passages
+
+class MinHasher:
+    """MinHash signatures over word shingles; equal slots estimate Jaccard similarity"""
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3, seed: int = 0):
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MINHASH_PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MINHASH_PRIME, num_perm, dtype=np.uint64)
+    
+    def shingles(self, text: str) -> np.ndarray:
+        terms = tokenize(text)
+        n = min(self.shingle_size, len(terms)) or 1
+        grams = {" ".join(terms[i:i + n]) for i in range(max(1, len(terms) - n + 1))}
+        return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams))
+    
+    def signature(self, text: str) -> np.ndarray:
+        hashes = self.shingles(text)
+        # crc32 values and the coefficients stay below 2**61, so the product wraps
+        # uint64 at most; the result is still a fixed pseudo-random permutation per slot
+        return ((np.outer(hashes, self._a) + self._b) % _MINHASH_PRIME).min(axis=0)
+    
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        return float(np.mean(a == b))
+
+@dataclass
+class PackedContext:
+    """Result of ContextPacker.pack: the kept documents and what was cut"""
+    documents: List[Document]
+    context: str
+    tokens_in: int
+    tokens_out: int
+    budget: int
+    duplicates: int = 0
+    over_budget: int = 0
+    truncated: bool = False
+    
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_in - self.tokens_out
+
+@dataclass
+class PackingStats:
+    calls: int = 0
+    tokens_in: int = 0
+    tokens_out: int = 0
+    duplicates: int = 0
+    over_budget: int = 0
+    truncated: int = 0
+    by_route: Dict[str, int] = field(default_factory=dict)
+
+class ContextPacker:
+    """
+    Fits retrieved documents into a per-route token budget before generation.
+
+    Web results are split into one passage per result, near-duplicates
+    (MinHash Jaccard estimate >= dedup_threshold) are dropped, and the rest are
+    taken in retrieval order ("relevance") or by maximal marginal relevance
+    ("mmr": relevance traded off against similarity to passages already
+    taken) until the budget is full. MMR relevance is the retriever's
+    metadata["relevance_score"] when every passage has one, else retrieval
+    rank. Tokens are counted with the encoder DocumentLoader chunks with,
+    unless one is passed in. A first passage larger than the whole budget is
+    truncated rather than dropped, so the context is never empty.
+    """
+    def __init__(self, budgets: Optional[Dict[str, int]] = None, default_budget: int = 1500,
+                 dedup_threshold: float = 0.8, ordering: str = "mmr", mmr_lambda: float = 0.7,
+                 num_perm: int = 64, separator: str = "\n\n", encoder: Optional[tiktoken.Encoding] = None):
+        if ordering not in ("relevance", "mmr"):
+            raise ValueError(f"Unknown context ordering: {ordering}")
+        self.budgets = budgets or {}
+        self.default_budget = default_budget
+        self.dedup_threshold = dedup_threshold
+        self.ordering = ordering
+        self.mmr_lambda = mmr_lambda
+        self.separator = separator
+        self.hasher = MinHasher(num_perm=num_perm)
+        self._encoder = encoder
+        self.stats = PackingStats()
+        self._lock = threading.Lock()
+    
+    @property
+    def encoder(self) -> tiktoken.Encoding:
+        if self._encoder is None:
+            self._encoder = get_encoder()
+        return self._encoder
+    
+    def count_tokens(self, text: str) -> int:
+        return len(self.encoder.encode(text, disallowed_special=()))
+    
+    def budget_for(self, route: Optional[str]) -> int:
+        return self.budgets.get(route, self.default_budget)
+    
+    @staticmethod
+    def _relevance(passages: List[Document]) -> List[float]:
+        """0-1 relevance of each passage: its clipped relevance score, or its rank when any is unscored"""
+        count = len(passages)
+        if all("relevance_score" in doc.metadata for doc in passages):
+            return [min(1.0, max(0.0, float(doc.metadata["relevance_score"]))) for doc in passages]
+        return [1.0 - rank / count for rank in range(count)]
+    
+    def _order(self, passages: List[Document], signatures: List[np.ndarray]) -> List[int]:
+        """Passage indices in the order they should fill the budget"""
+        count = len(signatures)
+        if self.ordering == "relevance" or count < 3:
+            return list(range(count))
+        relevance = self._relevance(passages)
+        first = max(range(count), key=lambda i: relevance[i])
+        order = [first]
+        remaining = [i for i in range(count) if i != first]
+        while remaining:
+            best = max(remaining, key=lambda i: self.mmr_lambda * relevance[i] - (1 - self.mmr_lambda) * max(
+                self.hasher.similarity(signatures[i], signatures[j]) for j in order
+            ))
+            order.append(best)
+            remaining.remove(best)
+        return order
+    
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        encoder = self.encoder
+        return encoder.decode(encoder.encode(text, disallowed_special=())[:max_tokens])
+    
+    def pack(self, documents: List[Document], route: Optional[str] = None) -> PackedContext:
+        """Deduplicate, order and trim documents to the route's token budget"""
+        budget = self.budget_for(route)
+        tokens_in = self.count_tokens(self.separator.join(doc.page_content for doc in documents))
+        passages = [doc for doc in split_web_results(documents) if doc.page_content.strip()]
+
+        # Drop near-duplicates, keeping the better-ranked copy
+        signatures, unique = [], []
+        for doc in passages:
+            signature = self.hasher.signature(doc.page_content)
+            if any(self.hasher.similarity(signature, kept) >= self.dedup_threshold for kept in signatures):
+                continue
+            signatures.append(signature)
+            unique.append(doc)
+        duplicates = len(passages) - len(unique)
+
+        # First fit: a passage that does not fit is skipped, smaller later ones may still go in
+        separator_tokens = self.count_tokens(self.separator)
+        kept: List[Document] = []
+        used = 0
+        truncated = False
+        for i in self._order(unique, signatures):
+            doc = unique[i]
+            tokens = self.count_tokens(doc.page_content) + (separator_tokens if kept else 0)
+            if used + tokens <= budget:
+                kept.append(doc)
+                used += tokens
+            elif not kept and budget > 0:
+                kept.append(Document(page_content=self._truncate(doc.page_content, budget), metadata=doc.metadata))
+                used = budget
+                truncated = True
+
+        context = self.separator.join(doc.page_content for doc in kept)
+        packed = PackedContext(
+            documents=kept, context=context, tokens_in=tokens_in, tokens_out=self.count_tokens(context),
+            budget=budget, duplicates=duplicates, over_budget=len(unique) - len(kept), truncated=truncated
+        )
+        self._record(packed, route)
+        return packed
+    
+    def _record(self, packed: PackedContext, route: Optional[str]):
+        route = route or "unknown"
+        stats = self.stats
+        with self._lock:
+            stats.calls += 1
+            stats.tokens_in += packed.tokens_in
+            stats.tokens_out += packed.tokens_out
+            stats.duplicates += packed.duplicates
+            stats.over_budget += packed.over_budget
+            stats.truncated += int(packed.truncated)
+            stats.by_route[route] = stats.by_route.get(route, 0) + packed.tokens_saved
+        metrics.observe("context_tokens_saved", packed.tokens_saved, route=route)
+        metrics.inc("context_passages_dropped_total", packed.duplicates, route=route, reason="duplicate")
+        metrics.inc("context_passages_dropped_total", packed.over_budget, route=route, reason="budget")
+    
+    def summary(self) -> Dict[str, float]:
+        """Totals across every pack() call, with tokens saved per route"""
+        stats = self.stats
+        return {
+            "calls": stats.calls,
+            "tokens_in": stats.tokens_in,
+            "tokens_out": stats.tokens_out,
+            "tokens_saved": stats.tokens_in - stats.tokens_out,
+            "saved_ratio": (stats.tokens_in - stats.tokens_out) / stats.tokens_in if stats.tokens_in else 0.0,
+            "duplicates": stats.duplicates,
+            "over_budget": stats.over_budget,
+            "truncated": stats.truncated,
+            "saved_by_route": dict(stats.by_route),
+        }
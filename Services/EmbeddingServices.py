@@ -1,16 +1,282 @@
-from langchain_huggingface import HuggingFaceEmbeddings
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
 from Config.settings import settings
+from Utils.Metrics import metrics
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize and collapse whitespace so trivially different strings share a cache entry"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive OS lock on `path`, held across processes until the block exits"""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class DiskEmbeddingStore:
+    """
+    Append-only on-disk embedding table for one model.
+
+    vectors.f32 holds contiguous float32 rows and is read through a memory map;
+    index.txt holds one key per line, line n being row n. Rows are written
+    before their keys, so a crash mid-append only loses the unindexed tail.
+    Several processes (app, server, setup.py) may share the directory: appends
+    hold an OS lock on the lock file and first pick up the rows others wrote,
+    so the tail they trim is always past the on-disk index.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.index_path = os.path.join(directory, "index.txt")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.lock_path = os.path.join(directory, "lock")
+        self.dim: Optional[int] = None
+        self.rows: Dict[str, int] = {}
+        # Rows and bytes of index.txt read so far
+        self._indexed = 0
+        self._index_bytes = 0
+        self._matrix: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        with self._lock, _file_lock(self.lock_path):
+            self._refresh()
+    
+    def _refresh(self):
+        """Read index lines appended since the last refresh, by this or any other process"""
+        if self.dim is None:
+            if not os.path.exists(self.meta_path):
+                return
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        stored_rows = os.path.getsize(self.vectors_path) // (4 * self.dim) if os.path.exists(self.vectors_path) else 0
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_bytes)
+            tail = f.read()
+        added = {}
+        consumed = 0
+        # A torn last line (no newline yet) is left for the next refresh or trimmed by the next append
+        for line in tail.splitlines(keepends=True):
+            if not line.endswith(b"\n") or self._indexed + len(added) >= stored_rows:
+                break
+            added[line.decode("utf-8").strip()] = self._indexed + len(added)
+            consumed += len(line)
+        if not added:
+            return
+        self._remap(self._indexed + len(added))
+        self.rows.update(added)
+        self._indexed += len(added)
+        self._index_bytes += consumed
+    
+    def _remap(self, count: int):
+        self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(count, self.dim)) if count else None
+    
+    def get(self, key: str) -> Optional[np.ndarray]:
+        row = self.rows.get(key)
+        if row is None:
+            return None
+        return np.array(self._matrix[row])
+    
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        with self._lock, _file_lock(self.lock_path):
+            self._refresh()
+            fresh = [i for i, key in enumerate(keys) if key not in self.rows]
+            if not fresh:
+                return
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+            start = self._indexed
+            # Under the lock everything past the on-disk index is the tail of an interrupted append
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(start * 4 * self.dim)
+                np.ascontiguousarray(vectors[fresh], dtype=np.float32).tofile(f)
+            lines = "".join(keys[i] + "\n" for i in fresh).encode("utf-8")
+            with open(self.index_path, "ab") as f:
+                f.truncate(self._index_bytes)
+                f.write(lines)
+            # Map the grown file before publishing the new rows to readers
+            self._remap(start + len(fresh))
+            for offset, i in enumerate(fresh):
+                self.rows[keys[i]] = start + offset
+            self._indexed += len(fresh)
+            self._index_bytes += len(lines)
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper memoizing vectors by (model name, normalized text hash).
+
+    Lookups go in-process LRU -> on-disk store -> model; all misses of a call
+    are deduplicated and encoded with embed_documents in batches of batch_size.
+    Only document vectors are persisted; query vectors live in the LRU.
+    """
+    def __init__(self, embeddings: Embeddings, model_name: str, cache_dir: Optional[str] = None,
+                 lru_size: int = 10000, batch_size: int = 64):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.lru_size = lru_size
+        self.batch_size = batch_size
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk = DiskEmbeddingStore(os.path.join(cache_dir, re.sub(r"[^\w.-]", "_", model_name))) if cache_dir else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+    
+    def _key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+    
+    def _lookup(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                metrics.inc("embedding_cache_total", result="memory")
+                return vector
+        if self.disk is not None:
+            vector = self.disk.get(key)
+            if vector is not None:
+                self._remember(key, vector)
+                with self._lock:
+                    self.disk_hits += 1
+                metrics.inc("embedding_cache_total", result="disk")
+                return vector
+        return None
+    
+    def _remember(self, key: str, vector: np.ndarray):
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+    
+    def embed_documents(self, texts: List[str], encoder=None, persist: bool = True) -> List[List[float]]:
+        """
+        Vectors for texts, from the cache where possible. An `encoder` with
+        map_batches (ParallelEncoder) encodes the same batches of misses on its
+        worker processes instead of the wrapped model. With persist=False misses
+        are only kept in the LRU, not written to disk.
+        """
+        keys = [self._key(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key in found or key in missing:
+                continue
+            vector = self._lookup(key)
+            if vector is None:
+                missing[key] = text
+            else:
+                found[key] = vector
+
+        missing_keys = list(missing)
+        with self._lock:
+            self.misses += len(missing_keys)
+        metrics.inc("embedding_cache_total", len(missing_keys), result="miss")
+        key_batches = [missing_keys[start:start + self.batch_size] for start in range(0, len(missing_keys), self.batch_size)]
+        for batch_keys, vectors in zip(key_batches, self._encode(key_batches, missing, encoder)):
+            if self.disk is not None and persist:
+                self.disk.put_many(batch_keys, vectors)
+            for key, vector in zip(batch_keys, vectors):
+                self._remember(key, vector)
+                found[key] = vector
+
+        return [found[key].tolist() for key in keys]
+    
+    def _encode(self, key_batches: List[List[str]], texts: Dict[str, str], encoder) -> Iterator[np.ndarray]:
+        if encoder is not None:
+            with metrics.timer("embedding_seconds"):
+                encoded = encoder.map_batches([[texts[key] for key in batch] for batch in key_batches])
+            for batch_keys, vectors in zip(key_batches, encoded):
+                metrics.observe("embedding_batch_texts", len(batch_keys))
+                yield vectors
+            return
+        for batch_keys in key_batches:
+            with metrics.timer("embedding_seconds"):
+                vectors = np.asarray(self.embeddings.embed_documents([texts[key] for key in batch_keys]), dtype=np.float32)
+            metrics.observe("embedding_batch_texts", len(batch_keys))
+            yield vectors
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Questions stay in the bounded LRU; only documents grow the disk store"""
+        return self.embed_documents([text], persist=False)[0]
+    
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters since start-up"""
+        return {
+            "memory_hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "lru_entries": len(self._lru),
+            "disk_entries": len(self.disk.rows) if self.disk is not None else 0,
+        }
 
 class EmbeddingService:
     _instance = None
+    # The app warms the model up on a background thread while the UI thread may ask for it too
+    _instance_lock = threading.Lock()
     
     def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance.embeddings = HuggingFaceEmbeddings(
-                model_name=settings.EMBEDDING_MODEL
-            )
+        with cls._instance_lock:
+            if cls._instance is None:
+                # Imported here: sentence-transformers/torch dominate start-up time
+                from langchain_huggingface import HuggingFaceEmbeddings
+                instance = super().__new__(cls)
+                embeddings = HuggingFaceEmbeddings(
+                    model_name=settings.EMBEDDING_MODEL
+                )
+                if settings.EMBEDDING_CACHE_ENABLED:
+                    embeddings = CachedEmbeddings(
+                        embeddings,
+                        model_name=settings.EMBEDDING_MODEL,
+                        cache_dir=settings.EMBEDDING_CACHE_DIR,
+                        lru_size=settings.EMBEDDING_CACHE_LRU_SIZE,
+                        batch_size=settings.EMBEDDING_BATCH_SIZE
+                    )
+                instance.embeddings = embeddings
+                cls._instance = instance
         return cls._instance
     
     def get_embeddings(self):
-        return self.embeddings
\ No newline at end of file
+        return self.embeddings
+    
+    def warm_up(self):
+        """Encode a dummy text through the model itself, bypassing the cache, to trigger lazy init and allocation"""
+        model = self.embeddings.embeddings if isinstance(self.embeddings, CachedEmbeddings) else self.embeddings
+        model.embed_query("warm up")
+    
+    def cache_stats(self) -> Dict[str, int]:
+        """Embedding cache counters, empty when the cache is disabled"""
+        if isinstance(self.embeddings, CachedEmbeddings):
+            return self.embeddings.stats()
+        return {}
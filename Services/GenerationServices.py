@@ -0,0 +1,132 @@
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.prompts import ChatPromptTemplate
+from Config.settings import settings
+from Services.ContextPackingServices import ContextPacker
+from Utils.Metrics import metrics
+from Utils.Tokens import count_tokens
+
+ANSWER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are a helpful assistant. Answer the question based on the context provided. 
+            If the context doesn't contain relevant information, say so clearly.
+            
+            Context: {context}"""),
+    ("human", "{question}")
+])
+
+class GenerationStream:
+    """
+    Iterable over answer tokens as the model produces them.
+    After iteration, text holds the full answer and time_to_first_token / total_time the timings.
+    """
+    def __init__(self, service: "GenerationService", inputs: Dict[str, str]):
+        self.service = service
+        self.inputs = inputs
+        self.text = ""
+        self.time_to_first_token: Optional[float] = None
+        self.total_time: Optional[float] = None
+    
+    def __iter__(self) -> Iterator[str]:
+        start = time.perf_counter()
+        parts = []
+        for chunk in self.service.chain.stream(self.inputs):
+            if not chunk.content:
+                continue
+            if self.time_to_first_token is None:
+                self.time_to_first_token = time.perf_counter() - start
+            parts.append(chunk.content)
+            yield chunk.content
+        self.total_time = time.perf_counter() - start
+        self.text = "".join(parts)
+        self.service._record(self.time_to_first_token, self.total_time)
+
+class GenerationService:
+    """
+    Answer generation over one long-lived chat client and prompt chain.
+    Unless packing is off, documents go through a ContextPacker first: near-duplicates
+    are dropped and the rest trimmed to the token budget of the route they came from.
+    """
+    def __init__(self, llm: Optional[BaseChatModel] = None, packer: Optional[ContextPacker] = None,
+                 use_packing: Optional[bool] = None):
+        if llm is None:
+            from langchain_openai import ChatOpenAI
+            llm = ChatOpenAI(model=settings.LLM_MODEL, temperature=0.7)
+        self.llm = llm
+        if use_packing is None:
+            use_packing = settings.CONTEXT_PACKING_ENABLED
+        if packer is None and use_packing:
+            packer = ContextPacker(
+                budgets=settings.CONTEXT_TOKEN_BUDGETS,
+                default_budget=settings.CONTEXT_DEFAULT_TOKEN_BUDGET,
+                dedup_threshold=settings.CONTEXT_DEDUP_THRESHOLD,
+                ordering=settings.CONTEXT_ORDERING,
+                mmr_lambda=settings.CONTEXT_MMR_LAMBDA
+            )
+        self.packer = packer
+        self.chain = ANSWER_PROMPT | self.llm
+        self.calls = 0
+        # Streamed calls only: a non-streamed call has no first token to time
+        self.ttft_samples = 0
+        self.total_ttft = 0.0
+        self.total_time = 0.0
+        self._lock = threading.Lock()
+    
+    def _inputs(self, question: str, documents: List[Document], route: Optional[str] = None) -> Dict[str, str]:
+        tokens = None
+        if self.packer is not None:
+            packed = self.packer.pack(documents, route)
+            context, tokens = packed.context, packed.tokens_out
+        else:
+            context = "\n\n".join([doc.page_content for doc in documents])
+        if metrics.enabled:
+            metrics.observe("generation_context_chars", len(context))
+            # The packer has already counted its output; anything else is only tokenized on request
+            if tokens is None and settings.METRICS_COUNT_TOKENS:
+                tokens = count_tokens(context)
+            if tokens is not None:
+                metrics.observe("generation_context_tokens", tokens)
+        return {"context": context, "question": question}
+    
+    def stream(self, question: str, documents: List[Document], route: Optional[str] = None) -> GenerationStream:
+        """Stream the answer token by token; route picks the context token budget"""
+        inputs = self._inputs(question, documents, route)
+        return GenerationStream(self, inputs)
+    
+    def generate(self, question: str, documents: List[Document], route: Optional[str] = None) -> str:
+        """Generate the full answer"""
+        stream = self.stream(question, documents, route)
+        for _ in stream:
+            pass
+        return stream.text
+    
+    async def agenerate(self, question: str, documents: List[Document], route: Optional[str] = None) -> str:
+        """Generate the full answer without blocking the event loop"""
+        inputs = self._inputs(question, documents, route)
+        start = time.perf_counter()
+        response = await self.chain.ainvoke(inputs)
+        elapsed = time.perf_counter() - start
+        self._record(None, elapsed)
+        return response.content
+    
+    def _record(self, ttft: Optional[float], total: float):
+        with self._lock:
+            self.calls += 1
+            if ttft is not None:
+                self.ttft_samples += 1
+                self.total_ttft += ttft
+            self.total_time += total
+        if ttft is not None:
+            metrics.observe("generation_ttft_seconds", ttft)
+        metrics.observe("generation_seconds", total)
+    
+    def stats(self) -> Dict[str, float]:
+        """Mean time-to-first-token over streamed calls and mean total generation time over all calls"""
+        return {
+            "calls": self.calls,
+            "streamed": self.ttft_samples,
+            "mean_ttft": self.total_ttft / self.ttft_samples if self.ttft_samples else 0.0,
+            "mean_total": self.total_time / self.calls if self.calls else 0.0,
+        }
@@ -0,0 +1,317 @@
+import hashlib
+import itertools
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Union
+from langchain_core.documents import Document
+from Config.settings import settings
+from Services.EmbeddingServices import CachedEmbeddings
+from Services.ParallelIngestionServices import ParallelEncoder
+from Services.VectorStoreServices import VectorStoreService
+from Utils.DoumentLoader import DocumentLoader, FetchResult
+from Utils.Metrics import metrics
+from Utils.Pipeline import Pipeline, StageStats
+
+def content_digest(text: str) -> str:
+    """sha256 hex digest of a piece of text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def chunk_id(chunk: Document) -> str:
+    """Stable id for a chunk: the hash of its source and its content"""
+    return content_digest(f"{chunk.metadata.get('source', '')}\n{chunk.page_content}")
+
+@dataclass
+class PageDone:
+    """Outcome of one URL; applied to the manifest once all its new chunks are upserted"""
+    url: str
+    status: str
+    entry: Optional[dict] = None
+    stale_ids: List[str] = field(default_factory=list)
+    added: int = 0
+
+@dataclass
+class SplitPage:
+    """New chunks of one page, followed by its PageDone"""
+    done: PageDone
+    ids: List[str] = field(default_factory=list)
+    chunks: List[Document] = field(default_factory=list)
+
+@dataclass
+class ChangedPage:
+    """A page whose text changed and has to be split"""
+    url: str
+    result: FetchResult
+    digest: str
+
+@dataclass
+class EmbeddedBatch:
+    """Up to batch_size embedded chunks, plus the pages whose last chunk is in it or before it"""
+    ids: List[str]
+    chunks: List[Document]
+    embeddings: List[List[float]]
+    pages: List[PageDone]
+
+class IngestCheckpoint:
+    """
+    URLs fully processed by a run that has not finished yet.
+
+    Tied to the URL list and mode it was written for; a run over a different
+    list starts from scratch. Deleted once the run completes.
+    """
+    def __init__(self, path: str, urls: List[str], force: bool):
+        self.path = path
+        self.key = content_digest(json.dumps({"urls": urls, "force": force}))
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("key") == self.key:
+                self.done = set(data.get("done", []))
+    
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": self.key, "done": sorted(self.done)}, f)
+        os.replace(tmp_path, self.path)
+    
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class IngestionService:
+    """
+    Incremental ingestion of a URL list into the vector store.
+
+    A JSON manifest keeps, per URL, the ETag / Last-Modified validators and a
+    digest of the page text. Unchanged pages are skipped (304 or same digest),
+    changed pages only upsert the chunks whose content hash is new and delete
+    the ones that went away, and URLs dropped from the list lose their chunks.
+
+    Pages stream through fetch -> split -> embed -> upsert stages on their own
+    threads, joined by bounded queues, so memory stays flat with corpus size.
+    Upserts go in fixed-size batches; after each one the manifest and a
+    checkpoint of completed URLs are saved, so an interrupted run resumes
+    after the last page it finished.
+    
+    With a ParallelEncoder, splitting and embedding run on its worker
+    processes, and batches grow to one embedding batch per worker.
+    """
+    def __init__(self, vector_store: VectorStoreService, loader: DocumentLoader,
+                 manifest_path: str = settings.INGEST_MANIFEST_PATH,
+                 checkpoint_path: str = settings.INGEST_CHECKPOINT_PATH,
+                 batch_size: int = settings.INGEST_BATCH_SIZE,
+                 queue_size: int = settings.INGEST_QUEUE_SIZE,
+                 progress_interval: float = settings.INGEST_PROGRESS_INTERVAL,
+                 encoder: Optional[ParallelEncoder] = None):
+        self.vector_store = vector_store
+        self.loader = loader
+        self.manifest_path = manifest_path
+        self.checkpoint_path = checkpoint_path
+        self.encoder = encoder
+        if encoder is not None:
+            batch_size = max(batch_size, encoder.workers * encoder.batch_size)
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.progress_interval = progress_interval
+        self.manifest = self._load_manifest()
+        self.stages: Dict[str, StageStats] = {}
+    
+    def _load_manifest(self) -> Dict[str, dict]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    
+    def _save_manifest(self):
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+    
+    def _record(self, stage: str, items: int, seconds: float):
+        self.stages[stage].add(items, seconds)
+        metrics.inc("ingest_stage_items_total", items, stage=stage)
+        metrics.observe("ingest_stage_seconds", seconds, stage=stage)
+    
+    def ingest(self, urls: List[str], force: bool = False, prune: bool = True) -> Dict[str, int]:
+        """
+        Bring the vector store in line with `urls`.
+        With force=True every page is re-fetched and re-diffed, ignoring the manifest validators.
+        With prune=False pages missing from `urls` are kept, so a subset (e.g. one shard) can be refreshed.
+        Returns counters: unchanged / changed / failed / removed / resumed pages, added / deleted chunks.
+        """
+        stats = {"unchanged": 0, "changed": 0, "failed": 0, "removed": 0, "resumed": 0, "added": 0, "deleted": 0}
+        self.stages = {
+            "fetch": StageStats("fetch", "docs"),
+            "split": StageStats("split", "chunks"),
+            "embed": StageStats("embed", "chunks"),
+            "upsert": StageStats("upsert", "chunks"),
+        }
+
+        checkpoint = IngestCheckpoint(self.checkpoint_path, urls, force)
+        todo = [url for url in urls if url not in checkpoint.done]
+        stats["resumed"] = len(urls) - len(todo)
+        if stats["resumed"]:
+            print(f"      - Resuming: {stats['resumed']} of {len(urls)} URLs already done by an interrupted run")
+
+        validators = {} if force else {
+            url: (entry.get("etag"), entry.get("last_modified")) for url, entry in self.manifest.items()
+        }
+        pipeline = (
+            Pipeline(self._fetch(todo, validators), queue_size=self.queue_size, name="ingest")
+            .stage("split", lambda pages: self._split(pages, force))
+            .stage("embed", self._embed)
+        )
+
+        try:
+            last_report = time.perf_counter()
+            pages_done = 0
+            for batch in pipeline:
+                start = time.perf_counter()
+                self.vector_store.add_embeddings(batch.chunks, batch.embeddings, batch.ids)
+                for page in batch.pages:
+                    if page.stale_ids:
+                        self.vector_store.delete(page.stale_ids)
+                    if page.entry is not None:
+                        self.manifest[page.url] = page.entry
+                    stats[page.status] += 1
+                    stats["added"] += page.added
+                    stats["deleted"] += len(page.stale_ids)
+                    if page.status != "failed":
+                        checkpoint.done.add(page.url)
+                if batch.pages:
+                    self._save_manifest()
+                    checkpoint.save()
+                self._record("upsert", len(batch.ids), time.perf_counter() - start)
+
+                pages_done += len(batch.pages)
+                if time.perf_counter() - last_report >= self.progress_interval:
+                    last_report = time.perf_counter()
+                    print(f"      … {pages_done}/{len(todo)} pages | "
+                          + " | ".join(f"{s.name} {s.rate:.1f} {s.unit}/s" for s in self.stages.values()))
+
+            wanted = set(urls)
+            stale_urls = [url for url in self.manifest if url not in wanted] if prune else []
+            for url in stale_urls:
+                stale_ids = self.vector_store.get_ids(url)
+                self.vector_store.delete(stale_ids)
+                del self.manifest[url]
+                stats["removed"] += 1
+                stats["deleted"] += len(stale_ids)
+        finally:
+            # The lexical index only saves every LEXICAL_SAVE_EVERY chunks; write the rest, even when interrupted
+            self.vector_store.flush()
+
+        self._save_manifest()
+        checkpoint.clear()
+        return stats
+    
+    def _fetch(self, urls: List[str], validators) -> Iterator[tuple]:
+        """Stage 1: (url, FetchResult or exception), at most loader.max_workers in flight"""
+        start = time.perf_counter()
+        for url, result in self.loader.iter_fetch_urls(urls, validators):
+            self._record("fetch", 1, time.perf_counter() - start)
+            yield url, result
+            start = time.perf_counter()
+    
+    def _split(self, pages: Iterable[tuple], force: bool) -> Iterator[SplitPage]:
+        """Stage 2: diff each page against the manifest, split changed ones and diff their chunk ids"""
+        checked = (self._check_page(url, result, force) for url, result in pages)
+        if self.encoder is None:
+            split = (
+                (page, self.loader.split_documents(page.result.documents) if isinstance(page, ChangedPage) else [])
+                for page in checked
+            )
+        else:
+            # Pages are split on the pool in order; tee pairs each page with its chunks
+            checked, to_split = itertools.tee(checked)
+            split = zip(checked, self.encoder.iter_split(
+                page.result.documents if isinstance(page, ChangedPage) else [] for page in to_split
+            ))
+
+        start = time.perf_counter()
+        for page, chunks in split:
+            if isinstance(page, ChangedPage):
+                page = self._diff_chunks(page, chunks)
+            self._record("split", len(page.chunks), time.perf_counter() - start)
+            yield page
+            start = time.perf_counter()
+    
+    def _check_page(self, url: str, result: Union[FetchResult, Exception], force: bool
+                    ) -> Union[SplitPage, ChangedPage]:
+        entry = {} if force else self.manifest.get(url, {})
+        if isinstance(result, Exception):
+            print(f"      ❌ {url}: {result}")
+            return SplitPage(PageDone(url, "failed"))
+
+        if result.not_modified:
+            return SplitPage(PageDone(url, "unchanged"))
+
+        text = "".join(doc.page_content for doc in result.documents)
+        digest = content_digest(text)
+        if not force and digest == entry.get("digest"):
+            return SplitPage(PageDone(url, "unchanged", {**entry, "etag": result.etag,
+                                                         "last_modified": result.last_modified}))
+        return ChangedPage(url, result, digest)
+    
+    def _diff_chunks(self, page: ChangedPage, split_chunks: List[Document]) -> SplitPage:
+        chunks = {}
+        for chunk in split_chunks:
+            chunks.setdefault(chunk_id(chunk), chunk)
+
+        # Runs on the split thread while the consumer writes; store reads work on a snapshot of the index
+        existing_ids = set(self.vector_store.get_ids(page.url))
+        new_ids = [cid for cid in chunks if cid not in existing_ids]
+        stale_ids = [cid for cid in existing_ids if cid not in chunks]
+        done = PageDone(page.url, "changed", {
+            "etag": page.result.etag,
+            "last_modified": page.result.last_modified,
+            "digest": page.digest,
+            "chunks": len(chunks),
+        }, stale_ids, len(new_ids))
+        return SplitPage(done, new_ids, [chunks[cid] for cid in new_ids])
+    
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        embeddings = self.vector_store.embeddings
+        if self.encoder is None:
+            return embeddings.embed_documents(texts)
+        if isinstance(embeddings, CachedEmbeddings):
+            return embeddings.embed_documents(texts, encoder=self.encoder)
+        return self.encoder.embed_documents(texts)
+    
+    def _embed(self, pages: Iterable[SplitPage]) -> Iterator[EmbeddedBatch]:
+        """Stage 3: regroup chunks into batch_size batches and embed each batch"""
+        ids: List[str] = []
+        chunks: List[Document] = []
+        # Pages whose chunks are all in the buffer, waiting for the batch holding their last one
+        waiting: List[tuple] = []
+        buffered = flushed = 0
+
+        def flush(count: int) -> EmbeddedBatch:
+            nonlocal ids, chunks, waiting, flushed
+            start = time.perf_counter()
+            embeddings = self._embed_texts([chunk.page_content for chunk in chunks[:count]]) if count else []
+            self._record("embed", count, time.perf_counter() - start)
+            flushed += count
+            ready = [done for end, done in waiting if end <= flushed]
+            waiting = [(end, done) for end, done in waiting if end > flushed]
+            batch = EmbeddedBatch(ids[:count], chunks[:count], embeddings, ready)
+            ids, chunks = ids[count:], chunks[count:]
+            return batch
+
+        for page in pages:
+            ids.extend(page.ids)
+            chunks.extend(page.chunks)
+            buffered += len(page.chunks)
+            waiting.append((buffered, page.done))
+            while len(chunks) >= self.batch_size:
+                yield flush(self.batch_size)
+            if not chunks and waiting:
+                # Nothing left to embed for these pages: pass them on without waiting for a full batch
+                yield flush(0)
+        if chunks or waiting:
+            yield flush(len(chunks))
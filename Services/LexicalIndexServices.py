@@ -0,0 +1,277 @@
+import asyncio
+import math
+import os
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from Utils.Metrics import metrics
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how in is it its of on or that the their this to was what when
+where which who why will with
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased alphanumeric terms without stopwords; "GPT-4" -> ["gpt", "4"]"""
+    terms = re.findall(r"[^\W_]+", unicodedata.normalize("NFKC", text).lower())
+    return [term for term in terms if term not in STOPWORDS]
+
+class LexicalIndex:
+    """
+    Okapi BM25 inverted index over vector-store chunks, keyed by chunk id.
+
+    On disk it is a single .npz of flat arrays: the term list, chunk ids and
+    lengths, and CSR postings (per-term offsets into int32 rows / uint16 term
+    frequencies), so loading is a few array reads and no parsing.
+    Chunks added after loading go to an in-memory delta, deletions are
+    tombstones; save() folds both into fresh CSR arrays. Since that rewrites
+    the whole file, writers call maybe_save() after each batch, which only
+    saves once `save_every` chunks have changed, and save() when they finish.
+    """
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75, save_every: int = 50000):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.save_every = save_every
+        self._lock = threading.Lock()
+        self._load()
+    
+    def _reset(self):
+        self.terms: List[str] = []
+        self.vocab: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        # Grown by doubling; lengths and alive are views of the first len(ids) rows
+        self._lengths = np.zeros(0, dtype=np.int32)
+        self._alive = np.zeros(0, dtype=bool)
+        self.unsaved = 0
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._postings = np.zeros(0, dtype=np.int32)
+        self._tfs = np.zeros(0, dtype=np.int32)
+        self._pending: Dict[int, Tuple[List[int], List[int]]] = {}
+    
+    def _load(self):
+        self._reset()
+        if not os.path.exists(self.path):
+            return
+        with np.load(self.path, allow_pickle=False) as data:
+            self.terms = data["terms"].tolist()
+            self.ids = data["ids"].tolist()
+            self._lengths = data["lengths"].astype(np.int32)
+            self._offsets = data["offsets"].astype(np.int64)
+            self._postings = data["postings"].astype(np.int32)
+            self._tfs = data["tfs"].astype(np.int32)
+        self.vocab = {term: i for i, term in enumerate(self.terms)}
+        self.rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self._alive = np.ones(len(self.ids), dtype=bool)
+    
+    @property
+    def lengths(self) -> np.ndarray:
+        return self._lengths[:len(self.ids)]
+    
+    @property
+    def alive(self) -> np.ndarray:
+        return self._alive[:len(self.ids)]
+    
+    def _grow(self, size: int):
+        if size > len(self._alive):
+            capacity = max(size, 2 * len(self._alive), 1024)
+            self._lengths = np.concatenate([self._lengths, np.zeros(capacity - len(self._lengths), dtype=np.int32)])
+            self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+    
+    def __len__(self) -> int:
+        return len(self.rows)
+    
+    def clear(self):
+        with self._lock:
+            self._reset()
+            self.unsaved = 1
+    
+    def add(self, ids: List[str], texts: List[str]):
+        """Index chunks; an id that is already indexed is replaced"""
+        batch = dict(zip(ids, texts))
+        with self._lock:
+            self._delete(list(batch))
+            self._grow(len(self.ids) + len(batch))
+            for chunk_id, text in batch.items():
+                row = len(self.ids)
+                self.ids.append(chunk_id)
+                self.rows[chunk_id] = row
+                counts: Dict[str, int] = {}
+                for term in tokenize(text):
+                    counts[term] = counts.get(term, 0) + 1
+                for term, tf in counts.items():
+                    tid = self.vocab.get(term)
+                    if tid is None:
+                        tid = self.vocab[term] = len(self.terms)
+                        self.terms.append(term)
+                    rows, tfs = self._pending.setdefault(tid, ([], []))
+                    rows.append(row)
+                    tfs.append(tf)
+                self._lengths[row] = sum(counts.values())
+                self._alive[row] = True
+            self.unsaved += len(batch)
+    
+    def delete(self, ids: List[str]):
+        with self._lock:
+            self._delete(ids)
+    
+    def _delete(self, ids: List[str]):
+        for chunk_id in ids:
+            row = self.rows.pop(chunk_id, None)
+            if row is not None:
+                self._alive[row] = False
+                self.unsaved += 1
+    
+    def _postings_for(self, tid: int) -> Tuple[np.ndarray, np.ndarray]:
+        rows = self._postings[0:0]
+        tfs = self._tfs[0:0]
+        if tid + 1 < len(self._offsets):
+            start, end = self._offsets[tid], self._offsets[tid + 1]
+            rows, tfs = self._postings[start:end], self._tfs[start:end]
+        if tid in self._pending:
+            extra_rows, extra_tfs = self._pending[tid]
+            rows = np.concatenate([rows, np.asarray(extra_rows, dtype=np.int32)])
+            tfs = np.concatenate([tfs, np.asarray(extra_tfs, dtype=np.int32)])
+        return rows, tfs
+    
+    def search(self, query: str, k: int = 4) -> List[Tuple[str, float]]:
+        """Top-k (chunk id, BM25 score) pairs; chunks sharing no term with the query are left out"""
+        with metrics.timer("lexical_search_seconds"), self._lock:
+            n_docs = len(self.rows)
+            if not n_docs:
+                return []
+            avg_length = float(self.lengths[self.alive].mean()) or 1.0
+            scores = np.zeros(len(self.ids), dtype=np.float32)
+            for term in set(tokenize(query)):
+                tid = self.vocab.get(term)
+                if tid is None:
+                    continue
+                rows, tfs = self._postings_for(tid)
+                live = self.alive[rows]
+                rows, tfs = rows[live], tfs[live]
+                if not len(rows):
+                    continue
+                idf = math.log(1 + (n_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[rows] / avg_length)
+                scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+            matched = np.flatnonzero(scores > 0)
+            if len(matched) > k:
+                matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+            matched = matched[np.argsort(-scores[matched], kind="stable")]
+            return [(self.ids[row], float(scores[row])) for row in matched]
+    
+    def maybe_save(self) -> bool:
+        """save() once `save_every` chunks have changed since the last save; True when it saved"""
+        if self.unsaved < self.save_every:
+            return False
+        self.save()
+        return True
+    
+    def save(self):
+        """Compact the delta and tombstones into CSR arrays and write them atomically"""
+        with self._lock:
+            if not self.unsaved and os.path.exists(self.path):
+                return
+            term_of = [np.repeat(np.arange(len(self._offsets) - 1, dtype=np.int64), np.diff(self._offsets))]
+            rows = [self._postings]
+            tfs = [self._tfs]
+            for tid, (extra_rows, extra_tfs) in self._pending.items():
+                term_of.append(np.full(len(extra_rows), tid, dtype=np.int64))
+                rows.append(np.asarray(extra_rows, dtype=np.int32))
+                tfs.append(np.asarray(extra_tfs, dtype=np.int32))
+            term_of, rows, tfs = np.concatenate(term_of), np.concatenate(rows), np.concatenate(tfs)
+
+            # Drop tombstoned chunks and renumber the survivors
+            live = self.alive[rows]
+            term_of, rows, tfs = term_of[live], rows[live], tfs[live]
+            new_row = np.cumsum(self.alive) - 1
+            rows = new_row[rows].astype(np.int32)
+            ids = [chunk_id for chunk_id, keep in zip(self.ids, self.alive) if keep]
+            lengths = self.lengths[self.alive]
+
+            # Drop terms left without postings and renumber the rest
+            counts = np.bincount(term_of, minlength=len(self.terms))
+            used = counts > 0
+            new_tid = np.cumsum(used) - 1
+            term_of = new_tid[term_of]
+            terms = [term for term, keep in zip(self.terms, used) if keep]
+            order = np.lexsort((rows, term_of))
+            rows, tfs = rows[order], tfs[order]
+            offsets = np.concatenate([[0], np.cumsum(counts[used])]).astype(np.int64)
+
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    terms=np.asarray(terms, dtype=str),
+                    ids=np.asarray(ids, dtype=str),
+                    lengths=lengths.astype(np.int32),
+                    offsets=offsets,
+                    postings=rows,
+                    tfs=np.minimum(tfs, np.iinfo(np.uint16).max).astype(np.uint16)
+                )
+            os.replace(tmp_path, self.path)
+
+            self.terms, self.ids, self._lengths = terms, ids, lengths.astype(np.int32)
+            self.vocab = {term: i for i, term in enumerate(terms)}
+            self.rows = {chunk_id: row for row, chunk_id in enumerate(ids)}
+            self._alive = np.ones(len(ids), dtype=bool)
+            self._offsets, self._postings, self._tfs = offsets, rows, tfs
+            self._pending = {}
+            self.unsaved = 0
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Merge ranked key lists by sum of 1 / (k + rank), best first"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+class HybridRetriever:
+    """
+    Retriever for RAGGraph fusing a dense retriever with the BM25 index.
+
+    Both rankings are merged by reciprocal rank fusion; chunks found only
+    lexically are read back from the vector store by id.
+    """
+    def __init__(self, dense, lexical_index: LexicalIndex, vector_store_service, k: int = 4, rrf_k: int = 60):
+        self.dense = dense
+        self.lexical_index = lexical_index
+        self.vector_store_service = vector_store_service
+        self.k = k
+        self.rrf_k = rrf_k
+    
+    @staticmethod
+    def _key(doc: Document) -> str:
+        return f"{doc.metadata.get('source', '')}\n{doc.page_content}"
+    
+    def _fuse(self, question: str, dense_docs: List[Document]) -> List[Document]:
+        lexical_ids = [chunk_id for chunk_id, _ in self.lexical_index.search(question, self.k)]
+        lexical_docs = self.vector_store_service.get_documents(lexical_ids)
+
+        by_key = {self._key(doc): doc for doc in lexical_docs}
+        by_key.update((self._key(doc), doc) for doc in dense_docs)
+        dense_keys = [self._key(doc) for doc in dense_docs]
+        lexical_keys = [self._key(doc) for doc in lexical_docs]
+        fused = reciprocal_rank_fusion([dense_keys, lexical_keys], k=self.rrf_k)[:self.k]
+
+        if metrics.enabled:
+            dense_set, lexical_set = set(dense_keys), set(lexical_keys)
+            for key, _ in fused:
+                origin = "both" if key in dense_set and key in lexical_set else "dense" if key in dense_set else "lexical"
+                metrics.inc("hybrid_documents_total", origin=origin)
+        return [by_key[key] for key, _ in fused]
+    
+    def invoke(self, question: str) -> List[Document]:
+        return self._fuse(question, self.dense.invoke(question))
+    
+    async def ainvoke(self, question: str) -> List[Document]:
+        dense_docs = await self.dense.ainvoke(question)
+        return await asyncio.to_thread(self._fuse, question, dense_docs)
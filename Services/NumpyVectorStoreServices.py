@@ -0,0 +1,413 @@
+import json
+import mmap
+import os
+import threading
+import uuid
+from contextlib import ExitStack
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from Utils.Metrics import metrics
+
+DTYPES = ("float16", "int8")
+# On-disk layout version written to meta.json
+FORMAT = 2
+# Stored rows are widened to float32 this many at a time into a reused buffer
+BLOCK_ROWS = 8192
+# A write compacts the store once more than this fraction of its rows are deleted
+COMPACT_RATIO = 0.25
+GENERATION_FILES = (("vectors", "bin"), ("scales", "f32"), ("chunks", "jsonl"), ("ends", "i64"),
+                    ("ids", "txt"), ("tombstones", "i64"))
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+@dataclass(frozen=True)
+class _View:
+    """The first `size` rows of a generation, mapped once; readers take one view and use only it"""
+    size: int
+    matrix: Optional[np.ndarray]
+    scales: Optional[np.ndarray]
+    ends: Optional[np.ndarray]
+    side: Optional[mmap.mmap]
+    # Shared with later views of the same generation; only ever appended to, or
+    # marked dead, so the first `size` entries stay valid for this view
+    alive: np.ndarray
+    ids: List[str]
+    rows: Dict[str, int]
+    
+    def line(self, row: int) -> bytes:
+        return self.side[int(self.ends[row - 1]) if row else 0:int(self.ends[row])]
+    
+    def live_rows(self) -> np.ndarray:
+        return np.flatnonzero(self.alive[:self.size])
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact cosine search over a memory-mapped embedding matrix.
+
+    A store directory holds one generation of append-only files:
+      vectors.<gen>.bin   unit-normalized rows as float16, or int8 with
+                          scales.<gen>.f32 holding one float32 scale per row
+      chunks.<gen>.jsonl  one {"id", "text", "metadata"} line per row,
+                          ends.<gen>.i64 the byte offset where each line ends
+      ids.<gen>.txt       one chunk id per line
+      tombstones.<gen>.i64 rows deleted or replaced since the generation began
+      meta.json           {"format", "generation", "dim", "dtype", "count",
+                          "deleted", "ids_bytes"}, replaced last
+    Adds append rows and deletes append tombstones, so a write costs the size
+    of the batch, not of the store. Once more than COMPACT_RATIO of the rows
+    are dead, the live rows are copied block by block into the next
+    generation. The previous generation's files are kept until the one after,
+    so readers in other processes that have not reopened keep working.
+    Opening maps the files and reads the ids; chunk lines are decoded only for
+    search hits. Readers see the rows meta.json counted when they took their
+    view, never a half-written append. Meant for a single writer process.
+    """
+    def __init__(self, directory: str, embedding: Embeddings, dtype: str = "float16"):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}, got {dtype!r}")
+        self.directory = directory
+        self.embedding = embedding
+        self.dtype = dtype
+        self.meta_path = os.path.join(directory, "meta.json")
+        self._lock = threading.Lock()
+        self._buffers = threading.local()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+    
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+    
+    def _path(self, name: str, generation: int, ext: str) -> str:
+        return os.path.join(self.directory, f"{name}.{generation}.{ext}")
+    
+    def _load(self):
+        """Read meta.json, the ids and the tombstones of the current generation and map its rows"""
+        self.generation = 0
+        self.dim: Optional[int] = None
+        self.deleted = 0
+        self.ids_bytes = 0
+        self._ids: List[str] = []
+        self._alive = np.ones(0, dtype=bool)
+        self._rows: Dict[str, int] = {}
+        # metadata["source"] -> rows of this generation, built on the first lookup by source
+        self._sources: Optional[Dict[str, List[int]]] = None
+        size = 0
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format") != FORMAT:
+                raise ValueError(f"{self.directory} was written in an older layout; rebuild it with python setup.py --full")
+            # The stored dtype wins over the requested one until the store is rewritten
+            self.generation, self.dim, self.dtype = meta["generation"], meta["dim"], meta["dtype"]
+            size, self.deleted, self.ids_bytes = meta["count"], meta["deleted"], meta["ids_bytes"]
+        if size:
+            with open(self._path("ids", self.generation, "txt"), "rb") as f:
+                self._ids = f.read(self.ids_bytes).decode("utf-8").split("\n")[:size]
+            self._alive = np.ones(size, dtype=bool)
+            if self.deleted:
+                self._alive[np.fromfile(self._path("tombstones", self.generation, "i64"), dtype=np.int64,
+                                        count=self.deleted)] = False
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids) if self._alive[row]}
+        self._publish(size)
+    
+    def _publish(self, size: int):
+        """Map the first `size` rows and make them the view new reads use"""
+        if not size:
+            self._view = _View(0, None, None, None, None, self._alive, self._ids, self._rows)
+            return
+        matrix = np.memmap(self._path("vectors", self.generation, "bin"), dtype=self.dtype, mode="r",
+                           shape=(size, self.dim))
+        scales = np.memmap(self._path("scales", self.generation, "f32"), dtype=np.float32, mode="r",
+                           shape=(size,)) if self.dtype == "int8" else None
+        ends = np.memmap(self._path("ends", self.generation, "i64"), dtype=np.int64, mode="r", shape=(size,))
+        with open(self._path("chunks", self.generation, "jsonl"), "rb") as f:
+            side = mmap.mmap(f.fileno(), int(ends[-1]), access=mmap.ACCESS_READ)
+        self._view = _View(size, matrix, scales, ends, side, self._alive, self._ids, self._rows)
+    
+    @property
+    def size(self) -> int:
+        """Rows in the current generation, live or not"""
+        return self._view.size
+    
+    @staticmethod
+    def _chunk(view: _View, row: int) -> dict:
+        return json.loads(view.line(row))
+    
+    def _quantize(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Unit-normalized float32 rows -> stored rows (and per-row scales for int8)"""
+        if self.dtype == "float16":
+            return vectors.astype(np.float16), None
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    
+    def _write_meta(self, generation: int, count: int, deleted: int, ids_bytes: int):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"format": FORMAT, "generation": generation, "dim": self.dim, "dtype": self.dtype,
+                       "count": count, "deleted": deleted, "ids_bytes": ids_bytes}, f)
+        os.replace(tmp_path, self.meta_path)
+    
+    def _append(self, name: str, ext: str, valid_bytes: int, data: bytes):
+        """Append to a generation file, first dropping any tail an interrupted write left past meta.json"""
+        with open(self._path(name, self.generation, ext), "ab") as f:
+            f.truncate(valid_bytes)
+            f.write(data)
+    
+    def _tombstone(self, rows: List[int]):
+        """Mark live rows dead on disk and in memory; meta.json is written by the caller"""
+        if not rows:
+            return
+        self._append("tombstones", "i64", self.deleted * 8, np.asarray(rows, dtype=np.int64).tobytes())
+        self.deleted += len(rows)
+        self._alive[rows] = False
+    
+    def add_embeddings(self, texts: List[str], embeddings: List[List[float]],
+                       metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None) -> List[str]:
+        """Append precomputed embeddings; rows of existing ids are tombstoned"""
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+        ids = list(ids)
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        lines = [
+            (json.dumps({"id": chunk_id, "text": text, "metadata": metadata or {}}) + "\n").encode("utf-8")
+            for chunk_id, text, metadata in zip(ids, texts, metadatas)
+        ]
+        if not ids:
+            return []
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+            view = self._view
+            start = view.size
+            row_bytes = self.dim * np.dtype(self.dtype).itemsize
+            chunk_bytes = int(view.ends[-1]) if start else 0
+            matrix, scales = self._quantize(vectors)
+            ids_data = "".join(chunk_id + "\n" for chunk_id in ids).encode("utf-8")
+
+            self._append("vectors", "bin", start * row_bytes, np.ascontiguousarray(matrix).tobytes())
+            if scales is not None:
+                self._append("scales", "f32", start * 4, scales.tobytes())
+            self._append("chunks", "jsonl", chunk_bytes, b"".join(lines))
+            self._append("ends", "i64", start * 8,
+                         (chunk_bytes + np.cumsum([len(line) for line in lines])).astype(np.int64).tobytes())
+            self._append("ids", "txt", self.ids_bytes, ids_data)
+            if len(self._alive) < start + len(ids):
+                # Grown by doubling; unused capacity is already True for the rows to come
+                alive = np.ones(max(2 * len(self._alive), start + len(ids)), dtype=bool)
+                alive[:start] = self._alive[:start]
+                self._alive = alive
+            replaced = {self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows}
+            # An id repeated within the batch keeps its last row
+            last = {chunk_id: start + offset for offset, chunk_id in enumerate(ids)}
+            replaced.update(row for row in range(start, start + len(ids)) if last[ids[row - start]] != row)
+            self._tombstone(sorted(replaced))
+            self.ids_bytes += len(ids_data)
+            self._write_meta(self.generation, start + len(ids), self.deleted, self.ids_bytes)
+
+            self._ids.extend(ids)
+            self._rows.update(last)
+            if self._sources is not None:
+                for offset, metadata in enumerate(metadatas):
+                    self._sources.setdefault((metadata or {}).get("source"), []).append(start + offset)
+            self._publish(start + len(ids))
+            self._maybe_compact()
+        return ids
+    
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, *,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        return self.add_embeddings(texts, self.embedding.embed_documents(texts), metadatas, ids)
+    
+    def add_documents(self, documents: List[Document], **kwargs: Any) -> List[str]:
+        return self.add_texts(
+            [doc.page_content for doc in documents],
+            [doc.metadata for doc in documents],
+            ids=kwargs.get("ids")
+        )
+    
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        with self._lock:
+            rows = sorted({self._rows.pop(chunk_id) for chunk_id in ids or [] if chunk_id in self._rows})
+            if not rows:
+                return False
+            self._tombstone(rows)
+            self._write_meta(self.generation, self._view.size, self.deleted, self.ids_bytes)
+            self._maybe_compact()
+        return True
+    
+    def _maybe_compact(self):
+        if self.deleted > COMPACT_RATIO * self._view.size:
+            self._compact()
+    
+    def compact(self):
+        """Copy the live rows into a new generation, dropping tombstoned ones"""
+        with self._lock:
+            self._compact()
+    
+    def _compact(self):
+        view = self._view
+        old_generation, generation = self.generation, self.generation + 1
+        rows = view.live_rows()
+        ids_bytes = 0
+        with ExitStack() as stack:
+            files = {name: stack.enter_context(open(self._path(name, generation, ext), "wb"))
+                     for name, ext in GENERATION_FILES if ext != "f32" or self.dtype == "int8"}
+            chunk_bytes = 0
+            for start in range(0, len(rows), BLOCK_ROWS):
+                block = rows[start:start + BLOCK_ROWS]
+                files["vectors"].write(np.ascontiguousarray(view.matrix[block]).tobytes())
+                if view.scales is not None:
+                    files["scales"].write(np.asarray(view.scales[block]).tobytes())
+                lines = [view.line(int(row)) for row in block]
+                files["chunks"].write(b"".join(lines))
+                files["ends"].write((chunk_bytes + np.cumsum([len(line) for line in lines])).astype(np.int64).tobytes())
+                chunk_bytes += sum(len(line) for line in lines)
+                ids_data = "".join(view.ids[row] + "\n" for row in block).encode("utf-8")
+                files["ids"].write(ids_data)
+                ids_bytes += len(ids_data)
+        self._write_meta(generation, len(rows), 0, ids_bytes)
+        self._load()
+        metrics.inc("numpy_store_compactions_total")
+        # Readers that have not switched yet may still open the previous generation
+        for name in os.listdir(self.directory):
+            parts = name.split(".")
+            if len(parts) == 3 and parts[1].isdigit() and int(parts[1]) < old_generation:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    # Still mapped by a reader on a platform that refuses; the next compaction retries
+                    pass
+    
+    def persist(self):
+        """Writes are durable when add/delete return; kept for parity with Chroma"""
+    
+    def count(self) -> int:
+        return int(self._view.live_rows().size)
+    
+    def version(self) -> str:
+        """Changes whenever a writer publishes a new generation"""
+        if not os.path.exists(self.meta_path):
+            return ""
+        return str(os.stat(self.meta_path).st_mtime_ns)
+    
+    def get(self, ids: Optional[List[str]] = None, where: Optional[dict] = None,
+            include: Optional[List[str]] = None) -> Dict[str, list]:
+        """Chroma-style get: ids plus the requested "documents" / "metadatas" / "embeddings" columns"""
+        include = ["documents", "metadatas"] if include is None else include
+        view = self._view
+        if ids is None and where and set(where) == {"source"}:
+            view, rows = self._source_rows(where["source"])
+            where = None
+        elif ids is not None:
+            rows = [view.rows.get(chunk_id) for chunk_id in ids]
+            rows = [row for row in rows if row is not None and row < view.size and view.alive[row]]
+        else:
+            rows = view.live_rows().tolist()
+        chunks = {row: self._chunk(view, row) for row in rows} if where or "documents" in include or "metadatas" in include else {}
+        if where:
+            rows = [row for row in rows if all(chunks[row]["metadata"].get(k) == v for k, v in where.items())]
+        result: Dict[str, list] = {"ids": [view.ids[row] for row in rows]}
+        if "documents" in include:
+            result["documents"] = [chunks[row]["text"] for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [chunks[row]["metadata"] for row in rows]
+        if "embeddings" in include:
+            result["embeddings"] = [
+                (self._widen(view, row, row + 1)[0] * (view.scales[row] if view.scales is not None else 1)).tolist()
+                for row in rows
+            ]
+        return result
+    
+    def _source_rows(self, source: str) -> Tuple[_View, List[int]]:
+        """Live rows of one source through the source index, and the view they belong to"""
+        with self._lock:
+            view = self._view
+            if self._sources is None:
+                self._sources = {}
+                for row in range(view.size):
+                    self._sources.setdefault(self._chunk(view, row)["metadata"].get("source"), []).append(row)
+            rows = list(self._sources.get(source, ()))
+        return view, [row for row in rows if view.alive[row]]
+    
+    def _widen(self, view: _View, start: int, end: int) -> np.ndarray:
+        """Stored rows start:end as float32, in this thread's reused scratch buffer"""
+        buffer = getattr(self._buffers, "block", None)
+        if buffer is None or buffer.shape[1] != self.dim or len(buffer) < end - start:
+            buffer = self._buffers.block = np.empty((min(BLOCK_ROWS, view.size), self.dim), dtype=np.float32)
+        block = buffer[:end - start]
+        np.copyto(block, view.matrix[start:end])
+        return block
+    
+    def _top_k(self, view: _View, queries: np.ndarray, k: int) -> List[List[Tuple[int, float]]]:
+        """(row, cosine similarity) best-first for each unit-normalized query row"""
+        count = view.size
+        alive = view.alive[:count]
+        live = int(alive.sum()) if count else 0
+        if not live:
+            return [[] for _ in queries]
+        k = min(k, live)
+        scores = np.empty((len(queries), count), dtype=np.float32)
+        for start in range(0, count, BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, count)
+            np.matmul(queries, self._widen(view, start, end).T, out=scores[:, start:end])
+            if view.scales is not None:
+                scores[:, start:end] *= view.scales[start:end]
+        if live < count:
+            scores[:, ~alive] = -np.inf
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for query_scores, rows in zip(scores, top):
+            rows = rows[np.argsort(-query_scores[rows], kind="stable")]
+            results.append([(int(row), float(query_scores[row])) for row in rows])
+        return results
+    
+    def _document(self, view: _View, row: int) -> Document:
+        chunk = self._chunk(view, row)
+        return Document(page_content=chunk["text"], metadata=chunk["metadata"], id=chunk["id"])
+    
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        """Top-k documents with cosine distance (lower is closer, like Chroma's scores)"""
+        query = _normalize(np.asarray([embedding], dtype=np.float32))
+        view = self._view
+        return [(self._document(view, row), 1 - score) for row, score in self._top_k(view, query, k)[0]]
+    
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+    
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k)
+    
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+    
+    def batch_similarity_search_by_vector_with_score(self, embeddings: List[List[float]],
+                                                     k: int = 4) -> List[List[Tuple[Document, float]]]:
+        """Top-k (document, cosine distance) pairs for many query embeddings with one pass over the matrix"""
+        queries = _normalize(np.asarray(embeddings, dtype=np.float32))
+        view = self._view
+        return [[(self._document(view, row), 1 - score) for row, score in hits] for hits in self._top_k(view, queries, k)]
+    
+    def batch_similarity_search_by_vector(self, embeddings: List[List[float]], k: int = 4) -> List[List[Document]]:
+        """Top-k documents for many query embeddings with one pass over the matrix"""
+        return [[doc for doc, _ in hits] for hits in self.batch_similarity_search_by_vector_with_score(embeddings, k)]
+    
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+    
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, *,
+                   ids: Optional[List[str]] = None, directory: str = "./numpy_store", dtype: str = "float16",
+                   **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(directory, embedding, dtype=dtype)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
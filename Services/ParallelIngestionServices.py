@@ -0,0 +1,142 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from Utils.Tokens import ENCODING_NAME
+
+# Per-worker state, built once by _init_worker; the model is loaded on the first embed task
+_splitter = None
+_model = None
+_model_name: Optional[str] = None
+
+def _init_worker(chunk_size: int, chunk_overlap: int, model_name: str, threads: int):
+    global _splitter, _model_name
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from langchain_classic.text_splitter import RecursiveCharacterTextSplitter
+    # Same splitter DocumentLoader builds
+    _splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name=ENCODING_NAME,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
+    )
+    _model_name = model_name
+
+def _worker_model():
+    global _model
+    if _model is None:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        _model = HuggingFaceEmbeddings(model_name=_model_name)
+    return _model
+
+def _split_task(pages: List[List[Tuple[str, dict]]]) -> List[List[Tuple[str, dict]]]:
+    """Chunks of each page, as (text, metadata) pairs"""
+    return [
+        [(chunk.page_content, chunk.metadata) for chunk in _splitter.split_documents(
+            [Document(page_content=text, metadata=metadata) for text, metadata in page]
+        )]
+        for page in pages
+    ]
+
+def _dimension_task(_: int = 0) -> int:
+    return len(_worker_model().embed_query("dimension"))
+
+def _embed_task(texts: List[str], shm_name: str, row: int, dim: int) -> int:
+    """Encode texts into rows row.. of the parent's shared float32 matrix"""
+    vectors = np.asarray(_worker_model().embed_documents(texts), dtype=np.float32)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        np.ndarray((row + len(texts), dim), dtype=np.float32, buffer=shm.buf)[row:] = vectors
+    finally:
+        shm.close()
+    return len(texts)
+
+class ParallelEncoder(Embeddings):
+    """
+    Process pool for tiktoken splitting and embedding-model encoding during ingestion.
+
+    Each worker builds the splitter at start-up and loads the model on its
+    first embedding task, once. Embeddings are written by the workers straight
+    into one shared-memory float32 matrix, so only the texts are pickled.
+    Splitting is per page and encoding keeps the serial path's batches of
+    batch_size texts, each encoded by one worker; results come back in input
+    order, so the output matches the single-process path.
+    """
+    def __init__(self, workers: int, chunk_size: int, chunk_overlap: int, model_name: str, batch_size: int = 64):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.dim: Optional[int] = None
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        # spawn, not fork: a forked torch runtime can deadlock in the children
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(chunk_size, chunk_overlap, model_name, threads)
+        )
+    
+    def warm_up(self):
+        """Start the workers and load their models, so timings exclude start-up"""
+        self.dim = max(self.pool.map(_dimension_task, range(self.workers)))
+    
+    def iter_split(self, pages: Iterable[List[Document]]) -> Iterator[List[Document]]:
+        """Chunks of each page in input order, with at most 2 * workers pages in flight"""
+        window: Deque[Future] = deque()
+        for page in pages:
+            window.append(self.pool.submit(_split_task, [[(doc.page_content, doc.metadata) for doc in page]]))
+            if len(window) >= 2 * self.workers:
+                yield self._chunks(window.popleft())
+        while window:
+            yield self._chunks(window.popleft())
+    
+    @staticmethod
+    def _chunks(future: Future) -> List[Document]:
+        return [Document(page_content=text, metadata=metadata) for text, metadata in future.result()[0]]
+    
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """Same chunks, in the same order, as DocumentLoader.split_documents"""
+        return [chunk for chunks in self.iter_split([doc] for doc in documents) for chunk in chunks]
+    
+    def map_batches(self, batches: List[List[str]]) -> List[np.ndarray]:
+        """Encode each batch on one worker; one float32 array per batch, in order"""
+        total = sum(len(batch) for batch in batches)
+        if not total:
+            return [np.zeros((0, self.dim or 0), dtype=np.float32) for _ in batches]
+        if self.dim is None:
+            self.dim = self.pool.submit(_dimension_task).result()
+        shm = shared_memory.SharedMemory(create=True, size=total * self.dim * 4)
+        try:
+            futures, row = [], 0
+            for batch in batches:
+                futures.append(self.pool.submit(_embed_task, batch, shm.name, row, self.dim))
+                row += len(batch)
+            for future in futures:
+                future.result()
+            matrix = np.ndarray((total, self.dim), dtype=np.float32, buffer=shm.buf)
+            out, row = [], 0
+            for batch in batches:
+                out.append(matrix[row:row + len(batch)].copy())
+                row += len(batch)
+            del matrix
+            return out
+        finally:
+            shm.close()
+            shm.unlink()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        return [row.tolist() for vectors in self.map_batches(batches) for row in vectors]
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+    
+    def close(self):
+        self.pool.shutdown()
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from langchain_core.documents import Document
+from Utils.Metrics import metrics
+
+ACTIONS = ("canned", "wikiSearch", "tavilySearch")
+
+def with_scores(doc: Document, distance: float, relevance_fn) -> Document:
+    """Copy of a hit with its raw distance and 0-1 relevance score in the metadata"""
+    return Document(page_content=doc.page_content, id=doc.id, metadata={
+        **doc.metadata, "distance": float(distance), "relevance_score": float(relevance_fn(distance))
+    })
+
+class ScoredRetriever:
+    """
+    Dense retriever that keeps the similarity scores.
+
+    Each document carries metadata["distance"], the store's raw distance, and
+    metadata["relevance_score"], the store's 0-1 relevance (higher is closer)
+    as LangChain's similarity_search_with_relevance_scores computes it.
+    """
+    def __init__(self, vector_store, k: int = 4):
+        self.vector_store = vector_store
+        self.k = k
+    
+    def invoke(self, question: str) -> List[Document]:
+        hits = self.vector_store.similarity_search_with_score(question, k=self.k)
+        relevance_fn = self.vector_store._select_relevance_score_fn()
+        return [with_scores(doc, distance, relevance_fn) for doc, distance in hits]
+    
+    async def ainvoke(self, question: str) -> List[Document]:
+        return await asyncio.to_thread(self.invoke, question)
+
+def top_relevance(documents: List[Document]) -> Optional[float]:
+    """Best relevance score among the documents; None when none of them is scored"""
+    scores = [doc.metadata["relevance_score"] for doc in documents if "relevance_score" in doc.metadata]
+    return max(scores) if scores else None
+
+@dataclass
+class GateStats:
+    checked: int = 0
+    passed: int = 0
+    unscored: int = 0
+    canned: int = 0
+    rerouted: int = 0
+
+class RelevanceGate:
+    """
+    Decides whether vector-store documents are worth a generation call.
+
+    When the best dense hit scores below `threshold`, the documents would only
+    produce a "the context doesn't contain this" answer. The gate then either
+    answers `canned_answer` with no LLM call (action "canned"), or sends the
+    question straight to a web route (action "wikiSearch" / "tavilySearch")
+    without asking the router again. Only a canned answer avoids an LLM call; a
+    rerouted question still pays for its search and generation, so reroutes are
+    counted on their own. Chunks found only by BM25 carry no score and do not
+    count; unscored results pass.
+    """
+    def __init__(self, threshold: float, action: str = "canned", canned_answer: str = ""):
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown relevance gate action {action!r}, expected one of {ACTIONS}")
+        self.threshold = threshold
+        self.action = action
+        self.canned_answer = canned_answer
+        self.stats = GateStats()
+        self._lock = threading.Lock()
+    
+    def check(self, documents: List[Document]) -> Optional[str]:
+        """None when the documents pass, else the action to take instead of generating"""
+        score = top_relevance(documents)
+        if score is not None:
+            metrics.observe("retrieval_top_relevance", score)
+        outcome = "unscored" if score is None else "passed" if score >= self.threshold else self.action
+        with self._lock:
+            self.stats.checked += 1
+            if outcome == "unscored":
+                self.stats.unscored += 1
+            elif outcome == "passed":
+                self.stats.passed += 1
+            elif outcome == "canned":
+                self.stats.canned += 1
+            else:
+                self.stats.rerouted += 1
+        metrics.inc("relevance_gate_total", outcome=outcome)
+        if outcome in ("unscored", "passed"):
+            return None
+        if outcome == "canned":
+            metrics.inc("llm_calls_avoided_total", call="generation")
+        return outcome
+    
+    def summary(self) -> Dict[str, float]:
+        """Gate decisions so far; only canned answers avoided an LLM call"""
+        stats = self.stats
+        return {
+            "threshold": self.threshold,
+            "action": self.action,
+            "checked": stats.checked,
+            "passed": stats.passed,
+            "unscored": stats.unscored,
+            "canned": stats.canned,
+            "rerouted": stats.rerouted,
+            "llm_calls_avoided": stats.canned,
+        }
@@ -1,53 +1,215 @@
-from langchain_community.utilities import WikipediaAPIWrapper
-from langchain_community.tools import WikipediaQueryRun
-from langchain_community.tools.tavily_search import TavilySearchResults
+import asyncio
+import os
+import httpx
+from typing import Dict, List, Optional
 from Config.settings import settings
+from Services.SearchCacheServices import SearchCache, get_search_cache
+from Utils.Metrics import metrics
+
+WIKIPEDIA_API_URL = "https://en.wikipedia.org/w/api.php"
+WIKIPEDIA_MAX_QUERY_LENGTH = 300
+TAVILY_API_URL = "https://api.tavily.com/search"
 
 class RetrievalService:
-    def __init__(self):
-        self.wiki_wrapper = WikipediaAPIWrapper(
-            top_k_results=1,
-            doc_content_chars_max=200
-        )
-        self.wiki = WikipediaQueryRun(api_wrapper=self.wiki_wrapper)
+    WIKI_TOP_K = 1
+    WIKI_CHARS_MAX = 200
+    
+    def __init__(self, wiki=None, tavily_search=None, cache: Optional[SearchCache] = None,
+                 use_cache: Optional[bool] = None):
+        # langchain_community tools are imported only when no stand-ins are injected;
+        # injected ones also serve the async path through their ainvoke
+        self._injected_wiki = wiki is not None
+        self._injected_tavily = tavily_search is not None
+        if wiki is None:
+            from langchain_community.utilities import WikipediaAPIWrapper
+            from langchain_community.tools import WikipediaQueryRun
+            self.wiki_wrapper = WikipediaAPIWrapper(
+                top_k_results=self.WIKI_TOP_K,
+                doc_content_chars_max=self.WIKI_CHARS_MAX
+            )
+            wiki = WikipediaQueryRun(api_wrapper=self.wiki_wrapper)
+        self.wiki = wiki
 
-        self.tavily_search = TavilySearchResults(
-            max_results= settings.TAVILY_MAX_RESULTS,
-            search_depth="advanced",
-            include_answer=True,
-            include_raw_content=False,
-            include_images=False
-        )
+        if tavily_search is None:
+            from langchain_community.tools.tavily_search import TavilySearchResults
+            tavily_search = TavilySearchResults(
+                max_results= settings.TAVILY_MAX_RESULTS,
+                search_depth="advanced",
+                include_answer=True,
+                include_raw_content=False,
+                include_images=False
+            )
+        self.tavily_search = tavily_search
+        
+        # Result cache shared by every RetrievalService in the process
+        if use_cache is None:
+            use_cache = settings.SEARCH_CACHE_ENABLED
+        if cache is None and use_cache:
+            cache = get_search_cache()
+        self.cache = cache
+        
+        # One pooled async client per event loop, created on first use
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing = set()
+    
+    def _async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._client_loop is not loop:
+            self._discard_client(self._client, self._client_loop)
+            self._client = None
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(settings.HTTP_TIMEOUT),
+                limits=httpx.Limits(max_connections=settings.HTTP_MAX_CONNECTIONS,
+                                    max_keepalive_connections=settings.HTTP_MAX_CONNECTIONS),
+                headers={"User-Agent": os.environ.get("USER_AGENT", "RAG-Chatbot/1.0")}
+            )
+            self._client_loop = loop
+        return self._client
+    
+    def _discard_client(self, client: httpx.AsyncClient, client_loop: asyncio.AbstractEventLoop):
+        """Close a client made on another event loop: on that loop if it still runs, else on this one"""
+        if client_loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), client_loop)
+            return
+        task = asyncio.get_running_loop().create_task(self._aclose_quietly(client))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+    
+    @staticmethod
+    async def _aclose_quietly(client: httpx.AsyncClient):
+        try:
+            await client.aclose()
+        except Exception:
+            # Its connections belonged to a loop that is gone
+            pass
+    
+    async def aclose(self):
+        """Close the pooled async HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
     def search_wikipedia(self, query: str) -> str:
         """Search Wikipedia"""
-        return self.wiki.invoke({"query": query})
+        if self.cache is None:
+            return self._search_wikipedia(query)
+        return self.cache.get_or_fetch("wikipedia", query, lambda: self._search_wikipedia(query))
+    
+    def _search_wikipedia(self, query: str) -> str:
+        with metrics.timer("web_search_seconds", source="wikipedia"):
+            return self.wiki.invoke({"query": query})
+    
+    async def asearch_wikipedia(self, query: str) -> str:
+        """Search Wikipedia over the pooled async client, formatted like search_wikipedia"""
+        if self.cache is None:
+            return await self._asearch_wikipedia(query)
+        return await self.cache.aget_or_fetch("wikipedia", query, lambda: self._asearch_wikipedia(query))
+    
+    async def _asearch_wikipedia(self, query: str) -> str:
+        with metrics.timer("web_search_seconds", source="wikipedia"):
+            if self._injected_wiki:
+                return await self.wiki.ainvoke({"query": query})
+            return await self._asearch_wikipedia_api(query)
+    
+    async def _asearch_wikipedia_api(self, query: str) -> str:
+        client = self._async_client()
+        response = await client.get(WIKIPEDIA_API_URL, params={
+            "action": "query", "list": "search", "format": "json",
+            "srsearch": query[:WIKIPEDIA_MAX_QUERY_LENGTH], "srlimit": self.WIKI_TOP_K,
+        })
+        response.raise_for_status()
+        titles = [hit["title"] for hit in response.json().get("query", {}).get("search", [])]
+        
+        summaries = []
+        for title in titles[:self.WIKI_TOP_K]:
+            response = await client.get(WIKIPEDIA_API_URL, params={
+                "action": "query", "prop": "extracts", "exintro": 1, "explaintext": 1,
+                "redirects": 1, "format": "json", "titles": title,
+            })
+            response.raise_for_status()
+            for page in response.json().get("query", {}).get("pages", {}).values():
+                if page.get("extract"):
+                    summaries.append(f"Page: {title}\nSummary: {page['extract']}")
+        if not summaries:
+            return "No good Wikipedia Search Result was found"
+        return "\n\n".join(summaries)[:self.WIKI_CHARS_MAX]
     
     def search_tavily(self, query: str) -> str:
         """
         Search the web using Tavily for current/news information
         """
         try:
-            results = self.tavily_search.invoke({"query": query})
+            if self.cache is None:
+                return self._search_tavily(query)
+            return self.cache.get_or_fetch("tavily", query, lambda: self._search_tavily(query))
             
-            if not results:
-                return "No results found."
-            
-            # Format results
-            formatted_results = []
-            for i, result in enumerate(results, 1):
-                title = result.get('title', 'No title')
-                content = result.get('content', 'No content')
-                url = result.get('url', '')
-                
-                formatted_results.append(
-                    f"Result {i}:\n"
-                    f"Title: {title}\n"
-                    f"Content: {content}\n"
-                    f"URL: {url}\n"
-                )
-            
-            return "\n".join(formatted_results)
+        except Exception as e:
+            metrics.inc("web_search_errors_total", source="tavily")
+            return f"Error during Tavily search: {str(e)}"
+    
+    def _search_tavily(self, query: str) -> str:
+        """Tavily call that raises on failure, so errors never reach the cache"""
+        with metrics.timer("web_search_seconds", source="tavily"):
+            results = self.tavily_search.invoke({"query": query})
+        return self._tool_results(results)
+    
+    def _tool_results(self, results) -> str:
+        if isinstance(results, str):
+            # The LangChain tool reports some failures as a plain string
+            raise RuntimeError(results)
+        return self._format_tavily_results(results)
+    
+    async def asearch_tavily(self, query: str) -> str:
+        """Async Tavily search over the pooled client, formatted like search_tavily"""
+        try:
+            if self.cache is None:
+                return await self._asearch_tavily(query)
+            return await self.cache.aget_or_fetch("tavily", query, lambda: self._asearch_tavily(query))
             
         except Exception as e:
-            return f"Error during Tavily search: {str(e)}"
\ No newline at end of file
+            metrics.inc("web_search_errors_total", source="tavily")
+            return f"Error during Tavily search: {str(e)}"
+    
+    async def _asearch_tavily(self, query: str) -> str:
+        if self._injected_tavily:
+            with metrics.timer("web_search_seconds", source="tavily"):
+                results = await self.tavily_search.ainvoke({"query": query})
+            return self._tool_results(results)
+        with metrics.timer("web_search_seconds", source="tavily"):
+            response = await self._async_client().post(
+                TAVILY_API_URL,
+                headers={"Authorization": f"Bearer {settings.TAVILY_API_KEY}"},
+                json={
+                    "query": query,
+                    "max_results": settings.TAVILY_MAX_RESULTS,
+                    "search_depth": "advanced",
+                    "include_answer": True,
+                    "include_raw_content": False,
+                    "include_images": False,
+                }
+            )
+        response.raise_for_status()
+        return self._format_tavily_results(response.json().get("results", []))
+    
+    @staticmethod
+    def _format_tavily_results(results: List[Dict]) -> str:
+        if not results:
+            return "No results found."
+        
+        # Format results
+        formatted_results = []
+        for i, result in enumerate(results, 1):
+            title = result.get('title', 'No title')
+            content = result.get('content', 'No content')
+            url = result.get('url', '')
+            
+            formatted_results.append(
+                f"Result {i}:\n"
+                f"Title: {title}\n"
+                f"Content: {content}\n"
+                f"URL: {url}\n"
+            )
+        
+        return "\n".join(formatted_results)
\ No newline at end of file
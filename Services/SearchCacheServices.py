@@ -0,0 +1,278 @@
+import asyncio
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+from Config.settings import settings
+from Services.EmbeddingServices import normalize_text
+from Utils.Metrics import metrics
+
+CacheKey = Tuple[str, str]
+
+def normalize_query(query: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a search query"""
+    return normalize_text(query).lower().rstrip("?!. ")
+
+@dataclass
+class CachedResult:
+    value: str
+    stored_at: float
+
+class SearchCache:
+    """
+    Cache of web search results keyed by (source, normalized query); the
+    process shares one, from get_search_cache().
+
+    An entry is fresh for the TTL of its source and then stale for the source's
+    stale TTL: a stale entry is still returned, and one background refresh is
+    started (stale-while-revalidate). Concurrent misses for the same key share
+    one upstream call (single flight); on the async path the call survives the
+    cancellation of the caller that started it while others still wait for
+    it. Failed calls are never cached, and a failed refresh keeps the stale
+    entry. The least recently used entry is
+    evicted beyond `max_entries`. With a `path`, entries are saved as JSON at
+    most every `save_interval` seconds and at exit, and reloaded on start.
+    """
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, stale_ttls: Optional[Dict[str, float]] = None,
+                 max_entries: int = 2000, default_ttl: float = 600, path: Optional[str] = None,
+                 save_interval: float = 5.0):
+        self.ttls = ttls or {}
+        self.stale_ttls = stale_ttls or {}
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.path = path
+        self.save_interval = save_interval
+        self.counts = {"hit": 0, "stale": 0, "miss": 0, "coalesced": 0, "refresh": 0, "refresh_failed": 0}
+        self._entries: "OrderedDict[CacheKey, CachedResult]" = OrderedDict()
+        self._inflight: Dict[CacheKey, Future] = {}
+        # Coalesced callers still waiting on each in-flight future
+        self._waiters: Dict[Future, int] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.monotonic()
+        if path:
+            self._load()
+            atexit.register(self.save)
+    
+    def _ttl(self, source: str) -> float:
+        return self.ttls.get(source, self.default_ttl)
+    
+    def _count(self, source: str, result: str):
+        with self._lock:
+            self.counts[result] += 1
+        metrics.inc("search_cache_total", source=source, result=result)
+    
+    def _lookup(self, key: CacheKey) -> Tuple[Optional[str], bool]:
+        """(value, is_fresh); (None, False) when missing or past its stale TTL"""
+        source = key[0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, False
+            age = time.time() - entry.stored_at
+            if age >= self._ttl(source) + self.stale_ttls.get(source, 0):
+                del self._entries[key]
+                return None, False
+            self._entries.move_to_end(key)
+            return entry.value, age < self._ttl(source)
+    
+    def _store(self, key: CacheKey, value: str):
+        with self._lock:
+            self._entries[key] = CachedResult(value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+        self._maybe_save()
+    
+    def _claim(self, key: CacheKey) -> Tuple[Future, bool]:
+        """The in-flight future for key and whether the caller must produce it"""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._waiters[future] = self._waiters.get(future, 0) + 1
+                return future, False
+            future = self._inflight[key] = Future()
+            return future, True
+    
+    def _leave(self, future: Future):
+        with self._lock:
+            self._waiters[future] -= 1
+            if not self._waiters[future]:
+                del self._waiters[future]
+    
+    def _abandon(self, key: CacheKey, future: Future) -> bool:
+        """Forget an in-flight call nobody waits for any more; False when coalesced callers still need it"""
+        with self._lock:
+            if self._waiters.get(future):
+                return False
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            return True
+    
+    def _settle(self, key: CacheKey, future: Future, value: Optional[str] = None,
+                error: Optional[BaseException] = None):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        if error is None:
+            future.set_result(value)
+        else:
+            # Waiters were not cancelled themselves; give them an ordinary error
+            future.set_exception(error if isinstance(error, Exception) else RuntimeError("Search was cancelled"))
+    
+    def _single_flight(self, key: CacheKey, fetch: Callable[[], str]) -> str:
+        future, leader = self._claim(key)
+        if not leader:
+            self._count(key[0], "coalesced")
+            try:
+                return future.result()
+            finally:
+                self._leave(future)
+        try:
+            value = fetch()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._store(key, value)
+        self._settle(key, future, value)
+        return value
+    
+    async def _asingle_flight(self, key: CacheKey, afetch: Callable[[], Awaitable[str]]) -> str:
+        future, leader = self._claim(key)
+        if not leader:
+            self._count(key[0], "coalesced")
+            try:
+                # Shielded, so one waiter giving up does not cancel the call for the others
+                return await asyncio.shield(asyncio.wrap_future(future))
+            finally:
+                self._leave(future)
+        fetch = asyncio.ensure_future(self._afetch(key, future, afetch))
+        fetch.add_done_callback(lambda task: task.cancelled() or task.exception())
+        try:
+            return await asyncio.shield(fetch)
+        except asyncio.CancelledError:
+            # The caller gave up, e.g. a speculative branch the router did not pick:
+            # the call goes on for coalesced waiters and is cancelled when there are none
+            if self._abandon(key, future):
+                fetch.cancel()
+            raise
+    
+    async def _afetch(self, key: CacheKey, future: Future, afetch: Callable[[], Awaitable[str]]) -> str:
+        try:
+            value = await afetch()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._store(key, value)
+        self._settle(key, future, value)
+        return value
+    
+    def _refresh(self, key: CacheKey, fetch: Callable[[], str]):
+        try:
+            self._single_flight(key, fetch)
+        except Exception:
+            self._count(key[0], "refresh_failed")
+    
+    async def _arefresh(self, key: CacheKey, afetch: Callable[[], Awaitable[str]]):
+        try:
+            await self._asingle_flight(key, afetch)
+        except Exception:
+            self._count(key[0], "refresh_failed")
+    
+    def get_or_fetch(self, source: str, query: str, fetch: Callable[[], str]) -> str:
+        """Cached result for the query, calling fetch() at most once across concurrent callers"""
+        key = (source, normalize_query(query))
+        value, fresh = self._lookup(key)
+        if value is not None:
+            if not fresh and key not in self._inflight:
+                self._count(source, "refresh")
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="search-refresh")
+                self._executor.submit(self._refresh, key, fetch)
+            self._count(source, "hit" if fresh else "stale")
+            return value
+        self._count(source, "miss")
+        return self._single_flight(key, fetch)
+    
+    async def aget_or_fetch(self, source: str, query: str, afetch: Callable[[], Awaitable[str]]) -> str:
+        """Async get_or_fetch; stale entries are refreshed by a task on the running loop"""
+        key = (source, normalize_query(query))
+        value, fresh = self._lookup(key)
+        if value is not None:
+            if not fresh and key not in self._inflight:
+                self._count(source, "refresh")
+                task = asyncio.create_task(self._arefresh(key, afetch))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            self._count(source, "hit" if fresh else "stale")
+            return value
+        self._count(source, "miss")
+        return await self._asingle_flight(key, afetch)
+    
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable search cache {self.path}: {e}")
+            return
+        now = time.time()
+        for source, query, value, stored_at in rows:
+            if now - stored_at < self._ttl(source) + self.stale_ttls.get(source, 0):
+                self._entries[(source, query)] = CachedResult(value, stored_at)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def _maybe_save(self):
+        if self.path and time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+    
+    def save(self):
+        """Write the entries, least recently used first, if anything changed"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            rows = [[source, query, entry.value, entry.stored_at] for (source, query), entry in self._entries.items()]
+            self._dirty = False
+            self._last_save = time.monotonic()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(rows, f)
+        os.replace(tmp_path, self.path)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+    
+    def stats(self) -> Dict[str, int]:
+        return {**self.counts, "entries": len(self._entries)}
+
+_shared_cache: Optional[SearchCache] = None
+_shared_cache_lock = threading.Lock()
+
+def get_search_cache() -> SearchCache:
+    """The process-wide SearchCache from settings, so every service shares its entries, single flight and file"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = SearchCache(
+                ttls=settings.SEARCH_CACHE_TTLS,
+                stale_ttls=settings.SEARCH_CACHE_STALE_TTLS,
+                max_entries=settings.SEARCH_CACHE_MAX_ENTRIES,
+                path=settings.SEARCH_CACHE_PATH
+            )
+        return _shared_cache
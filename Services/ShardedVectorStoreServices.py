@@ -0,0 +1,334 @@
+import heapq
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from Services.NumpyVectorStoreServices import NumpyVectorStore
+from Utils.Hnsw import open_chroma
+from Utils.Metrics import metrics
+
+DEFAULT_SHARD = "default"
+
+def shard_for_source(source: str, tags: Dict[str, str], by: str = "tag") -> str:
+    """Shard of a chunk source: its tag when by="tag" and it has one, else its host"""
+    name = tags.get(source) if by == "tag" else None
+    name = name or urlparse(source).netloc or DEFAULT_SHARD
+    # Chroma collection names allow [A-Za-z0-9._-] and must start and end alphanumeric
+    return re.sub(r"[^A-Za-z0-9._-]", "_", name).strip("._-") or DEFAULT_SHARD
+
+class ShardedVectorStore(VectorStore):
+    """
+    Vector store partitioned into independent shards, one per source tag or domain.
+
+    A shard is a Chroma collection "<collection_name>-<shard>" in the shared
+    persist directory, or a NumpyVectorStore in "<directory>/<shard>", so one
+    shard can be cleared and rebuilt without touching the others. Writes are
+    routed by each chunk's metadata["source"]. A query runs on the selected
+    shards in parallel and the per-shard top-k lists are merged into a global
+    top-k by distance (every shard uses the same metric).
+
+    shards.json lists the shards with the sum of their unit embeddings and
+    their size. select_shards() ranks shards by cosine between the query and
+    those centroids, nearest-centroid style like the fast router, and keeps the
+    best `prune_top`; 0 searches every shard.
+    """
+    def __init__(self, backend: str, embedding: Embeddings, directory: str, collection_name: str,
+                 tags: Optional[Dict[str, str]] = None, shard_by: str = "tag", prune_top: int = 0,
+                 max_workers: int = 8, dtype: str = "float16", collection_metadata: Optional[dict] = None,
+                 writable: bool = False):
+        self.backend = backend
+        self.embedding = embedding
+        self.directory = directory
+        self.collection_name = collection_name
+        self.tags = tags or {}
+        self.shard_by = shard_by
+        self.prune_top = prune_top
+        self.dtype = dtype
+        self.collection_metadata = collection_metadata
+        self.writable = writable
+        self.registry_path = os.path.join(directory, "shards.json")
+        self.shards: Dict[str, VectorStore] = {}
+        self._centroids: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shard-query")
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.registry_path):
+            with open(self.registry_path, "r", encoding="utf-8") as f:
+                self._centroids = json.load(f)
+        for name in self._centroids:
+            self._shard(name)
+    
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+    
+    def shard_for(self, metadata: Optional[dict]) -> str:
+        return shard_for_source((metadata or {}).get("source", ""), self.tags, self.shard_by)
+    
+    def _shard(self, name: str) -> VectorStore:
+        """Open (creating if needed) the store of one shard"""
+        with self._lock:
+            store = self.shards.get(name)
+            if store is None:
+                if self.backend == "numpy":
+                    store = NumpyVectorStore(os.path.join(self.directory, name), self.embedding, dtype=self.dtype)
+                else:
+                    store = open_chroma(f"{self.collection_name}-{name}", self.embedding, self.directory,
+                                        metadata=self.collection_metadata, writable=self.writable)
+                self.shards[name] = store
+                self._centroids.setdefault(name, {"sum": None, "count": 0})
+            return store
+    
+    def _save_registry(self):
+        with self._lock:
+            data = json.dumps(self._centroids)
+        tmp_path = self.registry_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self.registry_path)
+    
+    def _update_centroid(self, name: str, vectors: np.ndarray, sign: int):
+        if not len(vectors):
+            return
+        unit = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            entry = self._centroids[name]
+            total = np.zeros(unit.shape[1]) if entry["sum"] is None else np.asarray(entry["sum"])
+            entry["sum"] = (total + sign * unit.sum(axis=0)).tolist()
+            entry["count"] = max(0, entry["count"] + sign * len(unit))
+    
+    def _map(self, fn, names: List[str]) -> List[Any]:
+        """fn(name) for each shard, in parallel when there is more than one"""
+        if len(names) <= 1:
+            return [fn(name) for name in names]
+        return list(self._executor.map(fn, names))
+    
+    def add_embeddings(self, texts: List[str], embeddings: List[List[float]],
+                       metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None) -> List[str]:
+        """Route precomputed embeddings to their shards; existing ids are replaced"""
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        groups: Dict[str, List[int]] = {}
+        for i, metadata in enumerate(metadatas):
+            groups.setdefault(self.shard_for(metadata), []).append(i)
+        vectors = np.asarray(embeddings, dtype=np.float32)
+
+        def add(name: str):
+            rows = groups[name]
+            store = self._shard(name)
+            shard_texts = [texts[i] for i in rows]
+            shard_metadatas = [metadatas[i] for i in rows]
+            shard_ids = [ids[i] for i in rows]
+            # Replaced ids leave the centroid before their new embeddings enter it, as in delete()
+            replaced = store.get(ids=list(dict.fromkeys(shard_ids)), include=["embeddings"])
+            if replaced["ids"]:
+                self._update_centroid(name, np.asarray(replaced["embeddings"], dtype=np.float32), -1)
+            if self.backend == "numpy":
+                store.add_embeddings(shard_texts, vectors[rows], shard_metadatas, shard_ids)
+            else:
+                store._collection.upsert(ids=shard_ids, embeddings=vectors[rows].tolist(),
+                                         documents=shard_texts, metadatas=shard_metadatas)
+            last = {ids[i]: i for i in rows}
+            self._update_centroid(name, vectors[list(last.values())], +1)
+
+        self._map(add, list(groups))
+        self._save_registry()
+        return list(ids)
+    
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, *,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        return self.add_embeddings(texts, self.embedding.embed_documents(texts), metadatas, ids)
+    
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Delete ids from whichever shards hold them"""
+        if not ids:
+            return False
+
+        def delete(name: str) -> int:
+            store = self.shards[name]
+            found = store.get(ids=ids, include=["embeddings"])
+            if not found["ids"]:
+                return 0
+            self._update_centroid(name, np.asarray(found["embeddings"], dtype=np.float32), -1)
+            if self.backend == "numpy":
+                store.delete(found["ids"])
+            else:
+                store._collection.delete(ids=found["ids"])
+            return len(found["ids"])
+
+        deleted = sum(self._map(delete, list(self.shards)))
+        self._save_registry()
+        return deleted > 0
+    
+    def clear_shard(self, name: str):
+        """Drop one shard entirely; the others are untouched"""
+        with self._lock:
+            store = self.shards.pop(name, None)
+            self._centroids.pop(name, None)
+        if store is not None:
+            if self.backend == "numpy":
+                shutil.rmtree(store.directory, ignore_errors=True)
+            else:
+                store.delete_collection()
+        self._save_registry()
+    
+    def close(self):
+        """Stop the query threads once no search is running on this store"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    def persist(self):
+        """Writes are durable when they return; kept for parity with Chroma"""
+    
+    def count(self) -> int:
+        return sum(self.shard_counts().values())
+    
+    def shard_counts(self) -> Dict[str, int]:
+        return {
+            name: store.count() if self.backend == "numpy" else store._collection.count()
+            for name, store in list(self.shards.items())
+        }
+    
+    def version(self) -> str:
+        """Changes whenever any shard is written to"""
+        if self.backend == "numpy":
+            return ",".join(f"{name}:{store.version()}" for name, store in sorted(self.shards.items()))
+        sqlite_path = os.path.join(self.directory, "chroma.sqlite3")
+        return str(os.stat(sqlite_path).st_mtime_ns) if os.path.exists(sqlite_path) else ""
+    
+    def get(self, ids: Optional[List[str]] = None, where: Optional[dict] = None,
+            include: Optional[List[str]] = None) -> Dict[str, list]:
+        """Chroma-style get across shards; a where on "source" reads only that source's shard"""
+        include = ["documents", "metadatas"] if include is None else include
+        if where and "source" in where:
+            name = self.shard_for({"source": where["source"]})
+            names = [name] if name in self.shards else []
+        else:
+            names = list(self.shards)
+        parts = self._map(lambda name: self.shards[name].get(ids=ids, where=where, include=include), names)
+        merged: Dict[str, list] = {"ids": []}
+        for column in include:
+            merged[column] = []
+        for part in parts:
+            merged["ids"].extend(part["ids"])
+            for column in include:
+                merged[column].extend(part[column] if part.get(column) is not None else [])
+        if ids is not None:
+            # Keep the caller's order, as a single collection would
+            position = {chunk_id: i for i, chunk_id in enumerate(merged["ids"])}
+            order = [position[chunk_id] for chunk_id in ids if chunk_id in position]
+            merged = {column: [values[i] for i in order] for column, values in merged.items()}
+        return merged
+    
+    def select_shards(self, query_vector: List[float], top: Optional[int] = None) -> List[str]:
+        """Shards whose centroid is closest to the query, best first; every shard when pruning is off"""
+        top = self.prune_top if top is None else top
+        names = list(self.shards)
+        if not top or len(names) <= top:
+            return names
+        query = np.asarray(query_vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = {}
+        for name in names:
+            entry = self._centroids.get(name) or {}
+            if entry.get("sum") is None or not entry.get("count"):
+                continue
+            centroid = np.asarray(entry["sum"], dtype=np.float32)
+            scores[name] = float(centroid @ query / (np.linalg.norm(centroid) or 1.0))
+        if not scores:
+            return names
+        selected = sorted(scores, key=scores.get, reverse=True)[:top]
+        metrics.observe("shard_fanout", len(selected))
+        return selected
+    
+    def _search_shard(self, name: str, query_vectors: List[List[float]], k: int) -> List[List[Tuple[Document, float]]]:
+        """(document, distance) top-k of one shard for each query vector"""
+        store = self.shards[name]
+        with metrics.timer("shard_query_seconds", shard=name):
+            if self.backend == "numpy":
+                return store.batch_similarity_search_by_vector_with_score(query_vectors, k=k)
+            count = store._collection.count()
+            if not count:
+                return [[] for _ in query_vectors]
+            results = store._collection.query(
+                query_embeddings=query_vectors,
+                n_results=min(k, count),
+                include=["documents", "metadatas", "distances"]
+            )
+        return [
+            [(Document(page_content=text, metadata=metadata or {}, id=chunk_id), distance)
+             for chunk_id, text, metadata, distance in zip(ids, texts, metadatas, distances)]
+            for ids, texts, metadatas, distances in zip(
+                results["ids"], results["documents"], results["metadatas"], results["distances"]
+            )
+        ]
+    
+    def batch_similarity_search_by_vector_with_score(self, embeddings: List[List[float]], k: int = 4,
+                                                     shards: Optional[List[List[str]]] = None
+                                                     ) -> List[List[Tuple[Document, float]]]:
+        """
+        Global top-k (document, distance) for each query vector. `shards` gives
+        the shards to search per query; by default select_shards() picks them.
+        """
+        embeddings = [list(map(float, vector)) for vector in embeddings]
+        if shards is None:
+            shards = [self.select_shards(vector) for vector in embeddings]
+        # One batched query per shard over the queries that selected it
+        wanted: Dict[str, List[int]] = {}
+        for i, names in enumerate(shards):
+            for name in names:
+                wanted.setdefault(name, []).append(i)
+        names = list(wanted)
+        per_shard = self._map(lambda name: self._search_shard(name, [embeddings[i] for i in wanted[name]], k), names)
+
+        candidates: List[List[Tuple[Document, float]]] = [[] for _ in embeddings]
+        for name, hits in zip(names, per_shard):
+            for i, query_hits in zip(wanted[name], hits):
+                candidates[i].extend(query_hits)
+        return [heapq.nsmallest(k, hits, key=lambda hit: hit[1]) for hits in candidates]
+    
+    def batch_similarity_search_by_vector(self, embeddings: List[List[float]], k: int = 4) -> List[List[Document]]:
+        return [[doc for doc, _ in hits] for hits in self.batch_similarity_search_by_vector_with_score(embeddings, k)]
+    
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4,
+                                               shards: Optional[List[str]] = None) -> List[Tuple[Document, float]]:
+        return self.batch_similarity_search_by_vector_with_score(
+            [embedding], k, shards=[shards] if shards is not None else None
+        )[0]
+    
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, kwargs.get("shards"))]
+    
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k, kwargs.get("shards"))
+    
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+    
+    def _select_relevance_score_fn(self):
+        if self.backend == "numpy":
+            return self._cosine_relevance_score_fn
+        space = (self.collection_metadata or {}).get("hnsw:space", "l2")
+        if space == "cosine":
+            return self._cosine_relevance_score_fn
+        if space == "ip":
+            return self._max_inner_product_relevance_score_fn
+        return self._euclidean_relevance_score_fn
+    
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, *,
+                   ids: Optional[List[str]] = None, backend: str = "chroma", directory: str = "./chroma_db",
+                   collection_name: str = "rag_chatbot", **kwargs: Any) -> "ShardedVectorStore":
+        store = cls(backend, embedding, directory, collection_name, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
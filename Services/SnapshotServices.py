@@ -0,0 +1,309 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from Config.settings import settings
+from Utils.Metrics import metrics
+
+MANIFEST_NAME = "snapshot.json"
+CURRENT_NAME = "CURRENT"
+STAGING_PREFIX = ".staging-"
+# Files this repo writes and never touches once published. Chroma rewrites
+# chroma.sqlite3 whenever a collection is opened, so the store is checksummed
+# by its contents instead of its bytes.
+OWN_FILES = ("lexical_index.npz", "ingest_manifest.json", "numpy_store")
+
+logger = logging.getLogger(__name__)
+
+def store_digest(vector_store) -> str:
+    """sha256 over every chunk's id, text, metadata and float32 embedding, in id order"""
+    data = vector_store.get(include=["documents", "metadatas", "embeddings"])
+    digest = hashlib.sha256()
+    for i in sorted(range(len(data["ids"])), key=lambda i: data["ids"][i]):
+        digest.update(data["ids"][i].encode("utf-8") + b"\0")
+        digest.update((data["documents"][i] or "").encode("utf-8") + b"\0")
+        digest.update(json.dumps(data["metadatas"][i] or {}, sort_keys=True).encode("utf-8") + b"\0")
+        digest.update(np.asarray(data["embeddings"][i], dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+def file_digests(directory: str) -> Dict[str, str]:
+    """sha256 of each of OWN_FILES under directory, by relative path"""
+    paths = []
+    for name in OWN_FILES:
+        path = os.path.join(directory, name)
+        if os.path.isdir(path):
+            paths.extend(os.path.join(root, f) for root, _, files in os.walk(path) for f in files)
+        elif os.path.exists(path):
+            paths.append(path)
+    digests = {}
+    for path in sorted(paths):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        digests[os.path.relpath(path, directory).replace(os.sep, "/")] = digest.hexdigest()
+    return digests
+
+def snapshot_info(vector_store, pages: int) -> Dict[str, Any]:
+    """What a snapshot was built with and holds, for its manifest"""
+    return {
+        "embedding_model": settings.EMBEDDING_MODEL,
+        "chunk_size": settings.CHUNK_SIZE,
+        "chunk_overlap": settings.CHUNK_OVERLAP,
+        "backend": settings.VECTOR_BACKEND,
+        "sharded": settings.VECTOR_SHARDING_ENABLED,
+        "collection_name": settings.COLLECTION_NAME,
+        "hnsw": {"space": settings.HNSW_SPACE, "m": settings.HNSW_M,
+                 "construction_ef": settings.HNSW_CONSTRUCTION_EF},
+        "chunks": vector_store.count(),
+        "pages": pages,
+    }
+
+class SnapshotService:
+    """
+    Versioned, immutable index snapshots under one root directory.
+
+    setup.py builds each refresh in <root>/.staging-*, a copy of the live
+    snapshot so ingestion stays incremental, then publish() writes its
+    snapshot.json manifest, renames it to <root>/<version> and atomically
+    replaces <root>/CURRENT, the name of the live version. Published
+    snapshots are never written to again. A snapshot directory is
+    self-contained: copy it into another node's root and activate() it to
+    serve it without re-embedding.
+    """
+    def __init__(self, root: str, keep: int = 3):
+        self.root = root
+        self.keep = keep
+        os.makedirs(root, exist_ok=True)
+    
+    def path(self, version: str) -> str:
+        return os.path.join(self.root, version)
+    
+    def current(self) -> Optional[str]:
+        """The live version, or None before the first publish"""
+        try:
+            with open(os.path.join(self.root, CURRENT_NAME), "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+    
+    def versions(self) -> List[str]:
+        """Published versions, oldest first"""
+        return sorted(
+            name for name in os.listdir(self.root)
+            if not name.startswith(".") and os.path.exists(os.path.join(self.root, name, MANIFEST_NAME))
+        )
+    
+    def manifest(self, version: str) -> Dict[str, Any]:
+        with open(os.path.join(self.path(version), MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    
+    def incompatible(self, version: str) -> Optional[str]:
+        """Why this process cannot serve a snapshot, or None when it can"""
+        manifest = self.manifest(version)
+        expected = {"embedding_model": settings.EMBEDDING_MODEL, "backend": settings.VECTOR_BACKEND,
+                    "sharded": settings.VECTOR_SHARDING_ENABLED}
+        for key, value in expected.items():
+            if manifest.get(key) != value:
+                return f"built with {key}={manifest.get(key)!r}, this process uses {value!r}"
+        return None
+    
+    def begin(self, full: bool = False) -> str:
+        """
+        Staging directory for the next snapshot. An interrupted build's staging
+        directory is reused, so its ingest checkpoint resumes it; a full build
+        deletes interrupted ones and starts empty.
+        """
+        interrupted = sorted(name for name in os.listdir(self.root) if name.startswith(STAGING_PREFIX))
+        if full:
+            for name in interrupted:
+                shutil.rmtree(self.path(name), ignore_errors=True)
+        elif interrupted:
+            return self.path(interrupted[-1])
+        # A fresh name per build: Chroma caches its client by path
+        staging = self.path(STAGING_PREFIX + datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ"))
+        current = self.current()
+        if current and not full:
+            shutil.copytree(self.path(current), staging, ignore=shutil.ignore_patterns(MANIFEST_NAME))
+        else:
+            os.makedirs(staging)
+        return staging
+    
+    def publish(self, staging: str, vector_store, info: Dict[str, Any]) -> str:
+        """Write the manifest, move staging into place as a new version and make it live"""
+        version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        while os.path.exists(self.path(version)):
+            time.sleep(1)
+            version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        files = file_digests(staging)
+        content = store_digest(vector_store)
+        manifest = {
+            "version": version,
+            "created": datetime.now(timezone.utc).isoformat(),
+            **info,
+            "files": files,
+            "content_sha256": content,
+            "checksum": hashlib.sha256(json.dumps({"files": files, "content": content}, sort_keys=True)
+                                       .encode("utf-8")).hexdigest(),
+        }
+        with open(os.path.join(staging, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(staging, self.path(version))
+        self._set_current(version)
+        metrics.inc("snapshots_published_total")
+        return version
+    
+    def verify(self, version: str, vector_store) -> List[str]:
+        """What no longer matches the manifest (empty when intact); vector_store must be opened on the snapshot"""
+        manifest = self.manifest(version)
+        problems = []
+        files = file_digests(self.path(version))
+        for name in sorted(set(files) | set(manifest["files"])):
+            if files.get(name) != manifest["files"].get(name):
+                state = "missing" if name not in files else "unexpected" if name not in manifest["files"] else "checksum mismatch"
+                problems.append(f"{name}: {state}")
+        if store_digest(vector_store) != manifest["content_sha256"]:
+            problems.append("vector store contents: checksum mismatch")
+        return problems
+    
+    def activate(self, version: str):
+        """Make a published (e.g. copied-in or older) snapshot live"""
+        if not os.path.exists(os.path.join(self.path(version), MANIFEST_NAME)):
+            raise FileNotFoundError(f"No snapshot {version!r} in {self.root}")
+        self._set_current(version)
+    
+    def _set_current(self, version: str):
+        tmp_path = os.path.join(self.root, CURRENT_NAME + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.root, CURRENT_NAME))
+    
+    def gc(self) -> List[str]:
+        """Delete all but the newest `keep` versions, never the live one; returns the deleted versions"""
+        current = self.current()
+        versions = self.versions()
+        keep = set(versions[-self.keep:]) if self.keep > 0 else set()
+        removed = [version for version in versions if version not in keep and version != current]
+        for version in removed:
+            shutil.rmtree(self.path(version), ignore_errors=True)
+        return removed
+
+class SnapshotWatcher:
+    """
+    Serves the live snapshot and swaps to a new one when CURRENT changes.
+
+    load(path) opens whatever a request needs from one snapshot (e.g. a
+    VectorStoreService and a RAGGraph). acquire() returns (version, loaded)
+    as one tuple and holds it until release(), so a request reads a single
+    snapshot throughout. A new version is loaded on a background thread while
+    the old one keeps serving, then swapped in with a single assignment. The
+    swapped-out pair is passed to close(loaded) once no request holds it.
+    """
+    def __init__(self, snapshots: SnapshotService, load: Callable[[str], Any], interval: float = 5.0,
+                 initial: Optional[Tuple[str, Any]] = None, close: Optional[Callable[[Any], None]] = None):
+        self.snapshots = snapshots
+        self.load = load
+        self.close = close
+        self.interval = interval
+        if initial is None:
+            version = snapshots.current()
+            if version is None:
+                raise FileNotFoundError("Database not found. Please run: python setup.py")
+            initial = (version, load(snapshots.path(version)))
+        self._active = initial
+        self._checked = time.monotonic()
+        self._loading: Optional[str] = None
+        self._failed = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        # Requests holding each pair, and swapped-out pairs waiting for their last request
+        self._holds: Dict[int, int] = {}
+        self._retired: Dict[int, Tuple[str, Any]] = {}
+        self.swaps = 0
+        self.error: Optional[str] = None
+    
+    @property
+    def version(self) -> str:
+        return self._active[0]
+    
+    def get(self) -> Tuple[str, Any]:
+        """The live (version, loaded) pair, not held; checks CURRENT at most every `interval` seconds"""
+        now = time.monotonic()
+        if now - self._checked >= self.interval:
+            self._checked = now
+            self.poll()
+        return self._active
+    
+    def acquire(self) -> Tuple[str, Any]:
+        """The live (version, loaded) pair, kept open until release() is called with it"""
+        self.get()
+        with self._lock:
+            active = self._active
+            self._holds[id(active)] = self._holds.get(id(active), 0) + 1
+        return active
+    
+    def release(self, held: Tuple[str, Any]):
+        """End a request's hold; the last release of a swapped-out pair closes it"""
+        with self._lock:
+            key = id(held)
+            self._holds[key] -= 1
+            if self._holds[key]:
+                return
+            del self._holds[key]
+            retired = self._retired.pop(key, None)
+        if retired is not None:
+            self._close(retired)
+    
+    def _close(self, pair: Tuple[str, Any]):
+        if self.close is None:
+            return
+        try:
+            self.close(pair[1])
+        except Exception:
+            logger.exception("Snapshot %s not closed cleanly", pair[0])
+    
+    def poll(self) -> Optional[threading.Thread]:
+        """Start loading CURRENT if it is new; returns the loading thread"""
+        version = self.snapshots.current()
+        with self._lock:
+            if version is None or version in (self._active[0], self._loading) or version in self._failed:
+                return None
+            self._loading = version
+            self._thread = threading.Thread(target=self._swap, args=(version,), name="snapshot-swap", daemon=True)
+        self._thread.start()
+        return self._thread
+    
+    def _swap(self, version: str):
+        start = time.perf_counter()
+        try:
+            reason = self.snapshots.incompatible(version)
+            if reason:
+                raise ValueError(reason)
+            loaded = self.load(self.snapshots.path(version))
+        except Exception as e:
+            self.error = f"Snapshot {version} not loaded: {e}"
+            logger.warning(self.error)
+            with self._lock:
+                self._failed.add(version)
+            metrics.inc("snapshot_swaps_total", outcome="failed")
+        else:
+            with self._lock:
+                previous = self._active
+                self._active = (version, loaded)
+                if self._holds.get(id(previous)):
+                    self._retired[id(previous)] = previous
+                    previous = None
+            if previous is not None:
+                self._close(previous)
+            self.swaps += 1
+            metrics.inc("snapshot_swaps_total", outcome="swapped")
+            metrics.observe("snapshot_load_seconds", time.perf_counter() - start)
+        finally:
+            with self._lock:
+                self._loading = None
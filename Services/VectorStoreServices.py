@@ -1,34 +1,218 @@
-from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
-from typing import List
+from typing import List, Optional
 from Config.settings import settings
-from Services.EmbeddingServices import EmbeddingService
+from Services.EmbeddingServices import CachedEmbeddings, EmbeddingService
+from Services.LexicalIndexServices import HybridRetriever, LexicalIndex
+from Services.NumpyVectorStoreServices import NumpyVectorStore
+from Services.RelevanceGateServices import ScoredRetriever, with_scores
+from Services.ShardedVectorStoreServices import ShardedVectorStore
+from Services.SnapshotServices import MANIFEST_NAME
+from Utils.Hnsw import hnsw_metadata, open_chroma
+from Utils.Metrics import metrics
 import os
+import uuid
 
 class VectorStoreService:
-    def __init__(self):
+    def __init__(self, directory: Optional[str] = None, writable: bool = False):
         # Get embeddings
         embedding_service = EmbeddingService()
+        self.embeddings = embedding_service.get_embeddings()
+        
+        # A snapshot directory holds the whole index: the Chroma files, numpy_store/ and the lexical index
+        self.persist_dir = directory or settings.CHROMA_PERSIST_DIR
+        numpy_dir = os.path.join(directory, "numpy_store") if directory else settings.NUMPY_STORE_DIR
+        lexical_path = os.path.join(directory, "lexical_index.npz") if directory else settings.LEXICAL_INDEX_PATH
+        self.ingest_manifest_path = (os.path.join(directory, "ingest_manifest.json") if directory
+                                     else settings.INGEST_MANIFEST_PATH)
         
         # Create directory for Chroma database if it doesn't exist
-        os.makedirs(settings.CHROMA_PERSIST_DIR, exist_ok=True)
+        os.makedirs(self.persist_dir, exist_ok=True)
+        
+        self.backend = settings.VECTOR_BACKEND
+        self.sharded = settings.VECTOR_SHARDING_ENABLED
+        if self.backend not in ("chroma", "numpy"):
+            raise ValueError(f"Unknown VECTOR_BACKEND {self.backend!r}, expected 'chroma' or 'numpy'")
+        collection_metadata = hnsw_metadata(settings.HNSW_SPACE, settings.HNSW_M,
+                                            settings.HNSW_CONSTRUCTION_EF, settings.HNSW_SEARCH_EF)
+        if self.sharded:
+            from Data.Urls import URL_TAGS
+            self.vector_store = ShardedVectorStore(
+                self.backend,
+                self.embeddings,
+                numpy_dir if self.backend == "numpy" else self.persist_dir,
+                settings.COLLECTION_NAME,
+                tags=URL_TAGS,
+                shard_by=settings.SHARD_BY,
+                prune_top=settings.SHARD_PRUNE_TOP,
+                max_workers=settings.SHARD_QUERY_WORKERS,
+                dtype=settings.NUMPY_STORE_DTYPE,
+                collection_metadata=collection_metadata,
+                writable=writable
+            )
+        elif self.backend == "numpy":
+            self.vector_store = NumpyVectorStore(
+                numpy_dir,
+                self.embeddings,
+                dtype=settings.NUMPY_STORE_DTYPE
+            )
+        else:
+            # Initialize Chroma (no Cassandra anymore!)
+            self.vector_store = open_chroma(
+                settings.COLLECTION_NAME,
+                self.embeddings,
+                self.persist_dir,
+                metadata=collection_metadata,
+                writable=writable
+            )
         
-        # Initialize Chroma (no Cassandra anymore!)
-        self.vector_store = Chroma(
-            collection_name=settings.COLLECTION_NAME,
-            embedding_function=embedding_service.get_embeddings(),
-            persist_directory=settings.CHROMA_PERSIST_DIR
-        )
-    
-    def add_documents(self, documents: List[Document]):
-        """Add documents to vector store"""
-        self.vector_store.add_documents(documents)
+        # BM25 index over the same chunks, kept in step by add_documents/delete
+        self.lexical_index: Optional[LexicalIndex] = None
+        if settings.HYBRID_RETRIEVAL_ENABLED:
+            self.lexical_index = LexicalIndex(lexical_path, k1=settings.BM25_K1, b=settings.BM25_B,
+                                              save_every=settings.LEXICAL_SAVE_EVERY)
+    
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None):
+        """Add documents to vector store, upserting by id when ids are given; flush() once done adding"""
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in documents]
+        self.vector_store.add_documents(documents, ids=ids)
+        self.vector_store.persist()
+        if self.lexical_index is not None:
+            self.lexical_index.add(ids, [doc.page_content for doc in documents])
+            self.lexical_index.maybe_save()
+    
+    def add_embeddings(self, documents: List[Document], embeddings: List[List[float]], ids: List[str]):
+        """Upsert documents whose embeddings were computed ahead of time"""
+        if not documents:
+            return
+        texts = [doc.page_content for doc in documents]
+        metadatas = [doc.metadata for doc in documents]
+        if self.backend == "numpy" or self.sharded:
+            self.vector_store.add_embeddings(texts, embeddings, metadatas, ids)
+        else:
+            self.vector_store._collection.upsert(ids=ids, embeddings=embeddings, documents=texts, metadatas=metadatas)
         self.vector_store.persist()
+        if self.lexical_index is not None:
+            self.lexical_index.add(ids, texts)
+            self.lexical_index.maybe_save()
+    
+    def get_ids(self, source: str) -> List[str]:
+        """Ids of every chunk stored for a given source URL"""
+        return self.vector_store.get(where={"source": source}, include=[])["ids"]
+    
+    def delete(self, ids: List[str]):
+        """Delete chunks by id"""
+        if ids:
+            self.vector_store.delete(ids=ids)
+            self.vector_store.persist()
+            if self.lexical_index is not None:
+                self.lexical_index.delete(ids)
+                self.lexical_index.maybe_save()
+    
+    def get_documents(self, ids: List[str]) -> List[Document]:
+        """Chunks by id, in the order of `ids`; unknown ids are skipped"""
+        if not ids:
+            return []
+        results = self.vector_store.get(ids=ids, include=["documents", "metadatas"])
+        found = {
+            chunk_id: Document(page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        }
+        return [found[chunk_id] for chunk_id in ids if chunk_id in found]
+    
+    def flush(self):
+        """Write what is still only in memory, the lexical index delta; call once a run of writes is done"""
+        if self.lexical_index is not None:
+            self.lexical_index.save()
+    
+    def rebuild_lexical_index(self) -> int:
+        """Re-index every chunk of the collection lexically; returns the number indexed"""
+        results = self.vector_store.get(include=["documents"])
+        self.lexical_index.clear()
+        self.lexical_index.add(results["ids"], results["documents"])
+        self.lexical_index.save()
+        return len(results["ids"])
+    
+    def version(self) -> str:
+        """
+        Changes whenever the index is refreshed, by this or another process: the
+        snapshot version, the numpy store's generation, or else the ingest manifest,
+        which ingestion rewrites after every batch it upserts. Not chroma.sqlite3,
+        which Chroma rewrites whenever a collection is opened.
+        """
+        if os.path.exists(os.path.join(self.persist_dir, MANIFEST_NAME)):
+            return os.path.basename(os.path.normpath(self.persist_dir))
+        if self.backend == "numpy":
+            return self.vector_store.version()
+        if not os.path.exists(self.ingest_manifest_path):
+            return ""
+        return str(os.stat(self.ingest_manifest_path).st_mtime_ns)
+    
+    def clear_shard(self, name: str) -> int:
+        """Drop one shard and its chunks from the lexical index; returns the number of chunks dropped"""
+        store = self.vector_store.shards.get(name)
+        if store is None:
+            return 0
+        ids = store.get(include=[])["ids"]
+        self.vector_store.clear_shard(name)
+        if self.lexical_index is not None and ids:
+            self.lexical_index.delete(ids)
+            self.lexical_index.maybe_save()
+        return len(ids)
     
     def get_retriever(self):
-        """Get retriever from vector store"""
-        return self.vector_store.as_retriever()
+        """Get retriever from vector store; dense hits carry their distance and relevance score"""
+        return self.hybrid_retriever(ScoredRetriever(self.vector_store, k=settings.RETRIEVAL_K))
+    
+    def hybrid_retriever(self, dense):
+        """Fuse a dense retriever with the lexical index; the dense retriever alone when hybrid is off or the index is empty"""
+        if self.lexical_index is None or not len(self.lexical_index):
+            return dense
+        return HybridRetriever(dense, self.lexical_index, self, k=settings.RETRIEVAL_K, rrf_k=settings.RRF_K)
     
     def similarity_search(self, query: str, k: int = 4):
         """Search for similar documents"""
-        return self.vector_store.similarity_search(query, k=k)
\ No newline at end of file
+        with metrics.timer("vector_store_query_seconds", op="search"):
+            return self.vector_store.similarity_search(query, k=k)
+    
+    def batch_similarity_search(self, queries: List[str], k: int = 4) -> List[List[Document]]:
+        """
+        Top-k documents for many queries with one embedding call and one Chroma query.
+        Like get_retriever(), each document carries its distance and relevance score.
+        """
+        if not queries:
+            return []
+        if isinstance(self.embeddings, CachedEmbeddings):
+            # Questions are not worth persisting to the disk cache
+            query_embeddings = self.embeddings.embed_documents(queries, persist=False)
+        else:
+            query_embeddings = self.embeddings.embed_documents(queries)
+        relevance_fn = self.vector_store._select_relevance_score_fn()
+        if self.backend == "numpy" or self.sharded:
+            with metrics.timer("vector_store_query_seconds", op="batch"):
+                results = self.vector_store.batch_similarity_search_by_vector_with_score(query_embeddings, k=k)
+            metrics.observe("vector_store_batch_queries", len(queries))
+            return [[with_scores(doc, distance, relevance_fn) for doc, distance in hits] for hits in results]
+        with metrics.timer("vector_store_query_seconds", op="batch"):
+            results = self.vector_store._collection.query(
+                query_embeddings=query_embeddings,
+                n_results=k,
+                include=["documents", "metadatas", "distances"]
+            )
+        metrics.observe("vector_store_batch_queries", len(queries))
+        return [
+            [with_scores(Document(page_content=text, metadata=metadata or {}), distance, relevance_fn)
+             for text, metadata, distance in zip(texts, metadatas, distances)]
+            for texts, metadatas, distances in zip(results["documents"], results["metadatas"], results["distances"])
+        ]
+    
+    def count(self) -> int:
+        """Number of chunks in the collection"""
+        if self.backend == "numpy" or self.sharded:
+            return self.vector_store.count()
+        return self.vector_store._collection.count()
+    
+    def close(self):
+        """Stop the shard query threads; a plain collection holds none"""
+        if self.sharded:
+            self.vector_store.close()
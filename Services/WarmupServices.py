@@ -0,0 +1,64 @@
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from Utils.Metrics import metrics
+
+class WarmupService:
+    """
+    Runs start-up phases in order on a background thread so the UI can render
+    while models and indexes load.
+
+    Each phase is a (name, callable) pair; its return value is kept in
+    results[name] and its duration in timings[name]. The first phase that
+    raises stops the run and leaves its message in `error` (and the
+    traceback in `error_traceback`).
+    """
+    def __init__(self, phases: List[Tuple[str, Callable[[], Any]]]):
+        self.phases = phases
+        self.results: Dict[str, Any] = {}
+        self.timings: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.error_traceback: Optional[str] = None
+        self.total_time: Optional[float] = None
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> "WarmupService":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+            self._thread.start()
+        return self
+    
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            for name, phase in self.phases:
+                phase_start = time.perf_counter()
+                self.results[name] = phase()
+                self.timings[name] = time.perf_counter() - phase_start
+                metrics.observe("startup_phase_seconds", self.timings[name], phase=name)
+        except Exception as e:
+            self.error = str(e)
+            self.error_traceback = traceback.format_exc()
+        finally:
+            self.total_time = time.perf_counter() - start
+            self._done.set()
+        print(f"Warm-up {'failed' if self.error else 'finished'} in {self.total_time:.2f}s: "
+              + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.timings.items()))
+    
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+    
+    @property
+    def current_phase(self) -> Optional[str]:
+        """Name of the phase running now, None once finished"""
+        if self.done:
+            return None
+        return next((name for name, _ in self.phases if name not in self.timings), None)
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every phase finished or one failed; False on timeout"""
+        self.start()
+        return self._done.wait(timeout)
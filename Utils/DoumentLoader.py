@@ -1,21 +1,202 @@
-from langchain_community.document_loaders import WebBaseLoader
-from langchain_classic.text_splitter import RecursiveCharacterTextSplitter
-from typing import List
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+from bs4 import BeautifulSoup
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+from langchain_classic.text_splitter import RecursiveCharacterTextSplitter, TextSplitter
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from langchain_core.documents import Document
+from Utils.Tokens import ENCODING_NAME
+
+@dataclass
+class FetchResult:
+    """Outcome of a (possibly conditional) GET for one URL"""
+    url: str
+    status: int
+    documents: List[Document] = field(default_factory=list)
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
 class DocumentLoader:
-    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 0):
-        self.text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap
-        )
+    """
+    Loads web pages and splits them into chunks.
+
+    With max_workers > 1 pages are fetched concurrently through one shared
+    keep-alive session, at most per_host_limit requests per host at a time.
+    Transient failures (connection errors, timeouts, 429/5xx) are retried
+    `retries` times, after the response's Retry-After (capped at
+    max_retry_after seconds) when it has one, else with exponential backoff.
+    The tiktoken splitter is built on the first split unless one is passed in.
+    """
+    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 0, timeout: float = 30.0,
+                 max_workers: int = 1, per_host_limit: int = 4, retries: int = 2, backoff: float = 0.5,
+                 max_retry_after: float = 30.0, text_splitter: Optional[TextSplitter] = None):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._text_splitter = text_splitter
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.retries = retries
+        self.backoff = backoff
+        self.max_retry_after = max_retry_after
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._host_lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = os.environ.get("USER_AGENT", "RAG-Chatbot/1.0")
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+    
+    @property
+    def text_splitter(self) -> TextSplitter:
+        if self._text_splitter is None:
+            self._text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+                encoding_name=ENCODING_NAME,
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap
+            )
+        return self._text_splitter
     
     def load_urls(self, urls: List[str]) -> List[Document]:
-        """Load documents from URLs"""
-        docs = [WebBaseLoader(url).load() for url in urls]
+        """Load documents from URLs, in the order given; sequential and pooled fetches parse pages alike"""
+        docs = [self._raise_or_documents(result) for result in self.fetch_urls(urls)]
         doc_list = [item for sublist in docs for item in sublist]
         return doc_list
     
+    @staticmethod
+    def _raise_or_documents(result: Union[FetchResult, Exception]) -> List[Document]:
+        if isinstance(result, Exception):
+            raise result
+        return result.documents
+    
+    def fetch_urls(self, urls: List[str],
+                   validators: Optional[Dict[str, Tuple[Optional[str], Optional[str]]]] = None
+                   ) -> List[Union[FetchResult, Exception]]:
+        """
+        Fetch many URLs on the worker pool. `validators` maps url -> (etag, last_modified)
+        for conditional GETs. Results come back in input order; a URL that still fails
+        after its retries yields its exception instead of a FetchResult.
+        """
+        return [result for _, result in self.iter_fetch_urls(urls, validators)]
+    
+    def iter_fetch_urls(self, urls: Iterable[str],
+                        validators: Optional[Dict[str, Tuple[Optional[str], Optional[str]]]] = None
+                        ) -> Iterator[Tuple[str, Union[FetchResult, Exception]]]:
+        """
+        Streaming fetch_urls: yields (url, result) in input order while at most
+        max_workers fetches are in flight, so only a window of pages is held in memory.
+        """
+        validators = validators or {}
+
+        def fetch(url: str) -> Union[FetchResult, Exception]:
+            try:
+                return self.fetch_url(url, *validators.get(url, (None, None)))
+            except Exception as e:
+                return e
+
+        if self.max_workers <= 1:
+            for url in urls:
+                yield url, fetch(url)
+            return
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            window: Deque[Tuple[str, Future]] = deque()
+            for url in urls:
+                window.append((url, pool.submit(fetch, url)))
+                if len(window) >= self.max_workers:
+                    url, future = window.popleft()
+                    yield url, future.result()
+            while window:
+                url, future = window.popleft()
+                yield url, future.result()
+    
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc
+        with self._host_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_slots[host]
+    
+    def _get(self, url: str, headers: Dict[str, str]) -> requests.Response:
+        """GET under the per-host limit, retrying transient failures with backoff"""
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            response = None
+            try:
+                with self._host_slot(url):
+                    response = self.session.get(url, headers=headers, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUSES or last_attempt:
+                    return response
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt:
+                    raise
+            time.sleep(self._retry_delay(response, attempt))
+    
+    def _retry_delay(self, response: Optional[requests.Response], attempt: int) -> float:
+        """Seconds before the next attempt: the server's Retry-After (delay or HTTP date), capped, else backoff"""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+                except (TypeError, ValueError):
+                    delay = None
+            if delay is not None:
+                return min(max(delay, 0.0), self.max_retry_after)
+        return self.backoff * (2 ** attempt)
+    
+    def fetch_url(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> FetchResult:
+        """
+        Fetch a single URL, sending If-None-Match / If-Modified-Since when
+        validators from a previous fetch are given. A 304 comes back with no documents.
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        response = self._get(url, headers)
+        if response.status_code == 304:
+            return FetchResult(url=url, status=304, etag=etag, last_modified=last_modified)
+        response.raise_for_status()
+
+        return FetchResult(
+            url=url,
+            status=response.status_code,
+            documents=[self._parse_html(url, response.text)],
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+    
+    def _parse_html(self, url: str, html: str) -> Document:
+        """Turn a page into a Document with the text and metadata WebBaseLoader would give it"""
+        soup = BeautifulSoup(html, "html.parser")
+        metadata = {"source": url}
+        if title := soup.find("title"):
+            metadata["title"] = title.get_text()
+        if description := soup.find("meta", attrs={"name": "description"}):
+            metadata["description"] = description.get("content", "No description found.")
+        if html_tag := soup.find("html"):
+            metadata["language"] = html_tag.get("lang", "No language found.")
+        return Document(page_content=soup.get_text(), metadata=metadata)
+    
     def split_documents(self, documents: List[Document]) -> List[Document]:
         """Split documents into chunks"""
         return self.text_splitter.split_documents(documents)
@@ -23,4 +204,4 @@ class DocumentLoader:
     def load_and_split(self, urls: List[str]) -> List[Document]:
         """Load from URLs and split in one go"""
         docs = self.load_urls(urls)
-        return self.split_documents(docs)
\ No newline at end of file
+        return self.split_documents(docs)
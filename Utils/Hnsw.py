@@ -0,0 +1,51 @@
+import logging
+from typing import Optional
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+SPACES = ("l2", "cosine", "ip")
+
+def hnsw_metadata(space: str, m: int, construction_ef: int, search_ef: int) -> dict:
+    """Chroma collection metadata selecting the HNSW distance and graph parameters"""
+    if space not in SPACES:
+        raise ValueError(f"Unknown HNSW space {space!r}, expected one of {SPACES}")
+    return {
+        "hnsw:space": space,
+        "hnsw:M": m,
+        "hnsw:construction_ef": construction_ef,
+        "hnsw:search_ef": search_ef,
+    }
+
+def open_chroma(collection_name: str, embedding: Optional[Embeddings], directory: str,
+                metadata: Optional[dict] = None, writable: bool = False):
+    """
+    Open (creating if needed) a Chroma collection with the given HNSW metadata.
+    An existing collection keeps its space, M and construction ef. Chroma keeps the search ef
+    in the stored collection configuration, so only a writer (`writable`) updates it; readers
+    such as a published snapshot are never written to and search with the ef it was built with.
+    """
+    from langchain_community.vectorstores import Chroma
+    store = Chroma(
+        collection_name=collection_name,
+        embedding_function=embedding,
+        persist_directory=directory,
+        collection_metadata=metadata
+    )
+    if not metadata:
+        return store
+    config = (getattr(store._collection, "configuration_json", None) or {}).get("hnsw") or {}
+    built = {"hnsw:space": config.get("space"), "hnsw:M": config.get("max_neighbors"),
+             "hnsw:construction_ef": config.get("ef_construction")}
+    stale = [key for key, value in built.items() if value is not None and value != metadata.get(key, value)]
+    if stale:
+        logger.warning("Collection %r was built with %s; rebuild it to apply the configured values",
+                       collection_name, ", ".join(f"{key}={built[key]}" for key in stale))
+    search_ef = metadata.get("hnsw:search_ef")
+    if search_ef and config.get("ef_search") not in (None, search_ef):
+        if writable:
+            store._collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+        else:
+            logger.warning("Collection %r searches with ef=%s, not the configured %s; "
+                           "the next ingest applies it", collection_name, config["ef_search"], search_ef)
+    return store
@@ -0,0 +1,128 @@
+import bisect
+import contextlib
+import threading
+import time
+from typing import Dict, List, Tuple
+from Config.settings import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (0, 1, 2, 4, 8, 16, 64, 256, 1024, 4096, 16384, 65536, 262144)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, value: float):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+class _Timer:
+    __slots__ = ("registry", "name", "labels", "start")
+    
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: Dict[str, str]):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+_NULL_TIMER = contextlib.nullcontext()
+
+class MetricsRegistry:
+    """
+    In-process counters and histograms with Prometheus text export.
+
+    Metrics are created on first use: inc() makes a counter, observe() a
+    histogram whose buckets are latency buckets for names ending in _seconds
+    and size buckets otherwise. When disabled every call returns immediately.
+    """
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(labels: Dict[str, str]) -> LabelKey:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+    
+    def inc(self, name: str, amount: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+    
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram(LATENCY_BUCKETS if name.endswith("_seconds") else SIZE_BUCKETS)
+            series[key].observe(value)
+    
+    def timer(self, name: str, **labels):
+        """Context manager observing the elapsed seconds of its block"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+    
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+    
+    def snapshot(self) -> List[Dict[str, object]]:
+        """Flat rows (metric, labels, count, sum, mean) for display"""
+        rows = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                for key, value in sorted(series.items()):
+                    rows.append({"metric": name, "labels": dict(key), "count": value, "sum": value, "mean": None})
+            for name, series in sorted(self.histograms.items()):
+                for key, hist in sorted(series.items()):
+                    rows.append({"metric": name, "labels": dict(key), "count": hist.count, "sum": hist.sum,
+                                 "mean": hist.sum / hist.count if hist.count else 0.0})
+        return rows
+    
+    def export_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        def fmt(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            pairs = key + extra
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{fmt(key)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, hist in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets, hist.bucket_counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{fmt(key, (('le', repr(float(bound))),))} {cumulative}")
+                    lines.append(f'{name}_bucket{fmt(key, (("le", "+Inf"),))} {hist.count}')
+                    lines.append(f"{name}_sum{fmt(key)} {hist.sum}")
+                    lines.append(f"{name}_count{fmt(key)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry(enabled=settings.METRICS_ENABLED)
@@ -0,0 +1,110 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+_DONE = object()
+
+@dataclass
+class StageStats:
+    """Items a stage produced and the time it spent working on them"""
+    name: str
+    unit: str
+    items: int = 0
+    busy: float = 0.0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    
+    def add(self, items: int, seconds: float):
+        if self.started is None:
+            self.started = time.perf_counter() - seconds
+        self.items += items
+        self.busy += seconds
+        self.finished = time.perf_counter()
+    
+    @property
+    def rate(self) -> float:
+        """Items per wall-clock second from the stage's first to its last item"""
+        if self.started is None:
+            return 0.0
+        return self.items / max(self.finished - self.started, 1e-9)
+    
+    def __str__(self) -> str:
+        return f"{self.name}: {self.items} {self.unit} ({self.rate:.1f} {self.unit}/s, busy {self.busy:.1f}s)"
+
+class Pipeline:
+    """
+    Generator stages run on their own threads, joined by bounded queues.
+
+    Each stage is a function taking the previous stage's iterator and returning
+    (usually yielding) its own items, so stages overlap while at most
+    `queue_size` items wait between any two of them. Iterating the pipeline
+    yields the last stage's items. An exception in any stage stops every stage
+    and is re-raised to the consumer after the items already queued for it;
+    a consumer that stops early stops every stage too.
+    """
+    def __init__(self, source: Iterable, queue_size: int = 8, name: str = "pipeline"):
+        self.stages: List[Tuple[str, Callable[[Iterator], Iterable]]] = [("source", lambda _: source)]
+        self.queue_size = queue_size
+        self.name = name
+    
+    def stage(self, name: str, fn: Callable[[Iterator], Iterable]) -> "Pipeline":
+        self.stages.append((name, fn))
+        return self
+    
+    @staticmethod
+    def _put(out: queue.Queue, item, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _pump(self, items: Iterable, out: queue.Queue, stop: threading.Event, failures: List[BaseException]):
+        try:
+            for item in items:
+                if not self._put(out, item, stop):
+                    return
+        except BaseException as e:
+            failures.append(e)
+            stop.set()
+            return
+        self._put(out, _DONE, stop)
+    
+    @staticmethod
+    def _drain(inbox: queue.Queue, stop: threading.Event) -> Iterator:
+        while True:
+            try:
+                item = inbox.get(timeout=0.1)
+            except queue.Empty:
+                if stop.is_set():
+                    return
+                continue
+            if item is _DONE:
+                return
+            yield item
+    
+    def __iter__(self) -> Iterator:
+        stop = threading.Event()
+        failures: List[BaseException] = []
+        threads = []
+        upstream: Iterator = iter(())
+        for name, fn in self.stages:
+            out = queue.Queue(self.queue_size)
+            threads.append(threading.Thread(
+                target=self._pump, args=(fn(upstream), out, stop, failures), name=f"{self.name}-{name}", daemon=True
+            ))
+            upstream = self._drain(out, stop)
+        for thread in threads:
+            thread.start()
+        try:
+            yield from upstream
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        if failures:
+            raise failures[0]
@@ -0,0 +1,13 @@
+from functools import lru_cache
+import tiktoken
+
+# RecursiveCharacterTextSplitter.from_tiktoken_encoder (DocumentLoader) defaults to this encoding
+ENCODING_NAME = "gpt2"
+
+@lru_cache(maxsize=None)
+def get_encoder() -> tiktoken.Encoding:
+    return tiktoken.get_encoding(ENCODING_NAME)
+
+def count_tokens(text: str) -> int:
+    """Token count under the same encoder DocumentLoader chunks with"""
+    return len(get_encoder().encode(text, disallowed_special=()))
@@ -5,15 +5,22 @@ import traceback
 # Set USER_AGENT
 os.environ['USER_AGENT'] = 'RAG-Chatbot/1.1'
 
-from Agents.Graph import RAGGraph
-from Services.VectorStoreServices import VectorStoreService
+# Only light modules here: the LangChain/LangGraph/model stack is imported by
+# the background warm-up so the first render does not wait for it
 from Config.settings import settings
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
+from Services.WarmupServices import WarmupService
+from Utils.Metrics import metrics
 
 # Enable debug mode
 DEBUG = False
 
+# Display name of each graph route
+SOURCE_LABELS = {
+    "vectorStore": "Vector Store",
+    "wikiSearch": "Wikipedia",
+    "tavilySearch": "Tavily",
+}
+
 def log_debug(message):
     """Print debug messages"""
     if DEBUG:
@@ -43,58 +50,164 @@ if "graph" not in st.session_state:
 if "initialized" not in st.session_state:
     st.session_state.initialized = False
 
-# Initialize components
+# Warm-up phases, run in order on a background thread
+def import_stack():
+    """Import the LangChain / LangGraph / Chroma modules"""
+    import Agents.Graph
+    import Services.AnswerCacheServices
+    import Services.GenerationServices
+    import Services.VectorStoreServices
+
+def load_embedding_model():
+    """Load the sentence-transformers model"""
+    from Services.EmbeddingServices import EmbeddingService
+    return EmbeddingService()
+
+def warm_encode():
+    """One dummy encode so the first real query does not pay for lazy init"""
+    from Services.EmbeddingServices import EmbeddingService
+    EmbeddingService().warm_up()
+
+def open_vector_store():
+    """Open the persisted collection (the live snapshot when snapshots are on) and touch it once"""
+    from Services.VectorStoreServices import VectorStoreService
+    directory = None
+    if settings.SNAPSHOTS_ENABLED:
+        from Services.SnapshotServices import SnapshotService
+        snapshots = SnapshotService(settings.SNAPSHOT_ROOT)
+        if snapshots.current() is None:
+            raise FileNotFoundError("Database not found. Please run: python setup.py")
+        directory = snapshots.path(snapshots.current())
+    elif not os.path.exists(settings.CHROMA_PERSIST_DIR):
+        raise FileNotFoundError("Database not found. Please run: python setup.py")
+    vector_store = VectorStoreService(directory=directory)
+    vector_store.count()
+    return vector_store
+
+def build_graph(vector_store):
+    """Build the graph; this also fits the router's local classifier"""
+    from Agents.Graph import RAGGraph
+    return RAGGraph(vector_store)
+
+# One warm-up per server process, started by the first session
 @st.cache_resource
-def initialize_system():
-    """Initialize vector store and graph"""
-    try:
-        log_debug("Loading existing Chroma database...")
-        
-        # Check if database exists
-        if not os.path.exists(settings.CHROMA_PERSIST_DIR):
-            return None, None, "Database not found. Please run: python setup.py"
-        
-        # Initialize vector store (loads from disk)
-        vector_store = VectorStoreService()
-        log_debug("Vector store loaded from disk")
-        
-        # Initialize graph
-        graph = RAGGraph(vector_store)
-        log_debug("RAG graph initialized")
+def get_warmup():
+    """Start loading models and indexes in the background"""
+    warmup = WarmupService([
+        ("imports", import_stack),
+        ("embedding_model", load_embedding_model),
+        ("warm_encode", warm_encode),
+        ("vector_store", open_vector_store),
+        ("graph", lambda: build_graph(warmup.results["vector_store"])),
+    ])
+    return warmup.start()
+
+def show_startup_error(warmup):
+    """Render a failed warm-up and stop the script"""
+    if "Database not found" in warmup.error:
+        st.error(f"❌ {warmup.error}")
+        st.info("""
+        ### First Time Setup Required
         
-        return vector_store, graph, None
+        Run this command to initialize the database:
+        ```bash
+        python setup.py
+        ```
         
-    except Exception as e:
-        error_msg = f"Initialization error: {str(e)}\n{traceback.format_exc()}"
-        return None, None, error_msg
+        This will:
+        1. Load documents from URLs
+        2. Split them into chunks
+        3. Create embeddings
+        4. Save to Chroma database
+        """)
+    else:
+        st.error(f"❌ Initialization error: {warmup.error}")
+        st.code(warmup.error_traceback)
+    st.stop()
+
+def attach_system(warmup):
+    """Hand the warmed-up vector store and graph to this session"""
+    if warmup.error:
+        show_startup_error(warmup)
+    st.session_state.vector_store = warmup.results["vector_store"]
+    st.session_state.graph = warmup.results["graph"]
+    st.session_state.initialized = True
+
+# Snapshot hot-swap shared by every session of this server process
+@st.cache_resource
+def get_snapshot_watcher():
+    """Serves the warmed-up snapshot and loads newer ones in the background"""
+    from Services.SnapshotServices import SnapshotService, SnapshotWatcher
+    vector_store, graph = warmup.results["vector_store"], warmup.results["graph"]
+
+    def load(directory):
+        from Agents.Graph import RAGGraph
+        from Services.VectorStoreServices import VectorStoreService
+        new_store = VectorStoreService(directory=directory)
+        new_store.count()
+        # Router and web search clients do not depend on the snapshot
+        return new_store, RAGGraph(new_store, router=graph.router, retrieval_service=graph.retrieval_service)
+
+    def close(loaded):
+        old_store, old_graph = loaded
+        old_graph.close()
+        old_store.close()
+
+    return SnapshotWatcher(
+        SnapshotService(settings.SNAPSHOT_ROOT, keep=settings.SNAPSHOT_KEEP),
+        load,
+        interval=settings.SNAPSHOT_POLL_INTERVAL,
+        initial=(os.path.basename(vector_store.persist_dir), (vector_store, graph)),
+        close=close
+    )
+
+# Answer cache shared by every session of this server process
+@st.cache_resource
+def get_answer_cache():
+    """Semantic cache of previous answers"""
+    from Services.AnswerCacheServices import SemanticAnswerCache
+    from Services.EmbeddingServices import EmbeddingService
+    return SemanticAnswerCache(
+        EmbeddingService().get_embeddings(),
+        threshold=settings.ANSWER_CACHE_THRESHOLD,
+        max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+        ttls=settings.ANSWER_CACHE_TTLS,
+        default_ttl=settings.ANSWER_CACHE_DEFAULT_TTL
+    )
+
+# One chat client and prompt chain for every turn and session
+@st.cache_resource
+def get_generation_service():
+    """Shared generation service"""
+    from Services.GenerationServices import GenerationService
+    return GenerationService()
 
 # Generate response
-def generate_response(question: str, documents):
+def generate_response(question: str, documents, route=None):
     """Generate response using LLM with retrieved documents"""
     try:
         log_debug(f"Generating response for: {question}")
-        
-        llm = ChatOpenAI(model=settings.LLM_MODEL, temperature=0.7)
-        
-        # Create context from documents
-        context = "\n\n".join([doc.page_content for doc in documents])
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are a helpful assistant. Answer the question based on the context provided. 
-            If the context doesn't contain relevant information, say so clearly.
-            
-            Context: {context}"""),
-            ("human", "{question}")
-        ])
-        
-        chain = prompt | llm
-        response = chain.invoke({"context": context, "question": question})
-        
-        return response.content
+        return get_generation_service().generate(question, documents, route)
         
     except Exception as e:
         return f"Error generating response: {str(e)}"
 
+def stream_response(question: str, documents, route=None):
+    """Render the response into the current chat message as tokens arrive"""
+    try:
+        log_debug(f"Streaming response for: {question}")
+        stream = get_generation_service().stream(question, documents, route)
+        st.write_stream(stream)
+        log_debug(f"Time to first token: {stream.time_to_first_token or 0:.2f}s, total: {stream.total_time:.2f}s")
+        return stream.text
+        
+    except Exception as e:
+        error_msg = f"Error generating response: {str(e)}"
+        st.markdown(error_msg)
+        return error_msg
+
+warmup = get_warmup()
+
 # UI
 st.title("🤖 RAG Chatbot")
 st.markdown("Ask questions about AI agents, prompt engineering, and adversarial attacks!")
@@ -125,42 +238,44 @@ with st.sidebar:
         st.write(f"Messages: {len(st.session_state.messages)}")
         st.write(f"Initialized: {st.session_state.initialized}")
         st.write(f"DB exists: {os.path.exists(settings.CHROMA_PERSIST_DIR)}")
+        st.markdown("#### Startup")
+        st.write(f"Warm-up: {'done' if warmup.done else f'running ({warmup.current_phase})'}"
+                 + (f" in {warmup.total_time:.2f}s" if warmup.done else ""))
+        st.dataframe([{"phase": name, "seconds": round(seconds, 3)} for name, seconds in warmup.timings.items()],
+                     hide_index=True)
+        # Stats need the heavy modules; skip them until warm-up has loaded them
+        if warmup.done:
+            if settings.ANSWER_CACHE_ENABLED:
+                st.write(f"Answer cache: {get_answer_cache().stats()}")
+            st.write(f"Generation: {get_generation_service().stats()}")
+            if get_generation_service().packer is not None:
+                st.write(f"Context packing: {get_generation_service().packer.summary()}")
+            # A failed warm-up has no store to watch; attach_system shows its error instead
+            if settings.SNAPSHOTS_ENABLED and not warmup.error:
+                watcher = get_snapshot_watcher()
+                st.write(f"Snapshot: {watcher.version} ({watcher.swaps} swaps)"
+                         + (f", last error: {watcher.error}" if watcher.error else ""))
+            if st.session_state.graph is not None:
+                st.write(f"Router: {st.session_state.graph.router.stats()}")
+            if st.session_state.graph is not None and st.session_state.graph.gate is not None:
+                st.write(f"Relevance gate: {st.session_state.graph.gate.summary()}")
+        if metrics.enabled:
+            st.markdown("#### Metrics")
+            st.dataframe(metrics.snapshot(), hide_index=True)
     
     st.markdown("---")
     st.markdown("### Settings")
     st.write(f"🤖 Model: {settings.LLM_MODEL}")
-    st.write(f"📊 Vector DB: Chroma")
-    st.write(f"📁 Location: {settings.CHROMA_PERSIST_DIR}")
+    st.write(f"📊 Vector DB: {'Chroma' if settings.VECTOR_BACKEND == 'chroma' else 'NumPy (memory-mapped)'}")
+    st.write(f"📁 Location: {settings.SNAPSHOT_ROOT if settings.SNAPSHOTS_ENABLED else settings.CHROMA_PERSIST_DIR}")
 
-# Initialize system
+# Initialize system: never block the first render on warm-up
 if not st.session_state.initialized:
-    with st.spinner("🔄 Loading vector database..."):
-        vector_store, graph, error = initialize_system()
-        
-        if error:
-            st.error(f"❌ {error}")
-            
-            if "Database not found" in error:
-                st.info("""
-                ### First Time Setup Required
-                
-                Run this command to initialize the database:
-                ```bash
-                python setup.py
-                ```
-                
-                This will:
-                1. Load documents from URLs
-                2. Split them into chunks
-                3. Create embeddings
-                4. Save to Chroma database
-                """)
-            st.stop()
-        else:
-            st.session_state.vector_store = vector_store
-            st.session_state.graph = graph
-            st.session_state.initialized = True
-            st.success("✅ System ready!")
+    if warmup.done:
+        attach_system(warmup)
+        st.success("✅ System ready!")
+    else:
+        st.info(f"⏳ Warming up in the background ({warmup.current_phase})... you can already ask a question.")
 
 # Display chat messages
 for message in st.session_state.messages:
@@ -179,41 +294,61 @@ if prompt := st.chat_input("Ask a question..."):
     
     # Generate response
     with st.chat_message("assistant"):
-        with st.spinner("🤔 Thinking..."):
-            try:
-                # Get documents from graph
-                result = st.session_state.graph.invoke(prompt)
-                documents = result.get("documents", [])
-                
-                # Determine source
-                if len(documents) > 0:
-                    if hasattr(documents[0], 'metadata') and documents[0].metadata:
-                        source = "Vector Store"
-                    elif "wikipedia.org" in documents[0].page_content:
-                        source = "Wikipedia"
-                    elif "tavily" in documents[0].page_content:
-                        source = "Tavily"
-                else:
-                    source = "Unknown"
-                
-                # Generate response
-                response = generate_response(prompt, documents)
-                
+        if not st.session_state.initialized:
+            with st.spinner("🔄 Finishing warm-up..."):
+                warmup.wait()
+            attach_system(warmup)
+        held = None
+        if settings.SNAPSHOTS_ENABLED:
+            # One snapshot for the whole turn, held until it ends; a swap only affects the next question
+            held = get_snapshot_watcher().acquire()
+            _, (st.session_state.vector_store, st.session_state.graph) = held
+        try:
+            answer_cache = get_answer_cache() if settings.ANSWER_CACHE_ENABLED else None
+            kb_version = st.session_state.vector_store.version()
+            cached = answer_cache.lookup(prompt, kb_version) if answer_cache else None
+            
+            if cached:
+                response, source = cached
+                log_debug(f"Answer cache hit ({source})")
                 st.markdown(response)
-                st.caption(f"📚 Source: {source}")
+            else:
+                with st.spinner("🤔 Thinking..."):
+                    # Get documents from graph
+                    result = st.session_state.graph.invoke(prompt)
+                    documents = result.get("documents", [])
+                    
+                    # Source is the route the graph took
+                    source = SOURCE_LABELS.get(result.get("route"), "Unknown")
                 
-                # Add to message history
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": response,
-                    "source": source
-                })
-                
-            except Exception as e:
-                error_msg = f"Error: {str(e)}"
-                st.error(error_msg)
-                if DEBUG:
-                    st.code(traceback.format_exc())
+                if result.get("generation"):
+                    # The relevance gate answered without the LLM
+                    response = result["generation"]
+                    st.markdown(response)
+                else:
+                    # Generate response, streamed into the message
+                    response = stream_response(prompt, documents, result.get("route"))
+                # Gate answers are a verdict on this question's retrieval, not an answer worth reusing
+                if answer_cache and not result.get("generation") and not response.startswith("Error generating response"):
+                    answer_cache.store(prompt, response, source, kb_version)
+            
+            st.caption(f"📚 Source: {source}")
+            
+            # Add to message history
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": response,
+                "source": source
+            })
+            
+        except Exception as e:
+            error_msg = f"Error: {str(e)}"
+            st.error(error_msg)
+            if DEBUG:
+                st.code(traceback.format_exc())
+        finally:
+            if held is not None:
+                get_snapshot_watcher().release(held)
 
 # Footer
 st.markdown("---")
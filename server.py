@@ -0,0 +1,200 @@
+"""
+Headless HTTP API over the RAG pipeline, independent of Streamlit.
+Command: uvicorn server:app --host 0.0.0.0 --port 8000
+
+POST /ask       {"question": "..."} -> answer, source route and documents
+POST /retrieve  {"question": "...", "k": 4} -> vector-store documents only (hybrid BM25 + dense at the default k)
+GET  /health    liveness
+GET  /ready     readiness: whether the Chroma collection (the live snapshot with SNAPSHOTS_ENABLED) is loaded
+GET  /metrics   Prometheus text exposition of the in-process metrics
+"""
+import asyncio
+import os
+
+# Set USER_AGENT to avoid warning
+os.environ.setdefault('USER_AGENT', 'RAG-Chatbot/1.0')
+
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+from Agents.Graph import RAGGraph
+from Config.settings import settings
+from Services.BatchingServices import BatchingRetriever, QueryBatcher, QueueFullError
+from Services.GenerationServices import GenerationService
+from Services.SnapshotServices import SnapshotService, SnapshotWatcher
+from Services.VectorStoreServices import VectorStoreService
+from Utils.Metrics import metrics
+
+class QuestionRequest(BaseModel):
+    question: str
+    k: Optional[int] = None
+
+class DocumentOut(BaseModel):
+    page_content: str
+    metadata: dict
+
+class RetrieveResponse(BaseModel):
+    documents: List[DocumentOut]
+
+class AskResponse(BaseModel):
+    answer: str
+    route: Optional[str] = None
+    documents: List[DocumentOut]
+
+class IndexState:
+    """What requests read from one index: the store, its retrieval batcher and the graph over them"""
+    def __init__(self, vector_store: VectorStoreService, graph: Optional[RAGGraph] = None):
+        self.vector_store = vector_store
+        self.batcher = QueryBatcher(
+            vector_store,
+            k=settings.RETRIEVAL_K,
+            max_batch_size=settings.SERVER_BATCH_MAX_SIZE,
+            max_wait=settings.SERVER_BATCH_MAX_WAIT,
+            max_queue=settings.SERVER_QUEUE_SIZE
+        )
+        self.retriever = vector_store.hybrid_retriever(BatchingRetriever(self.batcher))
+        # Router and web search clients do not depend on the index
+        self.graph = RAGGraph(vector_store, retriever=self.retriever,
+                              router=graph.router if graph else None,
+                              retrieval_service=graph.retrieval_service if graph else None)
+    
+    async def aclose(self):
+        await self.batcher.stop()
+        self.graph.close()
+        self.vector_store.close()
+
+class ServiceState:
+    """Everything shared by all requests of this process"""
+    index: Optional[IndexState] = None
+    # Set with SNAPSHOTS_ENABLED; serves the live snapshot's IndexState instead of `index`
+    watcher: Optional[SnapshotWatcher] = None
+    generation: Optional[GenerationService] = None
+    inflight = 0
+    error: Optional[str] = None
+    
+    def current(self) -> Optional[IndexState]:
+        return self.watcher.get()[1] if self.watcher is not None else self.index
+
+state = ServiceState()
+
+def open_index(loop: asyncio.AbstractEventLoop) -> IndexState:
+    """The index to serve: ./chroma_db, or with snapshots the live one, swapped when CURRENT changes"""
+    if not settings.SNAPSHOTS_ENABLED:
+        return IndexState(VectorStoreService())
+    snapshots = SnapshotService(settings.SNAPSHOT_ROOT, keep=settings.SNAPSHOT_KEEP)
+    version = snapshots.current()
+    if version is None:
+        raise FileNotFoundError("Database not found. Please run: python setup.py")
+    index = IndexState(VectorStoreService(directory=snapshots.path(version)))
+
+    def load(directory: str) -> IndexState:
+        vector_store = VectorStoreService(directory=directory)
+        vector_store.count()
+        return IndexState(vector_store, graph=index.graph)
+
+    def close(old: IndexState):
+        # Called from the swap thread or a request; the batcher lives on the event loop
+        asyncio.run_coroutine_threadsafe(old.aclose(), loop)
+
+    state.watcher = SnapshotWatcher(snapshots, load, interval=settings.SNAPSHOT_POLL_INTERVAL,
+                                    initial=(version, index), close=close)
+    return index
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    try:
+        state.index = open_index(asyncio.get_running_loop())
+        state.generation = GenerationService()
+    except Exception as e:
+        state.error = f"Initialization error: {str(e)}"
+    yield
+    index = state.current()
+    if index is not None:
+        await index.batcher.stop()
+        await index.graph.retrieval_service.aclose()
+
+app = FastAPI(title="RAG Chatbot API", lifespan=lifespan)
+
+def _documents_out(documents) -> List[DocumentOut]:
+    return [DocumentOut(page_content=doc.page_content, metadata=doc.metadata or {}) for doc in documents]
+
+class _Admission:
+    """
+    Caps requests in flight; past the cap the request is rejected with 429.
+    Entering returns the IndexState the request uses throughout, held until it exits.
+    """
+    def __enter__(self) -> IndexState:
+        if state.current() is None or state.generation is None:
+            raise HTTPException(status_code=503, detail=state.error or "Service is starting")
+        if state.inflight >= settings.SERVER_MAX_INFLIGHT:
+            raise HTTPException(status_code=429, detail="Too many requests in flight", headers={"Retry-After": "1"})
+        state.inflight += 1
+        self.held = state.watcher.acquire() if state.watcher is not None else None
+        return self.held[1] if self.held is not None else state.index
+    
+    def __exit__(self, *exc):
+        state.inflight -= 1
+        if self.held is not None:
+            state.watcher.release(self.held)
+
+@app.post("/retrieve", response_model=RetrieveResponse)
+async def retrieve(request: QuestionRequest):
+    with _Admission() as index:
+        try:
+            if request.k and request.k != index.batcher.k:
+                documents = await asyncio.to_thread(index.vector_store.similarity_search, request.question, request.k)
+            else:
+                documents = await index.retriever.ainvoke(request.question)
+        except QueueFullError as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+        return RetrieveResponse(documents=_documents_out(documents))
+
+@app.post("/ask", response_model=AskResponse)
+async def ask(request: QuestionRequest):
+    with _Admission() as index:
+        try:
+            result = await index.graph.ainvoke(request.question)
+        except QueueFullError as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+        documents = result.get("documents", [])
+        # The relevance gate may already have answered without the LLM
+        answer = result.get("generation") or await state.generation.agenerate(
+            request.question, documents, result.get("route")
+        )
+        return AskResponse(answer=answer, route=result.get("route"), documents=_documents_out(documents))
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    loaded = False
+    count = 0
+    index = state.current()
+    if index is not None:
+        try:
+            count = index.vector_store.count()
+            loaded = count > 0
+        except Exception as e:
+            state.error = str(e)
+    body = {
+        "ready": loaded,
+        "collection": settings.COLLECTION_NAME,
+        "collection_loaded": loaded,
+        "documents": count,
+        "snapshot": state.watcher.version if state.watcher is not None else None,
+        "inflight": state.inflight,
+        "batcher": index.batcher.stats() if index is not None else None,
+        "router": index.graph.router.stats() if index is not None else None,
+        "error": (state.watcher.error if state.watcher is not None else None) or state.error,
+    }
+    if not body["ready"]:
+        raise HTTPException(status_code=503, detail=body)
+    return body
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.export_prometheus(), media_type="text/plain; version=0.0.4")
@@ -1,68 +1,178 @@
 """
 Run this script once to initialize the vector database with documents
 Command: python setup.py
+
+Re-runs are incremental: unchanged pages are skipped and only new or changed
+chunks are embedded. Pass --full to re-fetch and re-diff every page.
+An interrupted run picks up after the last page it finished.
+With VECTOR_SHARDING_ENABLED, --shard NAME drops and rebuilds that one shard only.
+With SNAPSHOTS_ENABLED, each run publishes a new snapshot that running apps swap to;
+--activate VERSION verifies a copied-in or older snapshot and makes it live.
 """
+import argparse
 import os
+from typing import Optional
 
 # Set USER_AGENT to avoid warning
 os.environ['USER_AGENT'] = 'RAG-Chatbot/1.0'
 
 from Config.settings import settings
 from Utils.DoumentLoader import DocumentLoader
+from Services.EmbeddingServices import EmbeddingService
 from Services.VectorStoreServices import VectorStoreService
-from Data.Urls import URLS
+from Services.IngestionServices import IngestionService
+from Services.ParallelIngestionServices import ParallelEncoder
+from Services.ShardedVectorStoreServices import shard_for_source
+from Services.SnapshotServices import SnapshotService, snapshot_info
+from Data.Urls import URLS, URL_TAGS
 
-def setup():
+def setup(full: bool = False, workers: int = settings.INGEST_WORKERS, shard: Optional[str] = None):
     print("="*60)
-    print("RAG CHATBOT SETUP - Using Chroma Vector Database")
+    print(f"RAG CHATBOT SETUP - Using {settings.VECTOR_BACKEND} vector backend")
     print("="*60)
-    print(f"\nChroma DB location: {settings.CHROMA_PERSIST_DIR}")
+    snapshots = staging = None
+    if settings.SNAPSHOTS_ENABLED:
+        snapshots = SnapshotService(settings.SNAPSHOT_ROOT, keep=settings.SNAPSHOT_KEEP)
+        staging = snapshots.begin(full)
+        print(f"\nBuilding snapshot in {staging} (live: {snapshots.current() or 'none'})")
+    else:
+        print(f"\nChroma DB location: {settings.CHROMA_PERSIST_DIR}")
+    print(f"Mode: {'full' if full else 'incremental'}"
+          + (f", {workers} split/embed worker processes" if workers > 1 else "")
+          + (f", rebuilding shard {shard!r}" if shard else ""))
     
-    # Load and split documents
-    print(f"\n[1/3] Loading documents from {len(URLS)} URLs...")
-    try:
-        loader = DocumentLoader(
-            chunk_size=settings.CHUNK_SIZE,
-            chunk_overlap=settings.CHUNK_OVERLAP
-        )
-        split_docs = loader.load_and_split(URLS)
-        print(f"      ✓ Loaded and split {len(split_docs)} document chunks")
-    except Exception as e:
-        print(f"      ❌ Document loading failed: {e}")
-        import traceback
-        traceback.print_exc()
-        return
+    urls = URLS
+    if shard:
+        if not settings.VECTOR_SHARDING_ENABLED:
+            print("\n❌ --shard needs VECTOR_SHARDING_ENABLED = True")
+            return
+        urls = [url for url in URLS if shard_for_source(url, URL_TAGS, settings.SHARD_BY) == shard]
+        if not urls:
+            print(f"\n❌ No URL in Data/Urls.py maps to shard {shard!r}")
+            return
+    
+    loader = DocumentLoader(
+        chunk_size=settings.CHUNK_SIZE,
+        chunk_overlap=settings.CHUNK_OVERLAP,
+        timeout=settings.FETCH_TIMEOUT,
+        max_workers=settings.FETCH_MAX_WORKERS,
+        per_host_limit=settings.FETCH_PER_HOST_LIMIT,
+        retries=settings.FETCH_RETRIES,
+        backoff=settings.FETCH_BACKOFF,
+        max_retry_after=settings.FETCH_MAX_RETRY_AFTER
+    )
     
     # Initialize vector store
-    print("\n[2/3] Initializing Chroma vector store...")
+    print(f"\n[1/3] Initializing {settings.VECTOR_BACKEND} vector store...")
     try:
-        vector_store = VectorStoreService()
+        vector_store = VectorStoreService(directory=staging, writable=True)
         print("      ✓ Vector store initialized")
+        if shard:
+            # Only this shard is dropped; the other shards and their manifest entries stay as they are
+            dropped = vector_store.clear_shard(shard)
+            full = True
+            print(f"      ✓ Cleared shard {shard!r}: {dropped} chunks")
+        # The manifest is shared by both backends; an empty store (e.g. a newly
+        # selected backend) must be filled regardless of what it says
+        if not full and vector_store.count() == 0:
+            full = True
+            print("      - Vector store is empty, syncing every page")
     except Exception as e:
         print(f"      ❌ Vector store initialization failed: {e}")
         import traceback
         traceback.print_exc()
         return
     
-    # Add documents
-    print("\n[3/3] Adding documents to vector store...")
+    # Fetch, split and sync documents
+    print(f"\n[2/3] Syncing documents from {len(urls)} URLs...")
+    encoder = None
+    if workers > 1:
+        encoder = ParallelEncoder(workers, settings.CHUNK_SIZE, settings.CHUNK_OVERLAP,
+                                  settings.EMBEDDING_MODEL, batch_size=settings.EMBEDDING_BATCH_SIZE)
     try:
-        vector_store.add_documents(split_docs)
-        print("      ✓ Documents added and persisted successfully")
+        if staging:
+            ingestion = IngestionService(vector_store, loader, encoder=encoder,
+                                         manifest_path=os.path.join(staging, "ingest_manifest.json"),
+                                         checkpoint_path=os.path.join(staging, "ingest_checkpoint.json"))
+        else:
+            ingestion = IngestionService(vector_store, loader, encoder=encoder)
+        stats = ingestion.ingest(urls, force=full, prune=not shard)
+        print(f"      ✓ Pages: {stats['changed']} changed, {stats['unchanged']} unchanged, "
+              f"{stats['removed']} removed, {stats['failed']} failed"
+              + (f", {stats['resumed']} resumed" if stats['resumed'] else ""))
+        print(f"      ✓ Chunks: {stats['added']} upserted, {stats['deleted']} deleted")
+        for stage in ingestion.stages.values():
+            print(f"      ✓ {stage}")
+        if cache_stats := EmbeddingService().cache_stats():
+            print(f"      ✓ Embedding cache: {cache_stats['memory_hits'] + cache_stats['disk_hits']} hits, "
+                  f"{cache_stats['misses']} misses")
     except Exception as e:
-        print(f"      ❌ Failed to add documents: {e}")
+        print(f"      ❌ Failed to sync documents: {e}")
         import traceback
         traceback.print_exc()
         return
+    finally:
+        if encoder is not None:
+            encoder.close()
+    
+    # Chunks added above are indexed as they go; rebuild only when the index
+    # is missing or out of step with the collection (e.g. first run after upgrade)
+    print("\n[3/3] Checking lexical (BM25) index...")
+    if vector_store.lexical_index is None:
+        print("      - Hybrid retrieval disabled")
+    elif len(vector_store.lexical_index) != vector_store.count():
+        indexed = vector_store.rebuild_lexical_index()
+        print(f"      ✓ Rebuilt lexical index: {indexed} chunks")
+    else:
+        print(f"      ✓ Lexical index up to date: {len(vector_store.lexical_index)} chunks")
+    
+    location = settings.CHROMA_PERSIST_DIR
+    if snapshots is not None:
+        version = snapshots.publish(staging, vector_store.vector_store,
+                                    snapshot_info(vector_store, len(ingestion.manifest)))
+        location = snapshots.path(version)
+        print(f"\n✓ Published snapshot {version}, now live")
+        for removed in snapshots.gc():
+            print(f"      - Removed old snapshot {removed}")
     
     print("\n" + "="*60)
     print("✅ SETUP COMPLETE!")
     print("="*60)
-    print(f"\n📁 Database location: {settings.CHROMA_PERSIST_DIR}")
+    print(f"\n📁 Database location: {location}")
     print(f"📦 Collection name: {settings.COLLECTION_NAME}")
-    print(f"📄 Document chunks: {len(split_docs)}")
+    print(f"📄 New document chunks: {stats['added']}")
     print("\n🚀 Run the app with: streamlit run app.py")
     print("="*60)
 
+def activate(version: str):
+    """Verify a published snapshot against its manifest and make it live"""
+    snapshots = SnapshotService(settings.SNAPSHOT_ROOT, keep=settings.SNAPSHOT_KEEP)
+    reason = snapshots.incompatible(version)
+    if reason:
+        print(f"❌ Snapshot {version} {reason}")
+        return
+    problems = snapshots.verify(version, VectorStoreService(directory=snapshots.path(version)).vector_store)
+    if problems:
+        print(f"❌ Snapshot {version} does not match its manifest:")
+        for problem in problems:
+            print(f"      - {problem}")
+        return
+    snapshots.activate(version)
+    manifest = snapshots.manifest(version)
+    print(f"✓ Snapshot {version} verified ({manifest['chunks']} chunks, {manifest['embedding_model']}), now live")
+
 if __name__ == "__main__":
-    setup()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Initialize or refresh the vector database")
+    parser.add_argument("--full", action="store_true",
+                        help="Re-fetch every page, ignoring ETag/Last-Modified and stored digests")
+    parser.add_argument("--workers", type=int, default=settings.INGEST_WORKERS,
+                        help="Worker processes for splitting and embedding (default: in-process)")
+    parser.add_argument("--shard", default=None,
+                        help="Clear and rebuild only this shard (needs VECTOR_SHARDING_ENABLED)")
+    parser.add_argument("--activate", metavar="VERSION", default=None,
+                        help="Verify a snapshot in SNAPSHOT_ROOT and make it live instead of building one")
+    args = parser.parse_args()
+    if args.activate:
+        activate(args.activate)
+    else:
+        setup(full=args.full, workers=args.workers, shard=args.shard)
\ No newline at end of file
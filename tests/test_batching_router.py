@@ -0,0 +1,71 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from langchain_core.runnables import RunnableLambda
+from Agents.BatchingRouter import BatchingQuestionRouter
+from Benchmarks.Fakes import FakeChatModel, FakeRouter, LatencyModel
+
+QUESTIONS = ["What is chain-of-thought prompting?", "Latest AI news today", "Who is Albert Einstein?",
+             "How do agents use tools?", "Current weather in Paris", "Explain ReAct prompting"] * 4
+
+class FailingChatModel(FakeChatModel):
+    """FakeChatModel whose classification of questions mentioning "boom" raises"""
+    def with_structured_output(self, schema, **kwargs):
+        classify = super().with_structured_output(schema, **kwargs)
+
+        def maybe_fail(prompt_value):
+            if "boom" in prompt_value.to_messages()[-1].content:
+                raise ValueError("classification failed")
+            return classify.invoke(prompt_value)
+        return RunnableLambda(maybe_fail)
+
+def router(llm: FakeChatModel, max_wait: float = 0.05, **kwargs) -> BatchingQuestionRouter:
+    return BatchingQuestionRouter(llm=llm, use_fast_path=False, max_wait=max_wait, **kwargs)
+
+def test_concurrent_callers_are_batched_and_get_their_own_route():
+    batching = router(FakeChatModel(latency=LatencyModel(0.02, kind="fixed")), max_batch_size=8)
+    with ThreadPoolExecutor(max_workers=len(QUESTIONS)) as pool:
+        routes = list(pool.map(batching.route, QUESTIONS))
+    assert routes == [FakeRouter._classify(question) for question in QUESTIONS]
+    stats = batching.stats()
+    assert stats["batches"] < len(QUESTIONS) and stats["mean_batch_size"] > 1
+
+def test_failed_classification_raises_only_in_its_caller():
+    batching = router(FailingChatModel())
+    questions = ["What is prompt engineering?", "boom: what is this?", "Latest AI news today"]
+
+    async def ask_all():
+        return await asyncio.gather(*(batching.aroute(question) for question in questions), return_exceptions=True)
+
+    ok, failed, news = asyncio.run(ask_all())
+    assert (ok, news) == ("vectorStore", "tavilySearch")
+    assert isinstance(failed, ValueError)
+    assert batching.stats()["batches"] == 1
+
+def test_batches_in_flight_are_bounded():
+    release = threading.Event()
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    class SlowChatModel(FakeChatModel):
+        def with_structured_output(self, schema, **kwargs):
+            classify = super().with_structured_output(schema, **kwargs)
+
+            def wait(prompt_value):
+                with lock:
+                    running[0] += 1
+                    peak[0] = max(peak[0], running[0])
+                release.wait(5)
+                with lock:
+                    running[0] -= 1
+                return classify.invoke(prompt_value)
+            return RunnableLambda(wait)
+
+    batching = router(SlowChatModel(), max_batch_size=1, max_batches_in_flight=2, max_wait=0.0)
+    futures = [batching.submit(question) for question in QUESTIONS[:6]]
+    with pytest.raises(TimeoutError):
+        futures[-1].result(timeout=0.3)
+    assert peak[0] == 2 and batching.stats()["queued"] >= 3
+    release.set()
+    assert [future.result(timeout=5) for future in futures] == [FakeRouter._classify(q) for q in QUESTIONS[:6]]
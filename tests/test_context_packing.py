@@ -0,0 +1,56 @@
+from typing import List
+import pytest
+from langchain_core.documents import Document
+from Services.ContextPackingServices import ContextPacker
+
+class WordEncoder:
+    """One token per whitespace-separated word, so budgets are easy to reason about offline"""
+    def encode(self, text: str, disallowed_special=()) -> List[str]:
+        return text.split()
+
+    def decode(self, tokens: List[str]) -> str:
+        return " ".join(tokens)
+
+def passage(topic: int, words: int = 10, **metadata) -> Document:
+    return Document(page_content=" ".join(f"t{topic}w{i}" for i in range(words)), metadata=metadata)
+
+def packer(**kwargs) -> ContextPacker:
+    return ContextPacker(encoder=WordEncoder(), **kwargs)
+
+def test_near_duplicates_are_dropped_keeping_the_better_ranked_copy():
+    original = passage(0, words=40, rank=0)
+    near_copy = Document(page_content=original.page_content.replace("t0w39", "changed"), metadata={"rank": 1})
+    packed = packer(ordering="relevance").pack([original, near_copy, passage(1, rank=2)])
+    assert packed.duplicates == 1
+    assert [doc.metadata["rank"] for doc in packed.documents] == [0, 2]
+
+@pytest.mark.parametrize("ordering", ["relevance", "mmr"])
+def test_budget_is_never_exceeded(ordering):
+    documents = [passage(topic, words=3 + 7 * topic % 11) for topic in range(12)]
+    for budget in range(1, 60, 3):
+        packed = packer(ordering=ordering, default_budget=budget).pack(documents)
+        assert packed.tokens_out <= budget and packed.documents
+
+def test_oversized_first_passage_is_truncated_to_the_budget():
+    packed = packer(default_budget=8).pack([passage(0, words=50)])
+    assert packed.truncated and packed.tokens_out == 8
+    assert packed.context == " ".join(f"t0w{i}" for i in range(8))
+
+def test_mmr_order_follows_relevance_scores_when_every_passage_has_one():
+    scores = [0.2, 0.9, 0.5, 0.7]
+    documents = [passage(topic, relevance_score=score) for topic, score in enumerate(scores)]
+    packed = packer(mmr_lambda=1.0, default_budget=100).pack(documents)
+    assert [doc.metadata["relevance_score"] for doc in packed.documents] == [0.9, 0.7, 0.5, 0.2]
+
+def test_mmr_order_falls_back_to_rank_when_a_score_is_missing():
+    documents = [passage(0, relevance_score=0.1), passage(1), passage(2, relevance_score=0.9), passage(3)]
+    packed = packer(mmr_lambda=1.0, default_budget=100).pack(documents)
+    assert [doc.page_content for doc in packed.documents] == [doc.page_content for doc in documents]
+
+def test_tokens_saved_counts_what_the_budget_cut_per_route():
+    context_packer = packer(ordering="relevance", budgets={"vectorStore": 25})
+    packed = context_packer.pack([passage(topic) for topic in range(4)], route="vectorStore")
+    assert (packed.tokens_in, packed.tokens_out, packed.tokens_saved) == (40, 20, 20)
+    assert packed.over_budget == 2
+    summary = context_packer.summary()
+    assert summary["tokens_saved"] == 20 and summary["saved_by_route"] == {"vectorStore": 20}
@@ -0,0 +1,101 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from Utils.DoumentLoader import DocumentLoader
+
+PAGE = "<html lang='en'><head><title>{path}</title><meta name='description' content='about {path}'></head>" \
+       "<body><p>page {path}</p></body></html>"
+
+@pytest.fixture
+def server():
+    """
+    Local stand-in site: /page/* are HTML pages with an ETag, /flaky/* fail once with 503,
+    /busy/<seconds> fails once with 429 and that Retry-After, /missing 404s
+    """
+    hits = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            hits[self.path] = hits.get(self.path, 0) + 1
+            etag = f'"{self.path}"'
+            if self.path.startswith("/busy/") and hits[self.path] == 1:
+                self._reply(429, b"", headers={"Retry-After": self.path.rsplit("/", 1)[1]})
+            elif self.path == "/missing" or (self.path.startswith("/flaky/") and hits[self.path] == 1):
+                self._reply(404 if self.path == "/missing" else 503, b"")
+            elif self.headers.get("If-None-Match") == etag:
+                self._reply(304, b"")
+            else:
+                self._reply(200, PAGE.format(path=self.path).encode(), headers={"ETag": etag})
+
+        def _reply(self, status, body, headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    host, port = httpd.server_address
+    yield f"http://{host}:{port}", hits
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.mark.parametrize("workers", [1, 8])
+def test_load_urls_in_order_with_page_text_and_metadata(server, workers):
+    base, _ = server
+    urls = [f"{base}/page/{i}" for i in range(20)]
+    docs = DocumentLoader(max_workers=workers, per_host_limit=workers).load_urls(urls)
+    assert [doc.metadata["source"] for doc in docs] == urls
+    assert docs[3].page_content == "/page/3page /page/3"
+    assert docs[3].metadata == {"source": urls[3], "title": "/page/3", "description": "about /page/3",
+                                "language": "en"}
+
+def test_sequential_and_pooled_fetches_return_the_same_documents(server):
+    base, _ = server
+    urls = [f"{base}/page/{i}" for i in range(10)]
+    sequential = DocumentLoader(max_workers=1).load_urls(urls)
+    pooled = DocumentLoader(max_workers=4, per_host_limit=4).load_urls(urls)
+    assert [(d.page_content, d.metadata) for d in sequential] == [(d.page_content, d.metadata) for d in pooled]
+
+def test_transient_failures_are_retried(server):
+    base, hits = server
+    urls = [f"{base}/flaky/{i}" for i in range(4)]
+    docs = DocumentLoader(max_workers=4, per_host_limit=4, backoff=0.01).load_urls(urls)
+    assert [doc.metadata["source"] for doc in docs] == urls
+    assert all(hits[f"/flaky/{i}"] == 2 for i in range(4))
+
+def test_failed_url_yields_its_exception_in_place(server):
+    base, _ = server
+    urls = [f"{base}/page/1", f"{base}/missing", f"{base}/page/2"]
+    results = DocumentLoader(max_workers=4, retries=0).fetch_urls(urls)
+    assert results[0].status == 200 and results[2].status == 200
+    assert isinstance(results[1], Exception)
+
+def test_conditional_get_returns_not_modified(server):
+    base, _ = server
+    loader = DocumentLoader(max_workers=2)
+    first = loader.fetch_url(f"{base}/page/7")
+    again = loader.fetch_url(f"{base}/page/7", etag=first.etag)
+    assert first.etag == '"/page/7"'
+    assert again.not_modified and again.documents == []
+
+@pytest.mark.parametrize("retry_after", ["0.2", "3600"])
+def test_retry_after_is_honoured_up_to_the_cap(server, retry_after):
+    base, hits = server
+    # Exponential backoff alone would wait 10s; the header asks for 0.2s, or for an hour capped at 0.3s
+    loader = DocumentLoader(backoff=10, max_retry_after=0.3)
+    started = time.perf_counter()
+    result = loader.fetch_url(f"{base}/busy/{retry_after}")
+    elapsed = time.perf_counter() - started
+    assert result.status == 200 and hits[f"/busy/{retry_after}"] == 2
+    assert 0.15 <= elapsed < 2
@@ -0,0 +1,39 @@
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from Services.EmbeddingServices import CachedEmbeddings, DiskEmbeddingStore
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def test_stale_writer_does_not_truncate_rows_of_another(tmp_path):
+    first, second = DiskEmbeddingStore(str(tmp_path)), DiskEmbeddingStore(str(tmp_path))
+    first.put_many(["a", "b"], np.array([[1, 1], [2, 2]], dtype=np.float32))
+    second.put_many(["c"], np.array([[3, 3]], dtype=np.float32))
+    first.put_many(["d"], np.array([[4, 4]], dtype=np.float32))
+    reopened = DiskEmbeddingStore(str(tmp_path))
+    assert {key: reopened.get(key)[0] for key in "abcd"} == {"a": 1, "b": 2, "c": 3, "d": 4}
+
+def test_torn_index_line_is_trimmed_by_the_next_append(tmp_path):
+    store = DiskEmbeddingStore(str(tmp_path))
+    store.put_many(["a"], np.array([[1, 1]], dtype=np.float32))
+    with open(tmp_path / "index.txt", "ab") as f:
+        f.write(b"half-written")
+    DiskEmbeddingStore(str(tmp_path)).put_many(["b"], np.array([[2, 2]], dtype=np.float32))
+    reopened = DiskEmbeddingStore(str(tmp_path))
+    assert set(reopened.rows) == {"a", "b"} and reopened.get("b")[0] == 2
+
+def test_queries_are_not_persisted(tmp_path):
+    model = CountingEmbeddings()
+    cached = CachedEmbeddings(model, "fake", cache_dir=str(tmp_path))
+    cached.embed_documents(["a chunk"])
+    cached.embed_query("a question")
+    cached.embed_query("a question")
+    assert len(cached.disk.rows) == 1 and model.calls == 2
@@ -0,0 +1,34 @@
+import asyncio
+from langchain_core.documents import Document
+from Benchmarks.Fakes import FakeChatModel, LatencyModel
+from Services.GenerationServices import GenerationService
+
+DOCUMENTS = [Document(page_content="Agents plan, remember and use tools.")]
+
+def service(ttft: float = 0.0, token_latency: float = 0.0) -> GenerationService:
+    llm = FakeChatModel(latency=LatencyModel(ttft, kind="fixed"), token_latency=token_latency)
+    return GenerationService(llm=llm, use_packing=False)
+
+def test_stream_yields_tokens_incrementally_and_records_ttft():
+    generation = service(ttft=0.05, token_latency=0.01)
+    stream = generation.stream("What do agents do?", DOCUMENTS)
+    tokens = list(stream)
+    assert len(tokens) > 1
+    assert "".join(tokens) == stream.text
+    assert stream.text.startswith("This is a deterministic answer to 'What do agents do?'")
+    assert 0.05 <= stream.time_to_first_token < stream.total_time
+    assert stream.total_time >= 0.05 + 0.01 * (len(tokens) - 1)
+
+def test_generate_matches_the_streamed_text():
+    generation = service()
+    streamed = "".join(generation.stream("q", DOCUMENTS))
+    assert generation.generate("q", DOCUMENTS) == streamed
+
+def test_non_streamed_calls_stay_out_of_mean_ttft():
+    generation = service(ttft=0.02, token_latency=0.02)
+    generation.generate("q", DOCUMENTS)
+    ttft = generation.stats()["mean_ttft"]
+    asyncio.run(generation.agenerate("q", DOCUMENTS))
+    stats = generation.stats()
+    assert stats["calls"] == 2 and stats["streamed"] == 1
+    assert stats["mean_ttft"] == ttft < stats["mean_total"]
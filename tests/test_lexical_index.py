@@ -0,0 +1,33 @@
+import os
+from Services.LexicalIndexServices import LexicalIndex
+
+def batches(count: int, size: int = 64):
+    for batch in range(count):
+        ids = [f"chunk-{batch}-{i}" for i in range(size)]
+        yield ids, [f"page {batch} chunk {i} about agents and term{batch}x{i}" for i in range(size)]
+
+def test_batches_stay_in_memory_until_save_every_chunks_changed(tmp_path, monkeypatch):
+    path = str(tmp_path / "lexical_index.npz")
+    index = LexicalIndex(path, save_every=500)
+    saves = []
+    save = index.save
+    monkeypatch.setattr(index, "save", lambda: saves.append(index.unsaved) or save())
+    for ids, texts in batches(20):
+        index.add(ids, texts)
+        index.maybe_save()
+    assert len(saves) == 2 and all(unsaved >= 500 for unsaved in saves)
+    assert len(index) == 20 * 64 and index.unsaved == 20 * 64 - sum(saves)
+
+def test_unsaved_delta_is_searchable_and_written_by_save(tmp_path):
+    path = str(tmp_path / "lexical_index.npz")
+    index = LexicalIndex(path, save_every=10 ** 6)
+    for ids, texts in batches(5):
+        index.add(ids, texts)
+        index.maybe_save()
+    index.delete(["chunk-3-7"])
+    assert not os.path.exists(path)
+    assert index.search("term3x7 term4x2", k=2)[0][0] == "chunk-4-2"
+    index.save()
+    reloaded = LexicalIndex(path)
+    assert len(reloaded) == 5 * 64 - 1 and reloaded.unsaved == 0
+    assert [chunk_id for chunk_id, _ in reloaded.search("term3x7 term4x2", k=2)] == ["chunk-4-2"]
@@ -0,0 +1,55 @@
+import asyncio
+from typing import List
+import pytest
+from langchain_core.embeddings import Embeddings
+from Agents.FastRouter import CentroidRouter
+from Agents.Router import QuestionRouter
+from Benchmarks.Fakes import FakeChatModel
+from Config.settings import settings
+
+VOCABULARY = ["agent", "prompt", "attack", "einstein", "history", "capital", "news", "today", "weather"]
+EXAMPLES = {
+    "vectorStore": ["agent prompt", "prompt attack", "agent attack"],
+    "wikiSearch": ["einstein history", "capital history", "einstein capital"],
+    "tavilySearch": ["news today", "weather today", "news weather"],
+}
+
+class KeywordEmbeddings(Embeddings):
+    """Bag-of-words over a fixed vocabulary, so routes are separable without a model"""
+    def embed_query(self, text: str) -> List[float]:
+        words = text.lower().replace("?", "").split()
+        return [float(words.count(word)) for word in VOCABULARY]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+@pytest.fixture
+def question_router(monkeypatch) -> QuestionRouter:
+    monkeypatch.setattr(settings, "ROUTER_FAST_PATH_THRESHOLD", 0.1)
+    return QuestionRouter(fast_router=CentroidRouter(KeywordEmbeddings(), EXAMPLES), llm=FakeChatModel())
+
+def test_centroid_router_margin_separates_clear_and_mixed_questions():
+    fast_router = CentroidRouter(KeywordEmbeddings(), EXAMPLES)
+    route, confidence = fast_router.classify("agent prompt attack?")
+    assert route == "vectorStore" and confidence > 0.5
+    assert fast_router.classify("agent news")[1] == pytest.approx(0.0, abs=1e-6)
+
+def test_confident_question_short_circuits_the_llm(question_router):
+    assert question_router.route("What about agent prompt attack?") == "vectorStore"
+    assert question_router.stats() == {"fast_path": 1, "llm": 0, "short_circuit_rate": 1.0}
+
+def test_question_below_threshold_falls_back_to_the_llm(question_router):
+    # Equally close to two centroids; the fake LLM routes on "news"
+    assert question_router.route("agent news") == "tavilySearch"
+    assert question_router.route("Who is someone unknown?") == "wikiSearch"
+    assert question_router.stats() == {"fast_path": 0, "llm": 2, "short_circuit_rate": 0.0}
+
+def test_short_circuits_are_counted_on_both_paths(question_router):
+    question_router.route("einstein history")
+    question_router.route("agent news")
+    assert asyncio.run(question_router.aroute("weather today")) == "tavilySearch"
+    assert asyncio.run(question_router.aroute("hello")) == "wikiSearch"
+    assert question_router.stats() == {"fast_path": 2, "llm": 2, "short_circuit_rate": 0.5}
+
+def test_fast_path_is_off_by_default():
+    assert QuestionRouter(llm=FakeChatModel()).fast_router is None
@@ -0,0 +1,60 @@
+import asyncio
+from Benchmarks.Fakes import FakeTavilyTool, FakeWikipediaTool
+from Config.settings import settings
+from Services import SearchCacheServices
+from Services.RetrievalServices import RetrievalService
+from Services.SearchCacheServices import SearchCache, get_search_cache
+
+def counting_search(calls: list, delay: float = 0.05):
+    async def search():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return "result"
+    return search
+
+def test_cancelled_leader_still_answers_coalesced_waiters():
+    async def scenario():
+        cache, calls = SearchCache(), []
+        leader = asyncio.create_task(cache.aget_or_fetch("tavily", "q", counting_search(calls)))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.aget_or_fetch("tavily", "q", counting_search(calls)))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await waiter, calls, cache.stats()
+
+    value, calls, stats = asyncio.run(scenario())
+    assert value == "result" and len(calls) == 1
+    assert stats["coalesced"] == 1 and stats["entries"] == 1
+
+def test_cancelled_leader_without_waiters_cancels_the_search():
+    async def scenario():
+        cache, calls = SearchCache(), []
+        leader = asyncio.create_task(cache.aget_or_fetch("tavily", "q", counting_search(calls)))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        await asyncio.sleep(0.1)
+        entries = cache.stats()["entries"]
+        return entries, await cache.aget_or_fetch("tavily", "q", counting_search(calls)), calls
+
+    entries, value, calls = asyncio.run(scenario())
+    assert entries == 0 and value == "result" and len(calls) == 2
+
+def test_cancelled_waiter_does_not_fail_the_leader():
+    async def scenario():
+        cache, calls = SearchCache(), []
+        leader = asyncio.create_task(cache.aget_or_fetch("wikipedia", "q", counting_search(calls)))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.aget_or_fetch("wikipedia", "q", counting_search(calls)))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        return await leader
+
+    assert asyncio.run(scenario()) == "result"
+
+def test_retrieval_services_share_the_process_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(SearchCacheServices, "_shared_cache", None)
+    monkeypatch.setattr(settings, "SEARCH_CACHE_PATH", str(tmp_path / "search_cache.json"))
+    first = RetrievalService(wiki=FakeWikipediaTool(), tavily_search=FakeTavilyTool(), use_cache=True)
+    second = RetrievalService(wiki=FakeWikipediaTool(), tavily_search=FakeTavilyTool(), use_cache=True)
+    assert first.cache is second.cache is get_search_cache()
+    assert get_search_cache().path == settings.SEARCH_CACHE_PATH
@@ -0,0 +1,123 @@
+import json
+import os
+import pytest
+from Config.settings import settings
+from Services.SnapshotServices import MANIFEST_NAME, SnapshotService, SnapshotWatcher, snapshot_info
+
+class StubStore:
+    """The slice of VectorStoreService that publish() and verify() read"""
+    def __init__(self, texts):
+        self.texts = list(texts)
+
+    def count(self) -> int:
+        return len(self.texts)
+
+    def get(self, include=None):
+        return {"ids": [str(i) for i in range(len(self.texts))], "documents": self.texts,
+                "metadatas": [{"source": "s"} for _ in self.texts],
+                "embeddings": [[float(i), 1.0] for i in range(len(self.texts))]}
+
+def add_version(snapshots: SnapshotService, version: str, **manifest) -> str:
+    """A published snapshot without going through publish(), which names versions by the second"""
+    os.makedirs(snapshots.path(version))
+    manifest = {"embedding_model": settings.EMBEDDING_MODEL, "backend": settings.VECTOR_BACKEND,
+                "sharded": settings.VECTOR_SHARDING_ENABLED, **manifest}
+    with open(os.path.join(snapshots.path(version), MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    return version
+
+class Loader:
+    """Stub load/close pair recording what the watcher opened and closed"""
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.loaded, self.closed = [], []
+
+    def load(self, path: str):
+        self.loaded.append(os.path.basename(path))
+        if os.path.basename(path) in self.fail:
+            raise RuntimeError("cannot open")
+        return {"version": os.path.basename(path)}
+
+    def close(self, loaded):
+        self.closed.append(loaded["version"])
+
+@pytest.fixture
+def snapshots(tmp_path) -> SnapshotService:
+    return SnapshotService(str(tmp_path / "snapshots"), keep=2)
+
+def watcher_on(snapshots: SnapshotService, loader: Loader, version: str = "v1") -> SnapshotWatcher:
+    add_version(snapshots, version)
+    snapshots.activate(version)
+    return SnapshotWatcher(snapshots, loader.load, interval=3600, close=loader.close)
+
+def swap_to(watcher: SnapshotWatcher, snapshots: SnapshotService, version: str, **manifest):
+    add_version(snapshots, version, **manifest)
+    snapshots.activate(version)
+    watcher.poll().join()
+
+def test_publish_goes_live_and_verify_reports_changes(snapshots):
+    store = StubStore(["a", "b"])
+    staging = snapshots.begin()
+    with open(os.path.join(staging, "lexical_index.npz"), "wb") as f:
+        f.write(b"index")
+    version = snapshots.publish(staging, store, snapshot_info(store, pages=1))
+    assert snapshots.current() == version and snapshots.manifest(version)["chunks"] == 2
+    assert snapshots.verify(version, store) == []
+
+    with open(os.path.join(snapshots.path(version), "lexical_index.npz"), "ab") as f:
+        f.write(b"!")
+    assert snapshots.verify(version, StubStore(["a", "c"])) == [
+        "lexical_index.npz: checksum mismatch", "vector store contents: checksum mismatch"]
+
+def test_begin_copies_the_live_snapshot_and_resumes_an_interrupted_build(snapshots):
+    version = add_version(snapshots, "v1")
+    with open(os.path.join(snapshots.path(version), "lexical_index.npz"), "wb") as f:
+        f.write(b"index")
+    snapshots.activate(version)
+    staging = snapshots.begin()
+    assert sorted(os.listdir(staging)) == ["lexical_index.npz"]
+    assert snapshots.begin() == staging
+    fresh = snapshots.begin(full=True)
+    assert not os.path.exists(staging) and os.listdir(fresh) == []
+
+def test_activate_unknown_version_raises(snapshots):
+    with pytest.raises(FileNotFoundError):
+        snapshots.activate("missing")
+
+def test_gc_keeps_the_newest_and_never_deletes_the_live_version(snapshots):
+    for version in ("v1", "v2", "v3", "v4"):
+        add_version(snapshots, version)
+    snapshots.activate("v1")
+    assert snapshots.gc() == ["v2"]
+    assert snapshots.versions() == ["v1", "v3", "v4"]
+
+def test_swaps_when_current_changes_and_closes_the_unheld_pair(snapshots):
+    loader = Loader()
+    watcher = watcher_on(snapshots, loader)
+    assert watcher.poll() is None
+    swap_to(watcher, snapshots, "v2")
+    assert watcher.get() == ("v2", {"version": "v2"})
+    assert watcher.swaps == 1 and loader.closed == ["v1"]
+
+def test_retired_pair_is_closed_after_its_last_release(snapshots):
+    loader = Loader()
+    watcher = watcher_on(snapshots, loader)
+    first, second = watcher.acquire(), watcher.acquire()
+    swap_to(watcher, snapshots, "v2")
+    assert watcher.version == "v2" and first[0] == "v1"
+    watcher.release(first)
+    assert loader.closed == []
+    watcher.release(second)
+    assert loader.closed == ["v1"]
+
+def test_failed_and_incompatible_versions_are_never_retried(snapshots):
+    loader = Loader(fail={"v2"})
+    watcher = watcher_on(snapshots, loader)
+    swap_to(watcher, snapshots, "v2")
+    assert watcher.version == "v1" and "v2 not loaded: cannot open" in watcher.error
+    assert watcher.poll() is None
+
+    swap_to(watcher, snapshots, "v3", embedding_model="another-model")
+    assert watcher.version == "v1" and "embedding_model='another-model'" in watcher.error
+    assert watcher.poll() is None
+    assert loader.loaded == ["v1", "v2"] and loader.closed == []